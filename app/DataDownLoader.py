@@ -3,13 +3,17 @@
 
 '''
 
+import numpy as np
 import requests
 import yaml
 import asyncio
-import aiohttp
 import asyncio
+import collections
+import os
 import time
 import datetime
+import json
+import socket
 import sys
 from dateutil.parser import isoparse
 
@@ -18,283 +22,1036 @@ from dateutil.parser import isoparse
 from TickerConverter import TickerConverter
 from TickerData import TickerData
 from OhlcConverter import OHLCConverter
-from OHLCData import OHLCData
 from DataWriter import DataWriter
+from HttpClient import HttpClient
+from RateLimiter import RateLimiter
+from Interval import Interval
+from GapScanner import GapScanner
+from OHLCSpool import OHLCSpool
+from DownloadCheckpoint import DownloadCheckpoint
+from ProcessPool import ProcessPool
+from KlineDecoder import KlineDecoder
+from OHLCData import OHLCSeries
+from Metrics import Metrics
+from InstrumentCatalog import InstrumentCatalog
+from PollScheduler import PollScheduler
+from LiveIngestor import LiveIngestor
+from ShardRing import ShardRing
+from SeriesLease import SeriesLease
 
 
 class DataDownLoader:
-    def __init__(self) -> None:
+    def __init__(self, params_path='./ignore/params.yaml', endpoints_path='./ignore/apiendpoints.yaml', shard=None, rate_share=1.0) -> None:
+        '''
+        shard: (shard_index, num_shards) to download only the series ShardRing assigns to shard_index, holding a SeriesLease on each series it writes.
+        rate_share: fraction of the rate limits used, for workers sharing one IP
+        '''
+        self.params_path = params_path
+        self.endpoints_path = endpoints_path
+        self.shard_index, self.num_shards = shard if shard is not None else (None, 1)
+        self.rate_share = rate_share
+        self.shard_lease_ttl_sec = 60
+        self.skipped_series = []
+        self.mode = None
         self.exhanges = []
         self.ohlcv_data_interval = {}
         self.since_num_days_before = 0 #days
         self.max_download_per_trial = {}        
         self.ticker_endpoints = {}
         self.ohlc_endpoints = {}
+        self.ws_endpoints = {}
         self.ohlcv_download_num = {}
+        self.http_params = {}
+        self.metrics_params = {}
+        self.http_clients = {}
+        self.concurrent_downloads = {}
+        self.rate_limit_per_sec = {}
+        self.rate_limit_max_per_sec = {}
+        self.download_elapsed = {}
+        self.stage_elapsed = {}
+        self.http_stats = {}
+        self.backfill_shards = {}
+        self.backfill_window_pages = 10
+        self.storage_format = 'csv'
+        self.data_dir = './app/Data'
+        self.rollup_timeframes = []
+        self.process_pool_size = 0
+        self.writer_workers = 0
+        self.fast_kline_decode = False
+        self.writer_max_pending_mb = 256
+        self.instrument_catalog_ttl_sec = 3600
+        self.daemon_poll_delay_sec = 5
+        self.daemon_retry_sec = 10
+        self.live_symbols_per_connection = {}
+        self.live_heartbeat_sec = 20
+        self.live_ingestors = []
+        self.__live_pending = {}
+        self.__live_semaphores = {}
+        self.__backfills = set()
+        self.last_timestamps = {}
+        self.scheduler = PollScheduler()
+        self.__stop_event = asyncio.Event()
+        self.__wakeup_event = asyncio.Event()
+        self.__ohlcv_page_requesters = {'bybit': self.__request_bybit_page,
+                                        'dydx': self.__request_dydx_page,
+                                        'apexpro': self.__request_apexpro_page}
+        self.__ohlcv_timestamp_getters = {'okx': lambda row: int(row[0]),
+                                          'bybit': lambda row: int(row[0]),
+                                          'dydx': lambda row: int(isoparse(row['startedAt']).timestamp() * 1000),
+                                          'apexpro': lambda row: int(row['t'])}
         self.__read_params()
         self.__read_apiendpoints()
+        self.checkpoint_dir = os.path.join(self.data_dir, '.checkpoints')
+        self.catalog = InstrumentCatalog(os.path.join(self.data_dir, 'instruments.json'), self.instrument_catalog_ttl_sec)
+        self.ring = None
+        self.leases = None
+        if self.shard_index is not None:
+            self.ring = ShardRing(self.num_shards)
+            owner = f'{socket.gethostname()}:{os.getpid()}:shard-{self.shard_index}-of-{self.num_shards}'
+            self.leases = SeriesLease(os.path.join(self.data_dir, '.leases'), owner, self.shard_lease_ttl_sec)
+            # every worker exports its own file, labelled with its shard
+            if self.metrics_params.get('path'):
+                root, ext = os.path.splitext(self.metrics_params['path'])
+                self.metrics_params = dict(self.metrics_params, path=f'{root}-shard-{self.shard_index}-of-{self.num_shards}{ext}')
+        Metrics.from_params(self.metrics_params, {'shard': self.shard_index} if self.shard_index is not None else None)
         TickerData.initialize()
         TickerConverter.initialize()
         OHLCConverter.initialize()
-        OHLCData.initialize()
+        DataWriter.initialize(self.storage_format, self.data_dir, self.rollup_timeframes)
         
 
     def __read_params(self):
-        with open('./ignore/params.yaml', 'r') as f:
+        with open(self.params_path, 'r') as f:
             params = yaml.load(f, Loader=yaml.FullLoader)
             self.exhanges = params['exchanges']
             self.since_num_days_before = params['since_num_days_before']
+            self.http_params = params.get('http', {})
+            self.metrics_params = params.get('metrics', {})
+            self.backfill_window_pages = params.get('backfill_window_pages', 10)
+            self.storage_format = params.get('storage_format', 'csv')
+            self.data_dir = params.get('data_dir', './app/Data')
+            self.rollup_timeframes = params.get('rollup_timeframes') or []
+            self.process_pool_size = params.get('process_pool_size', 0)
+            self.writer_workers = params.get('writer_workers', 0)
+            self.fast_kline_decode = params.get('fast_kline_decode', False)
+            self.writer_max_pending_mb = params.get('writer_max_pending_mb', 256)
+            self.instrument_catalog_ttl_sec = params.get('instrument_catalog_ttl_sec', 3600)
+            self.daemon_poll_delay_sec = params.get('daemon_poll_delay_sec', 5)
+            self.daemon_retry_sec = params.get('daemon_retry_sec', 10)
+            self.live_heartbeat_sec = params.get('live_heartbeat_sec', 20)
+            self.shard_lease_ttl_sec = params.get('shard_lease_ttl_sec', 60)
             for ex in self.exhanges:
                 self.ohlcv_data_interval[ex] = params['ohlcv_data_interval'][ex]
+                # an unsupported bar size fails here instead of in the middle of a download
+                Interval.to_ms(ex, self.ohlcv_data_interval[ex])
                 self.max_download_per_trial[ex] = params['max_download_per_trial'][ex]
+                self.concurrent_downloads[ex] = params.get('concurrent_downloads', {}).get(ex, 1)
+                self.rate_limit_per_sec[ex] = params.get('rate_limit_per_sec', {}).get(ex, 5)
+                self.rate_limit_max_per_sec[ex] = params.get('rate_limit_max_per_sec', {}).get(ex, self.rate_limit_per_sec[ex])
+                self.backfill_shards[ex] = params.get('backfill_shards', {}).get(ex, 1)
+                self.live_symbols_per_connection[ex] = params.get('live_symbols_per_connection', {}).get(ex, 50)
 
     def __read_apiendpoints(self):
         self.api_key = ''
-        with open('./ignore/apiendpoints.yaml', 'r') as f:
+        with open(self.endpoints_path, 'r') as f:
             endpoints = yaml.load(f, Loader=yaml.FullLoader)
             for ex in self.exhanges:
                 self.ticker_endpoints[ex] = endpoints[ex]['ticker']
                 self.ohlc_endpoints[ex] = endpoints[ex]['ohlc']
+                if 'ws' in endpoints[ex]:
+                    self.ws_endpoints[ex] = endpoints[ex]['ws']
 
 
-    async def start(self):
+    async def start(self, mode='update'):
+        '''
+        mode 'update' downloads the bars after the last stored one, 'repair' downloads only the gaps inside the stored series,
+        'daemon' keeps polling every series for its newly closed bars until stop() is called,
+        'live' streams the closed bars from the WebSocket APIs until stop() is called
+        '''
+        self.mode = mode
+        started_at = time.time()
+        ProcessPool.initialize(self.process_pool_size, DataWriter.initialize, (self.storage_format, self.data_dir, self.rollup_timeframes))
+        Metrics.start_exporter()
+        if self.leases is not None:
+            self.leases.start_renewal()
+        if self.writer_workers > 0:
+            DataWriter.start_writer(self.writer_workers, self.writer_max_pending_mb * 1024 * 1024)
+        await self.__open_http_clients()
+        try:
+            if mode == 'repair':
+                await self.__start_repair()
+            elif mode == 'daemon':
+                await self.__start_daemon()
+            elif mode == 'live':
+                await self.__start_live()
+            else:
+                await self.__start_download()
+        finally:
+            await self.__close_http_clients()
+            await DataWriter.stop_writer()
+            ProcessPool.shutdown()
+            await Metrics.stop_exporter()
+            if self.leases is not None:
+                await self.leases.stop_renewal()
+                self.leases.release_all()
+        if self.shard_index is not None:
+            self.__save_summary(time.time() - started_at)
+
+    async def refresh_catalog(self):
+        '''
+        downloads the stale instrument lists and writes all_tickers.csv, e.g. once before starting the shard workers
+        '''
+        await self.__open_http_clients()
+        try:
+            await self.__get_tickers()
+            await DataWriter.write_ticker_data(self.exhanges)
+        finally:
+            await self.__close_http_clients()
+
+    def get_summary(self, elapsed=None):
+        '''
+        results of the run, merged over the shards by ShardCoordinator
+        '''
+        return {'mode': self.mode,
+                'shard': self.shard_index,
+                'num_shards': self.num_shards,
+                'owner': self.leases.owner if self.leases is not None else None,
+                'finished_at': time.time(),
+                'elapsed': elapsed,
+                'num_series': sum(len(self.__get_shard_tickers(ex)) for ex in self.exhanges),
+                'records': {ex: self.ohlcv_download_num.get(ex, 0) for ex in self.exhanges},
+                'download_elapsed': dict(self.download_elapsed),
+                'stage_elapsed': dict(self.stage_elapsed),
+                'http': dict(self.http_stats),
+                'skipped': list(self.skipped_series)}
+
+    @staticmethod
+    def get_summary_path(data_dir, mode, shard_index, num_shards):
+        return os.path.join(data_dir, '.shards', f'{mode}-{shard_index}-of-{num_shards}.json')
+
+    def __save_summary(self, elapsed):
+        path = self.get_summary_path(self.data_dir, self.mode, self.shard_index, self.num_shards)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.get_summary(elapsed), f)
+        os.replace(path + '.tmp', path)
+
+    def __get_shard_tickers(self, ex_name):
+        '''
+        the tickers of the exchange assigned to this shard, all of them without sharding
+        '''
+        tickers = TickerData.get_tickers_by_exchange(ex_name)
+        if self.ring is None:
+            return tickers
+        return [ticker for ticker in tickers if self.ring.get_shard(ex_name, ticker.symbol) == self.shard_index]
+
+    def __acquire_lease(self, ex_name, ticker):
+        '''
+        True if the series can be written by this worker, always without sharding
+        '''
+        if self.leases is None or self.leases.acquire(ex_name, ticker.base, ticker.quote):
+            return True
+        holder = self.leases.get_holder(ex_name, ticker.base, ticker.quote)
+        print(f'Skipping {ex_name}-{ticker.symbol}: its lease is held by {holder}')
+        self.skipped_series.append(f'{ex_name}-{ticker.symbol}')
+        return False
+
+    async def __release_lease(self, ex_name, ticker):
+        if self.leases is not None:
+            # queued writes of the series have to be on disk before another worker may write it
+            await DataWriter.flush(ex_name, ticker.base, ticker.quote)
+            self.leases.release(ex_name, ticker.base, ticker.quote)
+
+    def stop(self):
+        '''
+        ends daemon or live mode once the polls and back-fills in flight are done
+        '''
+        self.__stop_event.set()
+        self.__wakeup_event.set()
+
+    async def __open_http_clients(self):
+        for ex in self.exhanges:
+            rate_limiter = RateLimiter(self.rate_limit_per_sec[ex] * self.rate_share, max_rate=self.rate_limit_max_per_sec[ex] * self.rate_share)
+            self.http_clients[ex] = HttpClient.from_params(ex, self.http_params, rate_limiter)
+            await self.http_clients[ex].open()
+
+    async def __close_http_clients(self):
+        for ex, client in self.http_clients.items():
+            client.print_stats()
+            self.http_stats[ex] = client.get_stats()
+            await client.close()
+        self.http_clients = {}
+
+    async def __start_download(self):
         print('Downloading target tickers...')
+        started_at = time.time()
         await self.__get_tickers()
-        await DataWriter.write_ticker_data(self.exhanges)
+        if self.shard_index in (None, 0):
+            await DataWriter.write_ticker_data(self.exhanges)
+        self.stage_elapsed['tickers'] = time.time() - started_at
         print('Started ohlc download process..')
         since_ts = (int(time.time()) - 60 * 1440 * self.since_num_days_before) * 1000
         till_ts = int(time.time()) * 1000
         print('num since ts=', (int(time.time()) - since_ts / 1000) / 60)
-        try:
-            async with asyncio.TaskGroup() as tg:
-                task_okx = tg.create_task(self.__start_okx_ohlcv_download(since_ts, till_ts))
-                task_bybit = tg.create_task(self.__start_bybit_ohlcv_download(since_ts, till_ts))
-                task_dydx = tg.create_task(self.__start_dydx_ohlcv_download(since_ts, till_ts))
-                task_apexpro = tg.create_task(self.__start_apexpro_ohlcv_download(since_ts, till_ts))
-        except* Exception as err:
-            print(f"{err.exceptions=}")
+        jobs = {ex: self.__get_update_jobs(ex, since_ts, till_ts) for ex in self.exhanges}
+        await self.__run_jobs(jobs)
         print('Completed download all symbol data.')
 
+    async def __start_repair(self):
+        print('Downloading target tickers...')
+        started_at = time.time()
+        await self.__get_tickers()
+        self.stage_elapsed['tickers'] = time.time() - started_at
+        print('Scanning stored series for gaps..')
+        jobs = {ex: self.__get_repair_jobs(ex) for ex in self.exhanges}
+        await self.__run_jobs(jobs)
+        print('Completed gap repair.')
 
-    async def __start_okx_ohlcv_download(self, since_ts, till_ts):
-        tickers = TickerData.get_tickers_by_exchange('okx')
-        for ticker in tickers:
-            # Check if data already exists and get last timestamp
-            last_ts = DataWriter.get_last_timestamp('okx', ticker.base, ticker.quote)
-            download_since = last_ts + 60000 if last_ts is not None else since_ts  # Add 1 minute (60000 ms) to avoid duplicate
-            
-            # Skip if no new data to download
-            if download_since >= till_ts:
-                print(f'Skipping okx-{ticker.symbol}: data is up to date')
+    async def __start_daemon(self):
+        '''
+        keeps the tickers and the last stored timestamp of every series in memory and polls each series once its next bar has closed
+        (plus daemon_poll_delay_sec), so the stored series stay within one bar and the delay of real time.
+        a poll is one request for the bars after the last stored one. a series further behind than one page, e.g. a newly listed one,
+        is caught up with the download of the update mode first. the instrument catalog is refreshed every instrument_catalog_ttl_sec.
+        '''
+        print('Started daemon mode..')
+        semaphores = {ex: asyncio.Semaphore(self.concurrent_downloads[ex]) for ex in self.exhanges}
+        polls = set()
+        next_refresh_at = 0
+        while not self.__stop_event.is_set():
+            if time.time() >= next_refresh_at:
+                await self.__get_tickers()
+                if self.shard_index in (None, 0):
+                    await DataWriter.write_ticker_data(self.exhanges)
+                self.__update_schedule()
+                next_refresh_at = time.time() + max(self.instrument_catalog_ttl_sec, 60)
+            for key in self.scheduler.pop_due(int(time.time() * 1000)):
+                task = asyncio.create_task(self.__poll_series(key, semaphores[key[0]]))
+                polls.add(task)
+                task.add_done_callback(polls.discard)
+            next_due = self.scheduler.next_due()
+            wait_sec = next_refresh_at - time.time()
+            if next_due is not None:
+                wait_sec = min(wait_sec, next_due / 1000 - time.time())
+            self.__wakeup_event.clear()
+            try:
+                await asyncio.wait_for(self.__wakeup_event.wait(), max(wait_sec, 0))
+            except TimeoutError:
+                pass
+        print(f'Stopping daemon mode, waiting for {len(polls)} polls..')
+        await asyncio.gather(*polls)
+        await self.__flush_all()
+
+    async def __start_live(self):
+        '''
+        subscribes to the kline WebSocket channels of every exchange with a 'ws' endpoint and writes the confirmed bars until stop() is called.
+        after every (re)connect, and whenever a streamed bar does not follow the last stored one, the missing bars are back-filled over REST
+        like a daemon poll, and the bars streamed meanwhile are written after them. the tickers are read once at the start.
+        '''
+        print('Started live mode..')
+        await self.__get_tickers()
+        if self.shard_index in (None, 0):
+            await DataWriter.write_ticker_data(self.exhanges)
+        self.__update_series()
+        self.live_ingestors = []
+        for ex in self.exhanges:
+            if ex not in self.ws_endpoints:
+                print(f'No ws endpoint for {ex} in {self.endpoints_path}, {ex} is not ingested')
                 continue
-            
-            await self.__download_okx_ohlcv(ticker.symbol, ticker.base, ticker.quote, download_since, till_ts, self.ohlcv_data_interval['okx'])
-            await asyncio.sleep(0.5)
+            self.__live_semaphores[ex] = asyncio.Semaphore(self.concurrent_downloads[ex])
+            symbols = [symbol for ex_name, symbol in self.last_timestamps if ex_name == ex]
+            self.live_ingestors.append(LiveIngestor(ex, self.ws_endpoints[ex], symbols, self.ohlcv_data_interval[ex], self.__on_live_bar, self.__start_backfills,
+                                                    self.live_symbols_per_connection[ex], self.live_heartbeat_sec))
+            print(f'{ex}: streaming {len(symbols)} symbols on {-(-len(symbols) // self.live_symbols_per_connection[ex])} connections')
+        tasks = [asyncio.create_task(ingestor.run()) for ingestor in self.live_ingestors]
+        await self.__stop_event.wait()
+        print(f'Stopping live mode, waiting for {len(self.__backfills)} back-fills..')
+        for ingestor in self.live_ingestors:
+            ingestor.stop()
+        await asyncio.gather(*tasks)
+        await asyncio.gather(*self.__backfills)
+        await self.__flush_all()
 
+    def __start_backfills(self, ex_name, symbols):
+        '''
+        starts a REST back-fill of every series not being back-filled already. streamed bars of the series are buffered until it is done
+        '''
+        for symbol in symbols:
+            key = (ex_name, symbol)
+            if key not in self.last_timestamps or key in self.__live_pending:
+                continue
+            self.__live_pending[key] = []
+            task = asyncio.create_task(self.__backfill_series(key))
+            self.__backfills.add(task)
+            task.add_done_callback(self.__backfills.discard)
 
-    async def __start_bybit_ohlcv_download(self, since_ts, till_ts):
-        tickers = TickerData.get_tickers_by_exchange('bybit')
-        for ticker in tickers:
-            # Check if data already exists and get last timestamp
-            last_ts = DataWriter.get_last_timestamp('bybit', ticker.base, ticker.quote)
-            download_since = last_ts + 60000 if last_ts is not None else since_ts  # Add 1 minute (60000 ms) to avoid duplicate
-            
-            # Skip if no new data to download
-            if download_since >= till_ts:
-                print(f'Skipping bybit-{ticker.symbol}: data is up to date')
+    async def __backfill_series(self, key):
+        '''
+        back-fills the series over REST and writes the buffered bars after it. while a buffered bar still does not follow the stored ones,
+        e.g. the REST endpoint has not published the bars before it yet, the back-fill is repeated every daemon_retry_sec until stop() is called
+        '''
+        while True:
+            try:
+                async with self.__live_semaphores[key[0]]:
+                    self.last_timestamps[key] = await self.__download_new_bars(key, self.__get_last_closed_ts(key[0]), 'live_backfills_total')
+            except Exception as e:
+                # the next streamed bar does not follow the stored ones, so it starts the back-fill again
+                print(f'Error back-filling {key[0]}-{key[1]}: {e!r}')
+                Metrics.inc('live_backfill_errors_total', exchange=key[0])
+                self.last_timestamps[key] = await self.__reload_last_ts(key)
+                del self.__live_pending[key]
+                return
+            # bars streamed while the buffered ones are written are buffered too, the series is released only once nothing is left
+            complete = True
+            while complete and len(self.__live_pending[key]) > 0:
+                bars = self.__live_pending[key]
+                self.__live_pending[key] = []
+                complete = await self.__write_live_bars(key, bars)
+                if not complete:
+                    # the bars already stored are skipped by the next write
+                    self.__live_pending[key] = bars + self.__live_pending[key]
+            if complete:
+                break
+            print(f'{key[0]}-{key[1]}: buffered bars do not follow the back-filled ones, back-filling again in {self.daemon_retry_sec}s')
+            Metrics.inc('live_backfill_retries_total', exchange=key[0])
+            try:
+                await asyncio.wait_for(self.__stop_event.wait(), self.daemon_retry_sec)
+                break
+            except TimeoutError:
+                pass
+        del self.__live_pending[key]
+
+    async def __on_live_bar(self, ex_name, symbol, bar):
+        key = (ex_name, symbol)
+        if key not in self.last_timestamps:
+            return
+        if key in self.__live_pending:
+            self.__live_pending[key].append(bar)
+        elif not await self.__write_live_bars(key, [bar]):
+            self.__start_backfills(ex_name, [symbol])
+            self.__live_pending[key].append(bar)
+
+    async def __write_live_bars(self, key, bars):
+        '''
+        writes the bars following the last stored one and skips the ones already stored.
+        returns False if a bar does not follow the last stored one, it and the bars after it are not written
+        '''
+        ex_name, symbol = key
+        interval_ms = Interval.to_ms(ex_name, self.ohlcv_data_interval[ex_name])
+        last_ts = self.last_timestamps[key]
+        rows = []
+        complete = True
+        for bar in sorted(bars):
+            if last_ts is not None and bar[0] <= last_ts:
                 continue
-            
-            await self.__download_bybit_ohlcv(ticker.symbol, ticker.base, ticker.quote, download_since, till_ts, self.ohlcv_data_interval['bybit'])
-            await asyncio.sleep(0.5)
+            if last_ts is None or bar[0] != last_ts + interval_ms:
+                complete = False
+                break
+            rows.append(bar)
+            last_ts = bar[0]
+        if len(rows) > 0:
+            ticker = TickerData.get_ticker(ex_name, symbol)
+            try:
+                await DataWriter.write_data(ex_name, symbol, ticker.base, ticker.quote, OHLCSeries(*zip(*rows)))
+            except Exception as e:
+                # an earlier write of the series failed, the bars after the stored ones are back-filled
+                print(f'Error writing {ex_name}-{symbol}: {e!r}')
+                self.last_timestamps[key] = await self.__reload_last_ts(key)
+                return False
+            self.last_timestamps[key] = last_ts
+            self.ohlcv_download_num[ex_name] = self.ohlcv_download_num.get(ex_name, 0) + len(rows)
+            Metrics.inc('ohlcv_records_total', len(rows), exchange=ex_name)
+        return complete
+
+    async def __reload_last_ts(self, key):
+        '''
+        the last stored timestamp once the queued writes of the series are written or dropped, after a write or download of it failed
+        '''
+        ticker = TickerData.get_ticker(*key)
+        try:
+            await DataWriter.flush(key[0], ticker.base, ticker.quote)
+        except Exception as e:
+            print(f'Error writing {key[0]}-{key[1]}: {e!r}')
+        return DataWriter.get_last_timestamp(key[0], ticker.base, ticker.quote)
+
+    async def __flush_all(self):
+        try:
+            await DataWriter.flush()
+        except Exception as e:
+            # every failed write is printed by the writer, the next run continues each series after its last stored bar
+            print(f'Error writing queued series: {e!r}')
+
+    def __update_schedule(self):
+        '''
+        schedules the series of newly registered tickers from their last stored timestamp
+        '''
+        for key in self.__update_series():
+            self.scheduler.schedule(key, self.__get_next_due(key[0], self.last_timestamps[key]))
+        Metrics.set_gauge('daemon_scheduled_series', len(self.last_timestamps))
+        print(f'Daemon: {len(self.last_timestamps)} series scheduled')
+
+    def __update_series(self):
+        '''
+        adds the series of newly registered tickers with their last stored timestamp and drops the series of delisted ones, returns the added keys
+        '''
+        keys = set()
+        added = []
+        for ex in self.exhanges:
+            for ticker in self.__get_shard_tickers(ex):
+                key = (ex, ticker.symbol)
+                keys.add(key)
+                # a series leased by another worker is tried again at the next refresh
+                if key not in self.last_timestamps and self.__acquire_lease(ex, ticker):
+                    self.last_timestamps[key] = DataWriter.get_last_timestamp(ex, ticker.base, ticker.quote)
+                    added.append(key)
+        for key in list(self.last_timestamps):
+            if key not in keys:
+                del self.last_timestamps[key]
+                self.scheduler.remove(key)
+        return added
+
+    def __get_last_closed_ts(self, ex_name):
+        '''
+        open time of the last closed bar
+        '''
+        interval_ms = Interval.to_ms(ex_name, self.ohlcv_data_interval[ex_name])
+        return (int(time.time() * 1000) // interval_ms - 1) * interval_ms
+
+    def __get_next_due(self, ex_name, last_ts):
+        '''
+        the time the bar after last_ts has closed plus daemon_poll_delay_sec, 0 (due now) for a series without stored bars
+        '''
+        if last_ts is None:
+            return 0
+        interval_ms = Interval.to_ms(ex_name, self.ohlcv_data_interval[ex_name])
+        return last_ts + 2 * interval_ms + int(self.daemon_poll_delay_sec * 1000)
+
+    async def __poll_series(self, key, semaphore):
+        '''
+        downloads the closed bars after the last stored one and schedules the next poll.
+        a bar the exchange has not published yet is fetched by the poll after the next bar closes, a failed poll is retried after daemon_retry_sec.
+        '''
+        ex_name, symbol = key
+        till_ts = self.__get_last_closed_ts(ex_name)
+        due_ts = self.__get_next_due(ex_name, max(till_ts, self.last_timestamps[key] or 0))
+        try:
+            async with semaphore:
+                last_ts = await self.__download_new_bars(key, till_ts, 'daemon_polls_total')
+        except Exception as e:
+            print(f'Error polling {ex_name}-{symbol}: {e!r}, retrying in {self.daemon_retry_sec}s')
+            Metrics.inc('daemon_poll_errors_total', exchange=ex_name)
+            due_ts = int((time.time() + self.daemon_retry_sec) * 1000)
+            last_ts = await self.__reload_last_ts(key)
+        if key not in self.last_timestamps:
+            # delisted while the poll was in flight
+            return
+        self.last_timestamps[key] = last_ts
+        self.scheduler.schedule(key, due_ts)
+        self.__wakeup_event.set()
+
+    async def __download_new_bars(self, key, till_ts, counter_name):
+        '''
+        downloads the bars after the last stored one up to till_ts, with one request if they fit in a page and with the download of the update mode if not,
+        counted in counter_name as kind 'tail' or 'catchup'. returns the new last timestamp, raises if the page was not in the expected format
+        '''
+        ex_name, symbol = key
+        ticker = TickerData.get_ticker(ex_name, symbol)
+        interval = self.ohlcv_data_interval[ex_name]
+        interval_ms = Interval.to_ms(ex_name, interval)
+        last_ts = self.last_timestamps[key]
+        since_ts = last_ts + interval_ms if last_ts is not None else (int(time.time()) - 60 * 1440 * self.since_num_days_before) * 1000
+        if till_ts - since_ts >= interval_ms * self.max_download_per_trial[ex_name]:
+            Metrics.inc(counter_name, exchange=ex_name, kind='catchup')
+            return await self.__catch_up_series(ex_name, ticker, since_ts, till_ts, interval)
+        if since_ts > till_ts:
+            return last_ts
+        Metrics.inc(counter_name, exchange=ex_name, kind='tail')
+        series = await self.__request_tail(ex_name, symbol, since_ts, till_ts, interval)
+        if series is None:
+            raise ValueError('ohlc data is not expected format')
+        if len(series) == 0:
+            return last_ts
+        await DataWriter.write_data(ex_name, symbol, ticker.base, ticker.quote, series)
+        self.ohlcv_download_num[ex_name] = self.ohlcv_download_num.get(ex_name, 0) + len(series)
+        Metrics.inc('ohlcv_records_total', len(series), exchange=ex_name)
+        return int(series.timestamp[-1])
+
+    async def __catch_up_series(self, ex_name, ticker, since_ts, till_ts, interval):
+        '''
+        downloads [since_ts, till_ts] like the update mode and returns the last stored timestamp once the bars are written
+        '''
+        download_funcs = {'okx': self.__download_okx_ohlcv,
+                          'bybit': self.__download_bybit_ohlcv,
+                          'dydx': self.__download_dydx_ohlcv,
+                          'apexpro': self.__download_apexpro_ohlcv}
+        # okx pages end before 'after', so its range has to end at the bar following till_ts
+        till_offset = Interval.to_ms(ex_name, interval) if ex_name == 'okx' else 0
+        num_records = await download_funcs[ex_name](ticker.symbol, ticker.base, ticker.quote, since_ts, till_ts + till_offset, interval)
+        self.ohlcv_download_num[ex_name] = self.ohlcv_download_num.get(ex_name, 0) + num_records
+        Metrics.inc('ohlcv_records_total', num_records, exchange=ex_name)
+        await DataWriter.flush(ex_name, ticker.base, ticker.quote)
+        return DataWriter.get_last_timestamp(ex_name, ticker.base, ticker.quote)
 
-    async def __start_dydx_ohlcv_download(self, since_ts, till_ts):
-        tickers = TickerData.get_tickers_by_exchange('dydx')
-        for ticker in tickers:
+    async def __request_tail(self, ex_name, symbol, since_ts, till_ts, interval):
+        '''
+        one request for the bars in [since_ts, till_ts] of a series less than a page behind.
+        returns them as a sorted OHLCSeries, or None if the page was not in the expected format
+        '''
+        if ex_name == 'okx':
+            page = await self.__request_with_retries('okx', self.__request_okx_page, symbol, till_ts + Interval.to_ms('okx', interval), interval)
+        else:
+            page = await self.__request_with_retries(ex_name, self.__ohlcv_page_requesters[ex_name], symbol, since_ts, till_ts, interval)
+        if page is None:
+            return None
+        Metrics.inc('ohlcv_pages_total', exchange=ex_name)
+        if isinstance(page, OHLCSeries):
+            page = page.take((page.timestamp >= since_ts) & (page.timestamp <= till_ts))
+        else:
+            get_ts = self.__ohlcv_timestamp_getters[ex_name]
+            page = [row for row in page if since_ts <= get_ts(row) <= till_ts]
+        if len(page) == 0:
+            return OHLCSeries([], [], [], [], [])
+        return await self.__stitch_pages(ex_name, [page])
+
+    async def __run_jobs(self, jobs):
+        self.ohlcv_download_num = {ex: 0 for ex in self.exhanges}
+        self.download_elapsed = {ex: 0.0 for ex in self.exhanges}
+        started_at = time.time()
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for ex in self.exhanges:
+                    tg.create_task(self.__start_ohlcv_download(ex, jobs[ex]))
+        except* Exception as err:
+            print(f"{err.exceptions=}")
+        self.stage_elapsed['download'] = time.time() - started_at
+        await self.__flush_all()
+        self.stage_elapsed['flush'] = time.time() - started_at - self.stage_elapsed['download']
+        self.__print_download_summary(time.time() - started_at)
+
+    def __get_update_jobs(self, ex_name, since_ts, till_ts):
+        '''
+        one (ticker, [(since_ts, till_ts)]) job per symbol, starting after its last stored bar
+        '''
+        jobs = []
+        for ticker in self.__get_shard_tickers(ex_name):
             # Check if data already exists and get last timestamp
-            last_ts = DataWriter.get_last_timestamp('dydx', ticker.base, ticker.quote)
+            last_ts = DataWriter.get_last_timestamp(ex_name, ticker.base, ticker.quote)
             download_since = last_ts + 60000 if last_ts is not None else since_ts  # Add 1 minute (60000 ms) to avoid duplicate
-            
             # Skip if no new data to download
             if download_since >= till_ts:
-                print(f'Skipping dydx-{ticker.symbol}: data is up to date')
+                print(f'Skipping {ex_name}-{ticker.symbol}: data is up to date')
                 continue
-            
-            await self.__download_dydx_ohlcv(ticker.symbol, ticker.base, ticker.quote, download_since, till_ts, self.ohlcv_data_interval['dydx'])
-            await asyncio.sleep(0.5)
+            jobs.append((ticker, [(download_since, till_ts)]))
+        return jobs
 
-    async def __start_apexpro_ohlcv_download(self, since_ts, till_ts):
-        tickers = TickerData.get_tickers_by_exchange('apexpro')
-        for ticker in tickers:
-            # Check if data already exists and get last timestamp
-            last_ts = DataWriter.get_last_timestamp('apexpro', ticker.base, ticker.quote)
-            download_since = last_ts + 60000 if last_ts is not None else since_ts  # Add 1 minute (60000 ms) to avoid duplicate
-            
-            # Skip if no new data to download
-            if download_since >= till_ts:
-                print(f'Skipping apexpro-{ticker.symbol}: data is up to date')
+    def __get_repair_jobs(self, ex_name):
+        '''
+        one (ticker, [(gap_start, gap_end), ...]) job per stored series of the exchange with gaps.
+        the gaps of a series are repaired one after another by one worker, so two writes never merge into the same series at once
+        '''
+        scanner = GapScanner(DataWriter.storage)
+        interval_ms = Interval.to_ms(ex_name, self.ohlcv_data_interval[ex_name])
+        jobs = []
+        num_gaps = 0
+        for ticker in self.__get_shard_tickers(ex_name):
+            gaps = scanner.find_gaps(ex_name, ticker.base, ticker.quote, interval_ms)
+            if len(gaps) == 0:
+                continue
+            num_gaps += len(gaps)
+            print(f'{ex_name}-{ticker.symbol}: {len(gaps)} gaps, {GapScanner.count_missing(gaps, interval_ms)} missing bars')
+            # okx pages end before 'after', so its range has to end at the bar following the gap
+            till_offset = interval_ms if ex_name == 'okx' else 0
+            jobs.append((ticker, [(gap_start, gap_end + till_offset) for gap_start, gap_end in gaps]))
+        print(f'{ex_name}: {num_gaps} gaps in {len(jobs)} series')
+        return jobs
+
+    async def __start_ohlcv_download(self, ex_name, jobs):
+        '''
+        runs concurrent_downloads[ex_name] workers that take (ticker, [(since_ts, till_ts), ...]) jobs from a shared queue.
+        a job's ranges are downloaded in order by the worker that took it, so each series is written by one worker at a time.
+        all workers share the exchange's HttpClient, so their requests stay within the rate of its RateLimiter in total.
+        '''
+        download_funcs = {'okx': self.__download_okx_ohlcv,
+                          'bybit': self.__download_bybit_ohlcv,
+                          'dydx': self.__download_dydx_ohlcv,
+                          'apexpro': self.__download_apexpro_ohlcv}
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        Metrics.set_gauge('download_queue_depth', queue.qsize(), exchange=ex_name)
+        started_at = time.time()
+        num_workers = max(1, min(self.concurrent_downloads[ex_name], len(jobs)))
+        await asyncio.gather(*[self.__ohlcv_download_worker(ex_name, queue, download_funcs[ex_name]) for i in range(num_workers)])
+        self.download_elapsed[ex_name] = time.time() - started_at
+
+    async def __ohlcv_download_worker(self, ex_name, queue, download_func):
+        while True:
+            try:
+                ticker, ranges = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            Metrics.set_gauge('download_queue_depth', queue.qsize(), exchange=ex_name)
+            if not self.__acquire_lease(ex_name, ticker):
                 continue
-            
-            await self.__download_apexpro_ohlcv(ticker.symbol, ticker.base, ticker.quote, download_since, till_ts, self.ohlcv_data_interval['apexpro'])
-            await asyncio.sleep(0.01)
+            try:
+                for since_ts, till_ts in ranges:
+                    try:
+                        num_records = await download_func(ticker.symbol, ticker.base, ticker.quote, since_ts, till_ts, self.ohlcv_data_interval[ex_name])
+                        self.ohlcv_download_num[ex_name] += num_records
+                        Metrics.inc('ohlcv_records_total', num_records, exchange=ex_name)
+                    except Exception as e:
+                        print(f'Error downloading {ex_name}-{ticker.symbol}: {e!r}')
+            finally:
+                await self.__release_lease(ex_name, ticker)
+
+    def __print_download_summary(self, total_elapsed):
+        print('Download summary:')
+        for ex in self.exhanges:
+            elapsed = self.download_elapsed[ex]
+            rate = self.ohlcv_download_num[ex] / elapsed if elapsed > 0 else 0.0
+            print(f'  {ex}: {self.ohlcv_download_num[ex]} records in {elapsed:.1f}s ({rate:.1f} records/sec, {self.concurrent_downloads[ex]} workers)')
+        total_num = sum(self.ohlcv_download_num.values())
+        rate = total_num / total_elapsed if total_elapsed > 0 else 0.0
+        print(f'  total: {total_num} records in {total_elapsed:.1f}s ({rate:.1f} records/sec)')
 
     async def __download_okx_ohlcv(self, symbol, base, quote, since_ts, till_ts, bar_size):
-        ohlcv = []
-        async with aiohttp.ClientSession() as session:
+        '''
+        okx pages go from till_ts back to since_ts, only the bars in [since_ts, till_ts) are kept. every backfill_window_pages pages are converted and spooled to disk and the cursor is checkpointed,
+        and the chunks are written oldest first once the range is complete, so each write appends and only one chunk is read back at a time.
+        a download that died part way resumes from its checkpoint, then the bars after the checkpointed range are downloaded.
+        '''
+        mode = 'Updated' if DataWriter.file_exists('okx', base, quote) else 'Downloaded'
+        checkpoint = DownloadCheckpoint(self.checkpoint_dir, 'okx', base, quote)
+        spool_dir = os.path.join(self.checkpoint_dir, 'okx-' + base + '-' + quote)
+        state = checkpoint.load()
+        next_since_ts = None
+        if DownloadCheckpoint.can_resume(state, symbol, bar_size, since_ts, till_ts):
+            print(f'Resuming okx-{symbol} from checkpoint: {state["num_records"]} records already downloaded')
+            spool = OHLCSpool(spool_dir, state['num_chunks'], state['num_records'])
+            next_since_ts = state['till_ts']
+        else:
+            # a checkpoint left by a download of another range is dropped. a series is downloaded by one worker at a time,
+            # so no other job is using the spool
+            if state is not None:
+                print(f'Dropping the okx-{symbol} checkpoint of another range {state.get("since_ts")}-{state.get("till_ts")}')
+            state = {'symbol': symbol, 'bar': bar_size, 'since_ts': since_ts, 'till_ts': till_ts, 'cursor': till_ts,
+                     'num_chunks': 0, 'num_records': 0, 'fetched': False}
+            spool = OHLCSpool(spool_dir)
+            spool.clear()
+        if not state['fetched']:
+            get_ts = self.__ohlcv_timestamp_getters['okx']
+            cursor = state['cursor']
+            ohlcv = []
+            num_pages = 0
             while True:
-                params = {
-                    'instId':symbol,
-                    'after':till_ts,
-                    'bar': bar_size,
-                }
-                async with session.get(url=self.ohlc_endpoints['okx'], params=params) as resp:
-                    res = await resp.json()
-                    if 'data' in list(res.keys()):
-                        ohlcv.extend(res['data'])
-                        if len(res['data']) < 0.5 * self.max_download_per_trial['okx']:
-                            break
-                        elif since_ts >= till_ts:
-                            break
-                        else:
-                            till_ts = int(res['data'][-1][0])
-                    else:
-                        print('OKX downloaded ohlc data is not expected format!')
-                        print(res)
-                        break
-                await asyncio.sleep(0.1)
+                page = await self.__request_with_retries('okx', self.__request_okx_page, symbol, cursor, bar_size)
+                if page is None:
+                    # the checkpoint keeps the pages fetched so far, the next run resumes from the cursor
+                    if len(ohlcv) > 0:
+                        await self.__spool_chunk('okx', ohlcv, symbol, base, quote, spool)
+                    state.update(cursor=cursor, num_chunks=spool.num_chunks, num_records=spool.num_records)
+                    checkpoint.save(state)
+                    print(f'Stopped okx-{symbol} at {cursor}, the next run resumes from there')
+                    return 0
+                # the last page reaches back before since_ts, those bars are stored already
+                ohlcv.extend(row for row in page if state['since_ts'] <= get_ts(row) < state['till_ts'])
+                num_pages += 1
+                Metrics.inc('ohlcv_pages_total', exchange='okx')
+                if len(page) < 0.5 * self.max_download_per_trial['okx']:
+                    break
+                elif state['since_ts'] >= cursor:
+                    break
+                cursor = int(page[-1][0])
+                if num_pages % self.backfill_window_pages == 0:
+                    await self.__spool_chunk('okx', ohlcv, symbol, base, quote, spool)
+                    ohlcv = []
+                    state.update(cursor=cursor, num_chunks=spool.num_chunks, num_records=spool.num_records)
+                    checkpoint.save(state)
             if len(ohlcv) > 0:
-                mode = 'Updated' if DataWriter.file_exists('okx', base, quote) else 'Downloaded'
-                print(f'{mode} okx-{symbol} ({base}-{quote}): {len(ohlcv)} records')
-                await OHLCConverter.convert_ohlc('okx', ohlcv, symbol, base, quote)
-                await DataWriter.write_data('okx', symbol, base, quote)
-            else:
-                print(f'No new data for okx-{symbol}')
+                await self.__spool_chunk('okx', ohlcv, symbol, base, quote, spool)
+            state.update(cursor=cursor, num_chunks=spool.num_chunks, num_records=spool.num_records, fetched=True)
+            checkpoint.save(state)
+        for series in spool.get_chunks(reverse=True):
+            await DataWriter.write_data('okx', symbol, base, quote, series)
+        # the checkpoint is dropped only once the queued chunks are on disk, a crash before that writes them again on resume
+        await DataWriter.flush('okx', base, quote)
+        num_records = spool.num_records
+        if num_records > 0:
+            print(f'{mode} okx-{symbol} ({base}-{quote}): {num_records} records')
+        else:
+            print(f'No new data for okx-{symbol}')
+        spool.clear()
+        checkpoint.remove()
+        if next_since_ts is not None and next_since_ts < till_ts:
+            num_records += await self.__download_okx_ohlcv(symbol, base, quote, next_since_ts, till_ts, bar_size)
+        return num_records
+
+    async def __spool_chunk(self, ex_name, ohlcv, symbol, base, quote, spool):
+        if len(ohlcv) == 0:
+            return
+        spool.add(await OHLCConverter.convert_ohlc(ex_name, ohlcv))
 
 
 
     
     async def __download_bybit_ohlcv(self, symbol, base, quote, since_ts, till_ts, interval):
-        ohlcv = []
-        async with aiohttp.ClientSession() as session:
-            while True:
-                params = {
-                    'symbol':symbol,
-                    'start':since_ts,
-                    'interval': interval,
-                }
-                async with session.get(url=self.ohlc_endpoints['bybit'], params=params) as resp:
-                    res = await resp.json()
-                    if res['retMsg'] == 'OK':
-                        ohlcv.extend(reversed(res['result']['list']))
-                        if len(res['result']['list']) < 0.5 * self.max_download_per_trial['bybit']:
-                            break
-                        elif  int(res['result']['list'][0][0]) >= till_ts:
-                            break
-                        else:
-                            since_ts = int(res['result']['list'][0][0]) + int(res['result']['list'][0][0]) - int(res['result']['list'][1][0])
-                    else:
-                        print('Bybit downloaded ohlc data is not expected format!')
-                        print(res)
-                        break
-                await asyncio.sleep(0.1)
-            if len(ohlcv) > 0:
-                mode = 'Updated' if DataWriter.file_exists('bybit', base, quote) else 'Downloaded'
-                print(f'{mode} bybit-{symbol} ({base}-{quote}): {len(ohlcv)} records')
-                await OHLCConverter.convert_ohlc('bybit', ohlcv, symbol, base, quote)
-                await DataWriter.write_data('bybit', symbol, base, quote)
-            else:
-                print(f'No new data for bybit-{symbol}')
+        mode = 'Updated' if DataWriter.file_exists('bybit', base, quote) else 'Downloaded'
+        num_records = await self.__download_sharded_ohlcv('bybit', symbol, base, quote, since_ts, till_ts, interval)
+        if num_records > 0:
+            print(f'{mode} bybit-{symbol} ({base}-{quote}): {num_records} records')
+        else:
+            print(f'No new data for bybit-{symbol}')
+        return num_records
 
 
     async def __download_dydx_ohlcv(self, symbol, base, quote, since_ts, till_ts, interval):
-        ohlcv = []
-        since_ts = since_ts/1000
-        async with aiohttp.ClientSession() as session:
-            while True:
-                # Convert the timestamp to a datetime object
-                since_ts_iso = datetime.datetime.utcfromtimestamp(int(since_ts)).isoformat()
-                params = {
-                    'resolution':interval,
-                    'fromISO':since_ts_iso,
-                }
-                async with session.get(url=self.ohlc_endpoints['dydx']+symbol, params=params) as resp:
-                    res = await resp.json()
-                    if 'candles' in res:
-                        ohlcv.extend(reversed(res['candles']))
-                        if len(res['candles']) < 0.5 * self.max_download_per_trial['dydx']:
-                            break
-                        else:
-                            #一番新しいiso日時をtsに変換して10sec加算して再びisoに変換する
-                            since_ts = int(isoparse(res['candles'][0]['startedAt']).timestamp()) + 1
-                            since_ts_iso = datetime.datetime.utcfromtimestamp(since_ts).isoformat()
-                            pass
-                    else:
-                        print('Dydx downloaded ohlc data is not expected format!')
-                        print(res)
-                        break
-                await asyncio.sleep(0.1)
-            if len(ohlcv) > 0:
-                mode = 'Updated' if DataWriter.file_exists('dydx', base, quote) else 'Downloaded'
-                print(f'{mode} dydx-{symbol} ({base}-{quote}): {len(ohlcv)} records')
-                await OHLCConverter.convert_ohlc('dydx', ohlcv, symbol, base, quote)
-                await DataWriter.write_data('dydx', symbol, base, quote)
-            else:
-                print(f'No new data for dydx-{symbol}')
+        mode = 'Updated' if DataWriter.file_exists('dydx', base, quote) else 'Downloaded'
+        num_records = await self.__download_sharded_ohlcv('dydx', symbol, base, quote, since_ts, till_ts, interval)
+        if num_records > 0:
+            print(f'{mode} dydx-{symbol} ({base}-{quote}): {num_records} records')
+        else:
+            print(f'No new data for dydx-{symbol}')
+        return num_records
 
 
-    '''
-    since 2023-06-13 11:29:06です, 2023-06-14 12:28:10です
-    end  2023-06-15 11:29:55です
-    '''
     async def __download_apexpro_ohlcv(self, symbol, base, quote, since_ts, till_ts, interval):
-        ohlcv = []
-        since_ts = int(since_ts / 1000)
-        end_ts = since_ts + (interval * 60 * 1499)
-        till_ts = int(till_ts/1000)
-        normal_termination = True
-        async with aiohttp.ClientSession() as session:
-            while True:
-                params = {
-                    'symbol':symbol,
-                    'start':since_ts,
-                    'end':end_ts,
-                    'interval': interval,
-                }
-                async with session.get(url=self.ohlc_endpoints['apexpro'], params=params) as resp:
-                    res = await resp.json()
-                    if len(res['data']) > 0:
-                        ohlcv.extend(res['data'][symbol])
-                        if len(res['data'][symbol]) < 0.5 * self.max_download_per_trial['apexpro']:
-                            break
-                        elif int(res['data'][symbol][-1]['t'] / 1000) + 60 >= till_ts:
-                            break
-                        else:
-                            since_ts = int(res['data'][symbol][-1]['t'] / 1000) + 10 #2023-06-14 12:25:10です
-                            end_ts = min(since_ts + (interval * 60 * 1499), till_ts) #2023-06-15 11:26:32です, 2023-06-15 13:24:10です
-                    else:
-                        print('ApeX pro downloaded ohlc data is not expected format for ', symbol)
-                        print(res)
-                        normal_termination = False
-                        break
-                await asyncio.sleep(0.01)
-            if normal_termination:
-                if len(ohlcv) > 0:
-                    mode = 'Updated' if DataWriter.file_exists('apexpro', base, quote) else 'Downloaded'
-                    print(f'{mode} apexpro-{symbol} ({base}-{quote}): {len(ohlcv)} records')
-                    await OHLCConverter.convert_ohlc('apexpro', ohlcv, symbol, base, quote)
-                    await DataWriter.write_data('apexpro', symbol, base, quote)
-                else:
-                    print(f'No new data for apexpro-{symbol}')
+        mode = 'Updated' if DataWriter.file_exists('apexpro', base, quote) else 'Downloaded'
+        num_records = await self.__download_sharded_ohlcv('apexpro', symbol, base, quote, since_ts, till_ts, interval)
+        if num_records > 0:
+            print(f'{mode} apexpro-{symbol} ({base}-{quote}): {num_records} records')
+        else:
+            print(f'No new data for apexpro-{symbol}')
+        return num_records
+
+
+    async def __download_sharded_ohlcv(self, ex_name, symbol, base, quote, since_ts, till_ts, interval):
+        '''
+        splits [since_ts, till_ts] into windows of backfill_window_pages pages and fetches up to backfill_shards[ex_name] windows concurrently.
+        each window is converted and written as soon as it and every window before it are done, so writes stay in time order (appends)
+        and at most backfill_shards[ex_name] windows of pages are in memory however long the range is.
+        stops at the first page not in the expected format or the first failed write (raised), the windows written before it are kept
+        and the next run continues after them.
+        returns the number of records written.
+        '''
+        interval_ms = Interval.to_ms(ex_name, interval)
+        window_ms = interval_ms * self.max_download_per_trial[ex_name] * self.backfill_window_pages
+        windows = []
+        window_start = since_ts
+        while window_start <= till_ts:
+            windows.append((window_start, min(window_start + window_ms - 1, till_ts)))
+            window_start += window_ms
+        windows = iter(windows)
+        fetching = collections.deque()
+
+        def fetch_next_window():
+            window = next(windows, None)
+            if window is not None:
+                fetching.append(asyncio.create_task(self.__fetch_ohlcv_range(ex_name, symbol, window[0], window[1], interval, interval_ms)))
+
+        for i in range(self.backfill_shards[ex_name]):
+            fetch_next_window()
+        num_records = 0
+        try:
+            while len(fetching) > 0:
+                pages = await fetching.popleft()
+                if pages is None:
+                    break
+                fetch_next_window()
+                if len(pages) == 0:
+                    continue
+                series = await self.__stitch_pages(ex_name, pages)
+                await DataWriter.write_data(ex_name, symbol, base, quote, series)
+                num_records += len(series)
+            # a failed write raises here, or from the write_data of a later window, which then is not written
+            await DataWriter.flush(ex_name, base, quote)
+        finally:
+            for task in fetching:
+                task.cancel()
+        return num_records
+
+    async def __stitch_pages(self, ex_name, pages):
+        '''
+        pages inside a window can overlap, so they are stitched back by timestamp into one sorted series
+        '''
+        if isinstance(pages[0], OHLCSeries):
+            series = OHLCSeries.concat(pages)
+            _, index = np.unique(series.timestamp, return_index=True)
+            return series.take(index)
+        get_ts = self.__ohlcv_timestamp_getters[ex_name]
+        ohlcv = {}
+        for page in pages:
+            for row in page:
+                ohlcv[get_ts(row)] = row
+        return await OHLCConverter.convert_ohlc(ex_name, [ohlcv[ts] for ts in sorted(ohlcv)])
+
+    async def __fetch_ohlcv_range(self, ex_name, symbol, start_ts, end_ts, interval, interval_ms):
+        '''
+        fetches every bar in [start_ts, end_ts] without assuming which end of the range a page is taken from.
+        each page covers [oldest, newest] of its rows, so only the parts of the range on either side of it are requested again.
+        a short or empty page therefore never ends the range early, and rows outside the requested range are dropped.
+        returns the pages, raw rows or OHLCSeries when fast_kline_decode is on, or None if a page was not in the expected format.
+        '''
+        request_page = self.__ohlcv_page_requesters[ex_name]
+        get_ts = self.__ohlcv_timestamp_getters[ex_name]
+        pages = []
+        pending = [(start_ts, end_ts)]
+        while len(pending) > 0:
+            lo, hi = pending.pop()
+            page = await self.__request_with_retries(ex_name, request_page, symbol, lo, hi, interval)
+            if page is None:
+                return None
+            Metrics.inc('ohlcv_pages_total', exchange=ex_name)
+            if isinstance(page, OHLCSeries):
+                page = page.take((page.timestamp >= lo) & (page.timestamp <= hi))
+                page_ts = page.timestamp
+            else:
+                page = [row for row in page if lo <= get_ts(row) <= hi]
+                page_ts = [get_ts(row) for row in page]
+            if len(page) == 0:
+                continue
+            pages.append(page)
+            oldest, newest = int(min(page_ts)), int(max(page_ts))
+            if newest + interval_ms <= hi:
+                pending.append((newest + interval_ms, hi))
+            if oldest - interval_ms >= lo:
+                pending.append((lo, oldest - interval_ms))
+        return pages
+
+    async def __request_with_retries(self, ex_name, request_page, *args):
+        '''
+        requests the page again while the response is an error payload instead of bars, up to the client's max_retries times.
+        429 / 5xx responses are retried by HttpClient, and raised here once it gives up.
+        '''
+        client = self.http_clients[ex_name]
+        for attempt in range(client.max_retries + 1):
+            if attempt > 0:
+                await client.backoff(attempt)
+            page = await request_page(*args)
+            if page is not None:
+                return page
+        return None
 
+    async def __request_okx_page(self, symbol, cursor, bar_size):
+        params = {
+            'instId':symbol,
+            'after':cursor,
+            'bar': bar_size,
+        }
+        async with self.http_clients['okx'].get(url=self.ohlc_endpoints['okx'], params=params) as resp:
+            resp.raise_for_status()
+            res = await resp.json()
+        if 'data' in res:
+            return res['data']
+        print('OKX downloaded ohlc data is not expected format!')
+        print(res)
+        return None
+
+    async def __request_bybit_page(self, symbol, start_ts, end_ts, interval):
+        params = {
+            'symbol':symbol,
+            'start':start_ts,
+            'end':end_ts,
+            'interval': interval,
+            'limit': self.max_download_per_trial['bybit'],
+        }
+        async with self.http_clients['bybit'].get(url=self.ohlc_endpoints['bybit'], params=params) as resp:
+            resp.raise_for_status()
+            if self.fast_kline_decode:
+                body = await resp.read()
+            else:
+                res = await resp.json()
+        if self.fast_kline_decode:
+            return await self.__decode_page('bybit', body, symbol)
+        if res.get('retMsg') == 'OK':
+            return res['result']['list']
+        print('Bybit downloaded ohlc data is not expected format!')
+        print(res)
+        return None
+
+    async def __request_dydx_page(self, symbol, start_ts, end_ts, interval):
+        params = {
+            'resolution':interval,
+            'fromISO':self.__to_iso(start_ts),
+            'toISO':self.__to_iso(end_ts),
+            'limit': self.max_download_per_trial['dydx'],
+        }
+        async with self.http_clients['dydx'].get(url=self.ohlc_endpoints['dydx']+symbol, params=params) as resp:
+            resp.raise_for_status()
+            if self.fast_kline_decode:
+                body = await resp.read()
+            else:
+                res = await resp.json()
+        if self.fast_kline_decode:
+            return await self.__decode_page('dydx', body, symbol)
+        if 'candles' in res:
+            return res['candles']
+        print('Dydx downloaded ohlc data is not expected format!')
+        print(res)
+        return None
+
+    async def __request_apexpro_page(self, symbol, start_ts, end_ts, interval):
+        params = {
+            'symbol':symbol,
+            'start':int(start_ts / 1000),
+            'end':int(end_ts / 1000),
+            'interval': interval,
+            'limit': self.max_download_per_trial['apexpro'],
+        }
+        async with self.http_clients['apexpro'].get(url=self.ohlc_endpoints['apexpro'], params=params) as resp:
+            resp.raise_for_status()
+            if self.fast_kline_decode:
+                body = await resp.read()
+            else:
+                res = await resp.json()
+        if self.fast_kline_decode:
+            return await self.__decode_page('apexpro', body, symbol)
+        if isinstance(res.get('data'), dict):
+            #an empty dict means there is no bar in the requested range
+            return res['data'].get(symbol, [])
+        print('ApeX pro downloaded ohlc data is not expected format for ', symbol)
+        print(res)
+        return None
+
+    @staticmethod
+    async def __decode_page(ex_name, body, symbol):
+        '''
+        decodes the raw bytes in the ProcessPool when it is enabled, after the response is released, so only the typed columns come back to the event loop
+        '''
+        with Metrics.timer('ohlc_convert_seconds', exchange=ex_name):
+            page = await ProcessPool.run(KlineDecoder.decode, ex_name, body, symbol)
+        if page is None:
+            print(f'{ex_name} downloaded ohlc data is not expected format for {symbol}')
+            print(body[:500])
+        return page
+
+    @staticmethod
+    def __to_iso(ts):
+        return datetime.datetime.fromtimestamp(ts / 1000, tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
 
 
     async def __get_tickers(self):
-        async with aiohttp.ClientSession() as session:
-            for ex in self.exhanges:
-                async with session.get(self.ticker_endpoints[ex]) as resp:
-                    res = await resp.json()
-                    TickerConverter.convert_ticker(ex, res)
-                    tickers = TickerData.get_tickers_by_exchange(ex)
-                    print('Download Ticker Done for ', ex, ', num tikcers=', len(tickers))
+        '''
+        registers the tickers of every exchange from the instrument catalog, downloading the lists older than instrument_catalog_ttl_sec
+        '''
+        changes = await self.catalog.refresh(self.exhanges, self.__fetch_tickers)
+        for ex in self.exhanges:
+            tickers = TickerData.get_tickers_by_exchange(ex)
+            Metrics.set_gauge('instruments', len(tickers), exchange=ex)
+            if ex not in changes:
+                print('Tickers of', ex, 'from the instrument catalog, num tickers=', len(tickers))
+                continue
+            listed, delisted = changes[ex]
+            print('Download Ticker Done for ', ex, ', num tikcers=', len(tickers))
+            if len(listed) > 0 and len(listed) < len(tickers):
+                print(f'  {ex} newly listed: {", ".join(listed)}')
+            if len(delisted) > 0:
+                print(f'  {ex} delisted: {", ".join(delisted)}')
+
+    async def __fetch_tickers(self, ex_name):
+        res = await self.http_clients[ex_name].get_json(self.ticker_endpoints[ex_name])
+        TickerData.set_tickers(ex_name, [])
+        TickerConverter.convert_ticker(ex_name, res)
+        return TickerData.get_tickers_by_exchange(ex_name)
 
 
 
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from StorageBackend import StorageBackend, CsvStorage
+from OHLCRollup import OHLCRollup
+
+
+class DataReader:
+    '''
+    reads stored OHLC series back. only the rows in the requested range are read from disk:
+    csv binary searches the byte offsets of the range, parquet skips the months outside it and binary maps the records.
+    '''
+    storage = CsvStorage('./app/Data')
+    storage_format = 'csv'
+    data_dir = './app/Data'
+    rollup_storages = {}
+
+    def __init__(self) -> None:
+        pass
+
+    @classmethod
+    def initialize(cls, storage_format='csv', data_dir='./app/Data'):
+        """Select the storage backend series are read from"""
+        cls.storage = StorageBackend.create(storage_format, data_dir)
+        cls.storage_format = storage_format
+        cls.data_dir = data_dir
+        cls.rollup_storages = {}
+
+    @classmethod
+    def load(cls, exchange, base, quote, start=None, end=None, columns=None, as_frame=True, timeframe=None):
+        """
+        Load the bars with start <= timestamp <= end.
+        start / end are ms timestamps, datetimes or date strings (UTC), None means the beginning / end of the series.
+        timeframe (e.g. '1h') reads a rollup built by OHLCRollup instead of the downloaded series.
+        Returns a DataFrame, or a dict of numpy arrays if as_frame is False. None if the series isn't stored.
+        """
+        df = cls.get_storage(timeframe).read(exchange, base, quote, cls.to_ms(start), cls.to_ms(end), columns)
+        if df is None or as_frame:
+            return df
+        return {column: df[column].to_numpy() for column in df.columns}
+
+    @classmethod
+    def get_series_info(cls, exchange, base, quote, timeframe=None):
+        """Get the manifest entry (first_ts, last_ts, rows, interval_ms, size) of the series, or None if file doesn't exist"""
+        return cls.get_storage(timeframe).get_series_info(exchange, base, quote)
+
+    @classmethod
+    def get_storage(cls, timeframe=None):
+        if timeframe is None:
+            return cls.storage
+        if timeframe not in cls.rollup_storages:
+            OHLCRollup.to_ms(timeframe)
+            cls.rollup_storages[timeframe] = StorageBackend.create(cls.storage_format, OHLCRollup.get_rollup_dir(cls.data_dir, timeframe))
+        return cls.rollup_storages[timeframe]
+
+    @staticmethod
+    def to_ms(value):
+        if value is None or isinstance(value, (int, np.integer)):
+            return value
+        ts = pd.Timestamp(value)
+        if ts.tzinfo is None:
+            ts = ts.tz_localize('UTC')
+        return int(ts.timestamp() * 1000)
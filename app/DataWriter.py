@@ -1,85 +1,104 @@
-import pandas as pd
 import asyncio
-import os
-import pandas as pd
+import collections
 import csv
 
-from OHLCData import OHLCData
 from TickerData import TickerData
+from StorageBackend import StorageBackend, CsvStorage
+from OHLCRollup import OHLCRollup
+from ProcessPool import ProcessPool
+from WriterQueue import WriterQueue
+from Metrics import Metrics
 
 class DataWriter:
+    storage = CsvStorage('./app/Data')
+    rollup = None
+    writer_queue = None
+    writer_stats = None
+    write_locks = collections.defaultdict(asyncio.Lock)
+
     def __init__(self) -> None:
         pass
-    
+
+    @classmethod
+    def initialize(cls, storage_format='csv', data_dir='./app/Data', rollup_timeframes=None):
+        """Select the storage backend (csv, parquet or binary) all series are written to, and the timeframes rolled up from them"""
+        cls.storage = StorageBackend.create(storage_format, data_dir)
+        cls.rollup = OHLCRollup(cls.storage, storage_format, data_dir, rollup_timeframes) if rollup_timeframes else None
+        cls.write_locks = collections.defaultdict(asyncio.Lock)
+
     @classmethod
     def get_last_timestamp(cls, exchange, base, quote):
-        """Get the last timestamp from existing data file, or None if file doesn't exist"""
-        file_name = exchange + '-' + base + '-' + quote + '.csv'
-        file_path = './app/Data/' + file_name
-        
-        if not os.path.exists(file_path):
-            return None
-        
-        try:
-            df = pd.read_csv(file_path)
-            if len(df) > 0 and 'timestamp' in df.columns:
-                return int(df['timestamp'].max())
-        except Exception as e:
-            print(f'Error reading existing file {file_name}: {e}')
-        
-        return None
+        """Get the last timestamp of the series from the manifest, or None if file doesn't exist"""
+        entry = cls.get_series_info(exchange, base, quote)
+        return entry['last_ts'] if entry is not None else None
+
+    @classmethod
+    def get_series_info(cls, exchange, base, quote):
+        """Get the manifest entry (first_ts, last_ts, rows, interval_ms, size) of the series, or None if file doesn't exist"""
+        return cls.storage.get_series_info(exchange, base, quote)
     
     @classmethod
     def file_exists(cls, exchange, base, quote):
         """Check if data file exists for given exchange, base, and quote"""
-        file_name = exchange + '-' + base + '-' + quote + '.csv'
-        file_path = './app/Data/' + file_name
-        return os.path.exists(file_path)
+        return cls.storage.exists(exchange, base, quote)
     
     @classmethod
-    async def write_data(self, exchange, symbol, base, quote):
-        #file_name = exchange + '-' + base + '-' + quote + '.parquet'
-        file_name = exchange + '-' + base + '-' + quote + '.csv'
-        file_path = './app/Data/' + file_name
-        counter = 0
-        while True:
-            if OHLCData.has_data(exchange, symbol, base, quote):
-                break
-            await asyncio.sleep(1)
-            counter += 1
-            if counter > 10:
-                print('Data is not found in data writer!')
-                print(exchange, symbol, base, quote)
-                return
-        
-        data = OHLCData.get_data(exchange, symbol, base, quote)
-        new_df = pd.DataFrame(data)
-        if exchange == 'okx':
-            new_df = new_df.iloc[::-1].reset_index(drop=True)
-        
-        # Check if file exists and append if it does
-        if os.path.exists(file_path):
-            try:
-                existing_df = pd.read_csv(file_path)
-                # Combine existing and new data
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-                # Remove duplicates based on timestamp, keeping the last occurrence
-                combined_df = combined_df.drop_duplicates(subset=['timestamp'], keep='last')
-                # Sort by timestamp
-                combined_df = combined_df.sort_values('timestamp').reset_index(drop=True)
-                combined_df.to_csv(file_path, index=False)
-            except Exception as e:
-                print(f'Error appending to existing file {file_name}: {e}')
-                # Fallback to overwriting
-                new_df.to_csv(file_path, index=False)
+    async def write_data(self, exchange, symbol, base, quote, series):
+        """
+        Write the series converted by OHLCConverter.convert_ohlc
+        """
+        if self.writer_queue is not None:
+            await self.writer_queue.put(exchange, base, quote, series)
         else:
-            # Create Data directory if it doesn't exist
-            os.makedirs('./app/Data', exist_ok=True)
-            new_df.to_csv(file_path, index=False)
-        
-        OHLCData.delete_data(exchange, symbol, base, quote)
+            await self.write_series_async(exchange, base, quote, series)
+
+    @classmethod
+    async def write_series_async(cls, exchange, base, quote, series):
+        """
+        Write the series off the event loop: in a ProcessPool worker when the pool is enabled, otherwise in a thread.
+        Writes of one series wait for each other, as each one merges into and replaces what the previous one wrote
+        """
+        async with cls.write_locks[(exchange, base, quote)]:
+            with Metrics.timer('series_write_seconds', exchange=exchange):
+                if ProcessPool.executor is not None:
+                    await ProcessPool.run(cls.write_series, exchange, base, quote, series)
+                else:
+                    await asyncio.to_thread(cls.write_series, exchange, base, quote, series)
+        Metrics.inc('series_written_bars_total', len(series), exchange=exchange)
+
+    @classmethod
+    def write_series(cls, exchange, base, quote, series):
+        """Write the series and update its rollups. Runs in a ProcessPool worker when the pool is enabled"""
+        cls.storage.write(exchange, base, quote, series.to_frame())
+        if cls.rollup is not None and len(series) > 0:
+            cls.rollup.update(exchange, base, quote, since=series.timestamp[0])
 
     
+    @classmethod
+    def start_writer(cls, num_workers=1, max_pending_bytes=256 * 1024 * 1024):
+        """Queue write_data calls to writer workers instead of writing inline. Must be called from the event loop"""
+        cls.writer_queue = WriterQueue(cls.write_series_async, num_workers, max_pending_bytes)
+        cls.writer_queue.start()
+
+    @classmethod
+    async def flush(cls, exchange=None, base=None, quote=None):
+        """Wait until the queued writes of the series (or of all series) are written, raises the error of a failed one"""
+        if cls.writer_queue is not None:
+            await cls.writer_queue.flush(exchange, base, quote)
+
+    @classmethod
+    async def stop_writer(cls):
+        """Write everything still queued and stop the writer workers"""
+        if cls.writer_queue is not None:
+            try:
+                await cls.writer_queue.close()
+            except Exception as e:
+                # nobody is left to retry it, the series is continued after its last stored bar by the next run
+                print(f'Error writing queued series: {e!r}')
+            cls.writer_queue.print_stats()
+            cls.writer_stats = cls.writer_queue.get_stats()
+            cls.writer_queue = None
+
     @classmethod
     async def write_ticker_data(self, exchanges):
         with open('./app/all_tickers.csv', 'w', newline='') as csvfile:
@@ -0,0 +1,51 @@
+import json
+import os
+
+
+class DownloadCheckpoint:
+    '''
+    progress of the download of one (exchange, base, quote) kept in <checkpoint_dir>/<exchange>-<base>-<quote>.json,
+    so a restarted run resumes where the previous one stopped. the file is removed once the download is written to storage.
+    '''
+    def __init__(self, checkpoint_dir, exchange, base, quote):
+        self.checkpoint_path = os.path.join(checkpoint_dir, exchange + '-' + base + '-' + quote + '.json')
+
+    def load(self):
+        '''
+        returns the saved state, or None if there is none or it can't be read
+        '''
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            print(f'Checkpoint {self.checkpoint_path} is broken and will be ignored: {e}')
+            return None
+
+    @staticmethod
+    def can_resume(state, symbol, bar, since_ts, till_ts):
+        '''
+        true if the job for [since_ts, till_ts) can continue the saved download of [state since_ts, state till_ts) and then download
+        [state till_ts, till_ts). the saved range must start at or before since_ts and reach it, e.g. an update restarted after the run
+        that wrote part of its chunks, but not a repair of another gap or an update of the bars after an interrupted repair
+        '''
+        if state is None or state.get('symbol') != symbol or state.get('bar') != bar:
+            return False
+        return state['since_ts'] <= since_ts <= state['till_ts'] <= till_ts
+
+    def save(self, state):
+        # write a temp file and rename it so a crash never leaves a half written checkpoint
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def remove(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class GapScanner:
+    '''
+    finds the missing bars of stored series. only the timestamp column is read, and gaps are found with one np.diff per series.
+    a gap is returned as (first missing ts, last missing ts).
+    '''
+    def __init__(self, storage):
+        self.storage = storage
+
+    def find_gaps(self, exchange, base, quote, interval_ms=None, start=None, end=None):
+        '''
+        interval_ms defaults to the interval in the manifest. returns [] if the series isn't stored or its interval is unknown
+        '''
+        if interval_ms is None:
+            info = self.storage.get_series_info(exchange, base, quote)
+            interval_ms = info['interval_ms'] if info is not None else None
+        if not interval_ms:
+            return []
+        df = self.storage.read(exchange, base, quote, start, end, columns=['timestamp'])
+        if df is None:
+            return []
+        return self.get_gaps(df['timestamp'].to_numpy(dtype=np.int64), interval_ms)
+
+    def scan_all(self, interval_ms=None):
+        '''
+        returns {(exchange, base, quote): gaps} of every stored series with at least one gap
+        '''
+        self.storage.rebuild_manifest()
+        gaps = {}
+        for entry in self.storage.manifest.get_entries().values():
+            series_gaps = self.find_gaps(entry['exchange'], entry['base'], entry['quote'], interval_ms)
+            if len(series_gaps) > 0:
+                gaps[(entry['exchange'], entry['base'], entry['quote'])] = series_gaps
+        return gaps
+
+    @staticmethod
+    def get_gaps(timestamps, interval_ms):
+        '''
+        timestamps must be sorted without duplicates
+        '''
+        if len(timestamps) < 2:
+            return []
+        gap_index = np.flatnonzero(np.diff(timestamps) > interval_ms)
+        return [(int(ts) + interval_ms, int(next_ts) - interval_ms) for ts, next_ts in zip(timestamps[gap_index], timestamps[gap_index + 1])]
+
+    @staticmethod
+    def count_missing(gaps, interval_ms):
+        return sum((gap_end - gap_start) // interval_ms + 1 for gap_start, gap_end in gaps)
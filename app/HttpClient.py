@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import random
+import time
+
+import aiohttp
+
+from Metrics import Metrics
+
+
+class HttpClient:
+    '''
+    Long-lived pooled HTTP client for one exchange.
+    All requests to the exchange share a single aiohttp session so keep-alive connections and DNS results are reused across symbols.
+    A 429, a 5xx or a connection error is retried up to max_retries times after an exponential backoff with full jitter.
+    '''
+    def __init__(self, ex_name, limit_per_host=10, keepalive_timeout=30, dns_cache_ttl=300, total_timeout=30, connect_timeout=10, rate_limiter=None,
+                 max_retries=5, backoff_base=0.5, backoff_max=30):
+        self.ex_name = ex_name
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.total_timeout = total_timeout
+        self.connect_timeout = connect_timeout
+        self.session = None
+        self.num_requests = 0
+        self.num_new_connections = 0
+        self.num_reused_connections = 0
+        self.num_retries = 0
+
+    @classmethod
+    def from_params(cls, ex_name, http_params, rate_limiter=None):
+        '''
+        http_params: 'http' section of params.yaml (missing keys fall back to the defaults)
+        rate_limiter: RateLimiter shared by every request of the exchange, or None for no limit
+        '''
+        http_params = http_params or {}
+        return cls(ex_name,
+                   limit_per_host=http_params.get('limit_per_host', 10),
+                   keepalive_timeout=http_params.get('keepalive_timeout', 30),
+                   dns_cache_ttl=http_params.get('dns_cache_ttl', 300),
+                   total_timeout=http_params.get('total_timeout', 30),
+                   connect_timeout=http_params.get('connect_timeout', 10),
+                   rate_limiter=rate_limiter,
+                   max_retries=http_params.get('max_retries', 5),
+                   backoff_base=http_params.get('backoff_base', 0.5),
+                   backoff_max=http_params.get('backoff_max', 30))
+
+    async def open(self):
+        if self.session is not None and not self.session.closed:
+            return
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.__on_request_start)
+        trace_config.on_connection_create_end.append(self.__on_connection_create)
+        trace_config.on_connection_reuseconn.append(self.__on_connection_reuse)
+        trace_config.on_response_chunk_received.append(self.__on_response_chunk)
+        connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host,
+                                         use_dns_cache=True,
+                                         ttl_dns_cache=self.dns_cache_ttl,
+                                         keepalive_timeout=self.keepalive_timeout)
+        timeout = aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[trace_config])
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @contextlib.asynccontextmanager
+    async def get(self, url, params=None):
+        '''
+        yields the response of the first try that isn't retried, whatever its status. a connection error of the last try is raised.
+        '''
+        attempt = 0
+        while True:
+            retry_after = None
+            yielded = False
+            try:
+                await self.__acquire()
+                # latency covers reading the body in the with block of the caller
+                with Metrics.timer('http_request_seconds', exchange=self.ex_name):
+                    async with self.session.get(url=url, params=params) as resp:
+                        Metrics.inc('http_requests_total', exchange=self.ex_name, status=resp.status)
+                        self.__on_response(resp)
+                        if attempt >= self.max_retries or not self.is_retryable(resp.status):
+                            yielded = True
+                            yield resp
+                            return
+                        retry_after = self.__get_retry_after(resp)
+                        # reading the error body lets the connection go back to the pool
+                        await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # errors raised by the caller while it reads the yielded response can't be retried here
+                if yielded or attempt >= self.max_retries:
+                    raise
+                print(f'{self.ex_name}: {e!r}, retrying')
+            attempt += 1
+            await self.backoff(attempt, retry_after)
+
+    async def backoff(self, attempt, retry_after=None):
+        '''
+        waits before the attempt-th retry: a random time up to backoff_base * 2 ** (attempt - 1) seconds, at least retry_after
+        '''
+        self.num_retries += 1
+        Metrics.inc('http_retries_total', exchange=self.ex_name)
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        await asyncio.sleep(max(delay, retry_after or 0))
+
+    @staticmethod
+    def is_retryable(status):
+        return status == 429 or status >= 500
+
+    async def get_json(self, url, params=None):
+        async with self.get(url, params=params) as resp:
+            return await resp.json()
+
+    def get_stats(self):
+        num_connections = self.num_new_connections + self.num_reused_connections
+        reuse_ratio = self.num_reused_connections / num_connections if num_connections > 0 else 0.0
+        return {'ex_name': self.ex_name,
+                'requests': self.num_requests,
+                'new_connections': self.num_new_connections,
+                'reused_connections': self.num_reused_connections,
+                'reuse_ratio': reuse_ratio,
+                'retries': self.num_retries,
+                'throttled': self.rate_limiter.num_throttled if self.rate_limiter is not None else 0,
+                'rate': self.rate_limiter.rate if self.rate_limiter is not None else None}
+
+    def print_stats(self):
+        stats = self.get_stats()
+        rate = f", rate {stats['rate']:.1f}/s" if stats['rate'] is not None else ''
+        print(f"HTTP {self.ex_name}: {stats['requests']} requests, {stats['new_connections']} new connections, "
+              f"{stats['reused_connections']} reused ({stats['reuse_ratio'] * 100:.1f}% reuse), {stats['retries']} retries, {stats['throttled']} throttled{rate}")
+
+    async def __acquire(self):
+        if self.rate_limiter is not None:
+            started_at = time.perf_counter()
+            await self.rate_limiter.acquire()
+            Metrics.inc('rate_limit_wait_seconds_total', time.perf_counter() - started_at, exchange=self.ex_name)
+
+    def __on_response(self, resp):
+        if resp.status == 429:
+            Metrics.inc('http_throttled_total', exchange=self.ex_name)
+        if self.rate_limiter is None:
+            return
+        if resp.status == 429:
+            self.rate_limiter.on_throttled(self.__get_retry_after(resp))
+        elif resp.status < 400:
+            self.rate_limiter.on_success()
+        self.rate_limiter.update_from_headers(resp.headers)
+
+    @staticmethod
+    def __get_retry_after(resp):
+        try:
+            return float(resp.headers['Retry-After'])
+        except (KeyError, ValueError):
+            return None
+
+    async def __on_request_start(self, session, trace_config_ctx, params):
+        self.num_requests += 1
+
+    async def __on_connection_create(self, session, trace_config_ctx, params):
+        self.num_new_connections += 1
+
+    async def __on_connection_reuse(self, session, trace_config_ctx, params):
+        self.num_reused_connections += 1
+
+    async def __on_response_chunk(self, session, trace_config_ctx, params):
+        Metrics.inc('http_received_bytes_total', len(params.chunk), exchange=self.ex_name)
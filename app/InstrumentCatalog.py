@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+import time
+
+from TickerData import TickerData
+
+
+class InstrumentCatalog:
+    '''
+    instrument lists of the exchanges kept in a JSON file, so an exchange's list is downloaded again only once it is older than ttl_sec.
+    stale exchanges are refreshed concurrently, and every refreshed list is diffed against the stored one to find newly listed and delisted symbols.
+    '''
+    def __init__(self, path, ttl_sec=3600):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.entries = self.__load()
+
+    def get_stale(self, exchanges):
+        now = time.time()
+        return [ex for ex in exchanges if ex not in self.entries or now - self.entries[ex]['fetched_at'] >= self.ttl_sec]
+
+    async def refresh(self, exchanges, fetch_func):
+        '''
+        awaits fetch_func(ex_name), which returns the exchange's tickers as TickerData, for every stale exchange at once,
+        then registers the tickers of every exchange in TickerData. an exchange whose refresh fails keeps its stored list.
+        returns {ex_name: (listed, delisted)} with the sorted symbols added and removed by each refresh.
+        '''
+        stale = self.get_stale(exchanges)
+        results = await asyncio.gather(*[fetch_func(ex) for ex in stale], return_exceptions=True)
+        changes = {}
+        for ex, result in zip(stale, results):
+            if isinstance(result, Exception):
+                cached = f'the list from {time.ctime(self.entries[ex]["fetched_at"])} is used' if ex in self.entries else 'no list is stored'
+                print(f'Failed to refresh {ex} instruments: {result!r}, {cached}')
+                continue
+            changes[ex] = self.__update(ex, result)
+        if len(changes) > 0:
+            self.save()
+        for ex in exchanges:
+            rows = self.entries[ex]['tickers'] if ex in self.entries else []
+            TickerData.set_tickers(ex, [TickerData(ex, *row) for row in rows])
+        return changes
+
+    def save(self):
+        # write a temp file and rename it so a crash never leaves a half written catalog, one per process as shard workers can save at once
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __update(self, ex_name, tickers):
+        old_symbols = {row[0] for row in self.entries[ex_name]['tickers']} if ex_name in self.entries else set()
+        new_symbols = {ticker.symbol for ticker in tickers}
+        self.entries[ex_name] = {'fetched_at': time.time(), 'tickers': [ticker.to_row() for ticker in tickers]}
+        return sorted(new_symbols - old_symbols), sorted(old_symbols - new_symbols)
+
+    def __load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print(f'Instrument catalog {self.path} is broken and will be downloaded again: {e}')
+            return {}
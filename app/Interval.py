@@ -0,0 +1,29 @@
+class Interval:
+    '''
+    converts the exchange specific interval notation in params.yaml (okx: '1m', bybit: 1, dydx: '1MIN', apexpro: 1) to milliseconds.
+    '''
+    __okx_units = {'m': 60000, 'H': 3600000, 'D': 86400000, 'W': 604800000, 'M': 2592000000}
+    __dydx_resolutions = {'1MIN': 60000, '5MINS': 300000, '15MINS': 900000, '30MINS': 1800000,
+                          '1HOUR': 3600000, '4HOURS': 14400000, '1DAY': 86400000}
+    __minute_letters = {'D': 86400000, 'W': 604800000, 'M': 2592000000}
+
+    @classmethod
+    def to_ms(cls, ex_name, interval):
+        '''
+        raises ValueError for a notation the exchange does not support
+        '''
+        if ex_name == 'okx':
+            # okx bars of 6H and above are aligned to UTC with the 'utc' suffix (e.g. '1Dutc'), the bar length is the same
+            value = str(interval).removesuffix('utc')
+            if value[:-1].isdigit() and int(value[:-1]) > 0 and value[-1] in cls.__okx_units:
+                return int(value[:-1]) * cls.__okx_units[value[-1]]
+        elif ex_name == 'dydx':
+            if interval in cls.__dydx_resolutions:
+                return cls.__dydx_resolutions[interval]
+        else:
+            #bybit and apexpro: minutes as a number, or D / W / M
+            if str(interval) in cls.__minute_letters:
+                return cls.__minute_letters[str(interval)]
+            if str(interval).isdigit() and int(interval) > 0:
+                return int(interval) * 60000
+        raise ValueError(f'Unsupported {ex_name} interval {interval!r} in ohlcv_data_interval')
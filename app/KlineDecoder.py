@@ -0,0 +1,133 @@
+import json
+import operator
+
+import numpy as np
+
+from OHLCData import OHLCSeries
+from OhlcConverter import OHLCConverter
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if msgspec is not None:
+    # strict=False decoding turns the quoted numbers of the responses into int / float while parsing, fields not listed are skipped
+    class BybitKline(msgspec.Struct, array_like=True):
+        timestamp: int
+        open: float
+        high: float
+        low: float
+        close: float
+
+    class BybitResult(msgspec.Struct):
+        list: list[BybitKline]
+
+    class BybitResponse(msgspec.Struct):
+        retMsg: str
+        result: BybitResult | None = None
+
+    class DydxKline(msgspec.Struct):
+        startedAt: str
+        open: float
+        high: float
+        low: float
+        close: float
+
+    class DydxResponse(msgspec.Struct):
+        candles: list[DydxKline]
+
+    class ApexproKline(msgspec.Struct):
+        t: int
+        o: float
+        h: float
+        l: float
+        c: float
+
+    class ApexproResponse(msgspec.Struct):
+        data: dict[str, list[ApexproKline]]
+
+
+class KlineDecoder:
+    '''
+    decodes the raw bytes of a bybit / dydx / apexpro kline response straight into an OHLCSeries.
+    with msgspec installed each exchange has a typed schema, so prices come out of the parser as floats without intermediate dicts of strings.
+    otherwise the body is parsed by orjson, or the json module, and converted by OHLCConverter.
+    '''
+    if msgspec is not None:
+        backend = 'msgspec'
+        __decoders = {'bybit': msgspec.json.Decoder(BybitResponse, strict=False),
+                      'dydx': msgspec.json.Decoder(DydxResponse, strict=False),
+                      'apexpro': msgspec.json.Decoder(ApexproResponse, strict=False)}
+    elif orjson is not None:
+        backend = 'orjson'
+    else:
+        backend = 'json'
+
+    @classmethod
+    def get_backends(cls):
+        backends = ['json']
+        if orjson is not None:
+            backends.insert(0, 'orjson')
+        if msgspec is not None:
+            backends.insert(0, 'msgspec')
+        return backends
+
+    @classmethod
+    def decode(cls, ex_name, body, symbol, backend=None):
+        '''
+        returns the bars of the response as an OHLCSeries, or None if the response is not in the expected format
+        '''
+        backend = backend or cls.backend
+        if backend == 'msgspec':
+            return cls.__decode_typed(ex_name, body, symbol)
+        try:
+            res = orjson.loads(body) if backend == 'orjson' else json.loads(body)
+        except ValueError:
+            return None
+        rows = cls.__get_rows(ex_name, res, symbol)
+        return OHLCConverter.to_series(ex_name, rows) if rows is not None else None
+
+    @classmethod
+    def __decode_typed(cls, ex_name, body, symbol):
+        try:
+            res = cls.__decoders[ex_name].decode(body)
+        except (msgspec.DecodeError, msgspec.ValidationError):
+            return None
+        if ex_name == 'bybit':
+            if res.retMsg != 'OK' or res.result is None:
+                return None
+            rows = res.result.list
+            return cls.__to_series(rows, 'timestamp', ('open', 'high', 'low', 'close'))
+        elif ex_name == 'dydx':
+            rows = res.candles
+            started_at = np.array([row.startedAt for row in rows], dtype=str)
+            timestamps = np.char.rstrip(started_at, 'Z').astype('datetime64[ms]').astype(np.int64)
+            return OHLCSeries(timestamps, *cls.__to_price_columns(rows, ('open', 'high', 'low', 'close')))
+        #an empty dict means there is no bar in the requested range
+        rows = res.data.get(symbol, [])
+        return cls.__to_series(rows, 't', ('o', 'h', 'l', 'c'))
+
+    @staticmethod
+    def __get_rows(ex_name, res, symbol):
+        # same checks as the page requesters of DataDownLoader
+        if ex_name == 'bybit':
+            return res['result']['list'] if res.get('retMsg') == 'OK' else None
+        elif ex_name == 'dydx':
+            return res['candles'] if 'candles' in res else None
+        return res['data'].get(symbol, []) if isinstance(res.get('data'), dict) else None
+
+    @classmethod
+    def __to_series(cls, rows, ts_field, price_fields):
+        timestamps = np.fromiter(map(operator.attrgetter(ts_field), rows), dtype=np.int64, count=len(rows))
+        return OHLCSeries(timestamps, *cls.__to_price_columns(rows, price_fields))
+
+    @staticmethod
+    def __to_price_columns(rows, fields):
+        return [np.fromiter(map(operator.attrgetter(field), rows), dtype=np.float64, count=len(rows)) for field in fields]
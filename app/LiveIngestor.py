@@ -0,0 +1,176 @@
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+from dateutil.parser import isoparse
+
+from Metrics import Metrics
+
+
+class LiveIngestor:
+    '''
+    subscribes to the kline channels of an exchange's WebSocket API with up to symbols_per_connection symbols multiplexed on each connection,
+    and awaits on_bar(ex_name, symbol, (ts, open, high, low, close)) for every confirmed (closed) bar.
+    once the symbols of a connection are subscribed, after the first connect and every reconnect, on_connected(ex_name, symbols) is called,
+    so the bars missed while disconnected can be back-filled over REST. it must not block, bars arriving meanwhile are passed to on_bar.
+    dydx frames have no confirm flag, a candle is closed once a candle with a later start arrives.
+    '''
+    __channels = {'okx': lambda symbol, interval: {'channel': 'candle' + str(interval), 'instId': symbol},
+                  'bybit': lambda symbol, interval: f'kline.{interval}.{symbol}',
+                  'dydx': lambda symbol, interval: symbol + '/' + str(interval),
+                  'apexpro': lambda symbol, interval: f'candle.{interval}.{symbol}'}
+    # max channels per subscribe request
+    subscribe_batch = 10
+
+    def __init__(self, ex_name, url, symbols, interval, on_bar, on_connected, symbols_per_connection=50, heartbeat_sec=20,
+                 reconnect_delay_sec=1, reconnect_max_sec=30):
+        self.ex_name = ex_name
+        self.url = url
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.on_bar = on_bar
+        self.on_connected = on_connected
+        self.symbols_per_connection = symbols_per_connection
+        self.heartbeat_sec = heartbeat_sec
+        self.reconnect_delay_sec = reconnect_delay_sec
+        self.reconnect_max_sec = reconnect_max_sec
+        self.open_candles = {}
+        self.num_connects = 0
+        self.num_bars = 0
+        self.session = None
+        self.__stop_event = asyncio.Event()
+
+    async def run(self):
+        '''
+        keeps every connection open, reconnecting with backoff, until stop() is called
+        '''
+        self.session = aiohttp.ClientSession()
+        try:
+            groups = [self.symbols[i:i + self.symbols_per_connection] for i in range(0, len(self.symbols), self.symbols_per_connection)]
+            await asyncio.gather(*[self.__run_connection(symbols) for symbols in groups])
+        finally:
+            await self.session.close()
+
+    def stop(self):
+        self.__stop_event.set()
+
+    async def __run_connection(self, symbols):
+        attempt = 0
+        num_connects = 0
+        while not self.__stop_event.is_set():
+            try:
+                async with self.session.ws_connect(self.url, heartbeat=self.heartbeat_sec) as ws:
+                    attempt = 0
+                    for symbol in symbols:
+                        self.open_candles.pop(symbol, None)
+                    await self.__subscribe(ws, symbols)
+                    self.num_connects += 1
+                    num_connects += 1
+                    if num_connects > 1:
+                        Metrics.inc('live_reconnects_total', exchange=self.ex_name)
+                    self.on_connected(self.ex_name, symbols)
+                    await self.__read(ws)
+                if not self.__stop_event.is_set():
+                    print(f'{self.ex_name} WebSocket closed by the server, reconnecting')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f'{self.ex_name} WebSocket error: {e!r}')
+            if self.__stop_event.is_set():
+                return
+            attempt += 1
+            delay = random.uniform(0, min(self.reconnect_max_sec, self.reconnect_delay_sec * 2 ** (attempt - 1)))
+            try:
+                await asyncio.wait_for(self.__stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def __subscribe(self, ws, symbols):
+        channels = [self.__channels[self.ex_name](symbol, self.interval) for symbol in symbols]
+        if self.ex_name == 'dydx':
+            for channel in channels:
+                await ws.send_json({'type': 'subscribe', 'channel': 'v4_candles', 'id': channel})
+            return
+        for i in range(0, len(channels), self.subscribe_batch):
+            await ws.send_json({'op': 'subscribe', 'args': channels[i:i + self.subscribe_batch]})
+
+    async def __read(self, ws):
+        '''
+        hands the confirmed bars to on_bar until the connection closes or stop() is called. okx, bybit and apexpro need a ping message
+        at least every heartbeat_sec besides the WebSocket pings
+        '''
+        ping_task = asyncio.create_task(self.__send_pings(ws))
+        stop_task = asyncio.create_task(self.__stop_event.wait())
+        try:
+            while True:
+                receive_task = asyncio.create_task(ws.receive())
+                await asyncio.wait([receive_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+                if not receive_task.done():
+                    receive_task.cancel()
+                    return
+                msg = receive_task.result()
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    return
+                for symbol, bar in self.parse_message(msg.data):
+                    self.num_bars += 1
+                    Metrics.inc('live_bars_total', exchange=self.ex_name)
+                    await self.on_bar(self.ex_name, symbol, bar)
+        finally:
+            ping_task.cancel()
+            stop_task.cancel()
+
+    async def __send_pings(self, ws):
+        if self.ex_name == 'dydx':
+            return
+        while True:
+            await asyncio.sleep(self.heartbeat_sec)
+            if self.ex_name == 'okx':
+                await ws.send_str('ping')
+            else:
+                await ws.send_json({'op': 'ping', 'args': [str(int(time.time() * 1000))]})
+
+    def parse_message(self, text):
+        '''
+        returns [(symbol, (ts, open, high, low, close))] of the confirmed bars in a text frame, [] for acks, pongs and unconfirmed updates
+        '''
+        if text == 'pong':
+            return []
+        message = json.loads(text)
+        if self.ex_name == 'okx':
+            if 'data' not in message:
+                return []
+            symbol = message['arg']['instId']
+            return [(symbol, (int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]))) for row in message['data'] if row[8] == '1']
+        elif self.ex_name == 'dydx':
+            return self.__parse_dydx_message(message)
+        else:
+            # bybit: kline.1.BTCUSDT, apexpro: candle.1.BTCUSDC
+            topic = message.get('topic')
+            if topic is None:
+                return []
+            symbol = topic.split('.', 2)[2]
+            return [(symbol, (int(row['start']), float(row['open']), float(row['high']), float(row['low']), float(row['close'])))
+                    for row in message['data'] if row['confirm']]
+
+    def __parse_dydx_message(self, message):
+        if message.get('channel') != 'v4_candles':
+            return []
+        if message['type'] == 'subscribed':
+            # the snapshot is newest first, only its newest candle can still change
+            candles = message['contents'].get('candles', [])[:1]
+        elif message['type'] == 'channel_batch_data':
+            candles = message['contents']
+        elif message['type'] == 'channel_data':
+            candles = [message['contents']]
+        else:
+            return []
+        bars = []
+        for candle in candles:
+            symbol = candle['ticker']
+            ts = int(isoparse(candle['startedAt']).timestamp() * 1000)
+            open_candle = self.open_candles.get(symbol)
+            if open_candle is not None and ts > open_candle[0]:
+                bars.append((symbol, open_candle))
+            if open_candle is None or ts >= open_candle[0]:
+                self.open_candles[symbol] = (ts, float(candle['open']), float(candle['high']), float(candle['low']), float(candle['close']))
+        return bars
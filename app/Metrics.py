@@ -0,0 +1,216 @@
+import asyncio
+import bisect
+import contextlib
+import json
+import os
+import time
+
+
+class Metrics:
+    '''
+    counters, gauges and histograms of the download pipeline, kept per metric name and label set (e.g. exchange='okx').
+    snapshots are written to a Prometheus text file or a JSON file, every interval_sec while the exporter runs and once more when it stops.
+    values are recorded on the event loop, so work done in ProcessPool workers is timed around the ProcessPool.run call.
+    '''
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    descriptions = {
+        'http_requests_total': 'HTTP requests sent, by exchange and status',
+        'http_request_seconds': 'HTTP request latency from send to body read',
+        'http_received_bytes_total': 'HTTP response body bytes received',
+        'http_throttled_total': 'HTTP 429 responses',
+        'http_retries_total': 'requests sent again after a 429, a 5xx, a connection error or an error payload',
+        'rate_limit_wait_seconds_total': 'time requests waited for the rate limiter',
+        'ohlcv_pages_total': 'kline pages fetched',
+        'ohlcv_records_total': 'bars downloaded',
+        'ohlc_convert_seconds': 'time to decode or convert one page or chunk into an OHLCSeries',
+        'series_write_seconds': 'time to write one series batch to storage',
+        'series_written_bars_total': 'bars written to storage',
+        'download_queue_depth': 'download jobs not started yet',
+        'instruments': 'tickers of the exchange in the instrument catalog',
+        'writer_queue_depth': 'series waiting in the writer queue',
+        'writer_queue_pending_bytes': 'bytes of bars waiting in the writer queue',
+        'daemon_polls_total': 'series polled by the daemon, tail: one request for the bars after the last stored one, catchup: a full download',
+        'daemon_poll_errors_total': 'daemon polls that failed and were retried',
+        'daemon_scheduled_series': 'series the daemon keeps up to date',
+        'live_bars_total': 'confirmed bars received over WebSocket',
+        'live_reconnects_total': 'WebSocket connections opened again after a disconnect',
+        'live_backfills_total': 'series back-filled over REST in live mode, tail: one request, catchup: a full download',
+        'live_backfill_errors_total': 'live mode back-fills that failed',
+    }
+    counters = {}
+    gauges = {}
+    histograms = {}
+    path = None
+    format = 'prometheus'
+    interval_sec = 10
+    const_labels = ()
+    exporter = None
+
+    @classmethod
+    def initialize(cls, path=None, format='prometheus', interval_sec=10, const_labels=None):
+        '''
+        path: file the snapshots are written to, None to only keep them in memory. format: 'prometheus' or 'json'
+        const_labels: labels added to every exported sample, e.g. the shard of a worker
+        '''
+        if format not in ('prometheus', 'json'):
+            raise ValueError(f'Unknown metrics format: {format}')
+        cls.counters = {}
+        cls.gauges = {}
+        cls.histograms = {}
+        cls.path = path
+        cls.format = format
+        cls.interval_sec = interval_sec
+        cls.const_labels = tuple(sorted((const_labels or {}).items()))
+
+    @classmethod
+    def from_params(cls, metrics_params, const_labels=None):
+        '''
+        metrics_params: 'metrics' section of params.yaml (missing keys fall back to the defaults)
+        '''
+        metrics_params = metrics_params or {}
+        cls.initialize(metrics_params.get('path'), metrics_params.get('format', 'prometheus'), metrics_params.get('interval_sec', 10), const_labels)
+
+    @classmethod
+    def inc(cls, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        cls.counters[key] = cls.counters.get(key, 0) + value
+
+    @classmethod
+    def set_gauge(cls, name, value, **labels):
+        cls.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    @classmethod
+    def observe(cls, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = cls.histograms.get(key)
+        if histogram is None:
+            histogram = cls.histograms[key] = {'counts': [0] * (len(cls.buckets) + 1), 'sum': 0.0, 'count': 0}
+        histogram['counts'][bisect.bisect_left(cls.buckets, value)] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+    @classmethod
+    @contextlib.contextmanager
+    def timer(cls, name, **labels):
+        '''
+        observes the time spent in the with block, also when it raises
+        '''
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe(name, time.perf_counter() - started_at, **labels)
+
+    @classmethod
+    def get_value(cls, name, **labels):
+        '''
+        value of a counter or gauge, or (count, sum) of a histogram. None if it was never recorded
+        '''
+        key = (name, tuple(sorted(labels.items())))
+        if key in cls.counters:
+            return cls.counters[key]
+        if key in cls.gauges:
+            return cls.gauges[key]
+        if key in cls.histograms:
+            return cls.histograms[key]['count'], cls.histograms[key]['sum']
+        return None
+
+    @classmethod
+    def snapshot(cls):
+        histograms = {}
+        for (name, labels), histogram in cls.histograms.items():
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip([*cls.buckets, '+Inf'], histogram['counts']):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            histograms.setdefault(name, []).append({'labels': dict(labels), 'count': histogram['count'], 'sum': histogram['sum'], 'buckets': buckets})
+        return {'timestamp': time.time(),
+                'labels': dict(cls.const_labels),
+                'counters': cls.__group(cls.counters),
+                'gauges': cls.__group(cls.gauges),
+                'histograms': histograms}
+
+    @classmethod
+    def to_prometheus(cls):
+        lines = []
+        for metric_type, name, samples in cls.__get_families():
+            if name in cls.descriptions:
+                lines.append(f'# HELP {name} {cls.descriptions[name]}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                if metric_type != 'histogram':
+                    lines.append(f'{name}{cls.__format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip([*cls.buckets, '+Inf'], value['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{cls.__format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{cls.__format_labels(labels)} {value["sum"]}')
+                lines.append(f'{name}_count{cls.__format_labels(labels)} {value["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def write(cls, path=None):
+        '''
+        writes the current snapshot, replacing the previous one atomically so a scraper never reads a partial file
+        '''
+        path = path or cls.path
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            if cls.format == 'json':
+                json.dump(cls.snapshot(), f, indent=1)
+            else:
+                f.write(cls.to_prometheus())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def start_exporter(cls):
+        '''
+        writes a snapshot every interval_sec until stop_exporter. Must be called from the event loop
+        '''
+        if cls.path is not None and cls.exporter is None:
+            cls.exporter = asyncio.create_task(cls.__export())
+
+    @classmethod
+    async def stop_exporter(cls):
+        if cls.exporter is not None:
+            cls.exporter.cancel()
+            await asyncio.gather(cls.exporter, return_exceptions=True)
+            cls.exporter = None
+        cls.write()
+
+    @classmethod
+    async def __export(cls):
+        while True:
+            await asyncio.sleep(cls.interval_sec)
+            try:
+                cls.write()
+            except OSError as e:
+                print(f'Failed to write metrics to {cls.path}: {e!r}')
+
+    @classmethod
+    def __get_families(cls):
+        families = {}
+        for metric_type, metrics in [('counter', cls.counters), ('gauge', cls.gauges), ('histogram', cls.histograms)]:
+            for (name, labels), value in metrics.items():
+                families.setdefault((metric_type, name), []).append((labels, value))
+        return [(metric_type, name, sorted(samples, key=lambda sample: sample[0])) for (metric_type, name), samples in sorted(families.items(), key=lambda item: item[0][1])]
+
+    @staticmethod
+    def __group(metrics):
+        grouped = {}
+        for (name, labels), value in metrics.items():
+            grouped.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return grouped
+
+    @classmethod
+    def __format_labels(cls, labels):
+        labels = cls.const_labels + tuple(labels)
+        if len(labels) == 0:
+            return ''
+        escaped = [(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels]
+        return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
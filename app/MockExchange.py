@@ -0,0 +1,307 @@
+import asyncio
+import collections
+import datetime
+import itertools
+import json
+import random
+import time
+
+from aiohttp import web
+
+
+class MockExchange:
+    '''
+    local aiohttp stand-in for the okx / bybit / dydx / apexpro instrument and kline endpoints, in the response formats of the real APIs.
+    every symbol has 1 minute bars from num_days before the server started until it started, the prices are derived from the timestamp.
+    latency: seconds before each response, page_size: max bars per response (the requested limit applies too),
+    error_rate / throttle_rate: fraction of kline requests answered with a 500 / a 429 in the exchange's error format.
+    rest_lag_bars: the newest bars the kline endpoints do not serve yet, while the WebSocket stand-in already streams them.
+    missing_ranges: [(since_ts, till_ts)] without bars, e.g. trading halts. a page reaching into one is filled with the bars beyond it.
+    max_requests_per_sec: kline requests allowed per exchange and second, the ones over it are answered with a 429 and a Retry-After.
+    with it, every kline response has rate limit headers (X-Bapi-Limit-* for bybit, RateLimit-* for the others).
+    kline_requests_by_symbol counts the kline requests of every (exchange, symbol).
+    max_symbols_in_flight: the most symbols of every exchange waiting out the latency of their kline requests at once.
+    /<exchange>/ws is a WebSocket stand-in that answers kline subscriptions with an ack and replays the frames of ws_recordings[(exchange, channel)]
+    (recorded frames as text), or frames generated in the exchange's format for the last ws_num_bars bars, an update and then the closed bar each.
+    ws_drop_after: the first connection of every exchange is closed after this many replayed frames.
+    '''
+    interval_ms = 60000
+
+    def __init__(self, num_symbols=4, num_days=3, latency=0.0, page_size=None, error_rate=0.0, throttle_rate=0.0, max_requests_per_sec=None, seed=0,
+                 rest_lag_bars=0, ws_num_bars=5, ws_drop_after=None, missing_ranges=()):
+        self.bases = [f'C{i:03d}' for i in range(num_symbols)]
+        self.latency = latency
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_requests_per_sec = max_requests_per_sec
+        self.windows = {}
+        self.random = random.Random(seed)
+        self.end_ts = (int(time.time() * 1000) // self.interval_ms) * self.interval_ms
+        self.start_ts = self.end_ts - num_days * 86400000
+        self.stats = {'requests': 0, 'kline_requests': 0, 'bars': 0, 'errors': 0, 'throttled': 0}
+        self.kline_requests_by_symbol = collections.Counter()
+        self.requests_in_flight = collections.Counter()
+        self.max_symbols_in_flight = collections.Counter()
+        self.rest_lag_bars = rest_lag_bars
+        self.missing_ranges = list(missing_ranges)
+        self.ws_num_bars = ws_num_bars
+        self.ws_drop_after = ws_drop_after
+        self.ws_recordings = {}
+        self.ws_connections = collections.Counter()
+        self.runner = None
+        self.url = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        '''
+        starts serving on host:port (0 picks a free port), returns the base url
+        '''
+        app = web.Application()
+        app.router.add_get('/okx/instruments', self.__okx_instruments)
+        app.router.add_get('/okx/history-candles', self.__okx_candles)
+        app.router.add_get('/bybit/instruments-info', self.__bybit_instruments)
+        app.router.add_get('/bybit/kline', self.__bybit_kline)
+        app.router.add_get('/dydx/perpetualMarkets', self.__dydx_markets)
+        app.router.add_get('/dydx/candles/perpetualMarkets/{market}', self.__dydx_candles)
+        app.router.add_get('/apexpro/symbols', self.__apexpro_symbols)
+        app.router.add_get('/apexpro/klines', self.__apexpro_klines)
+        for ex_name in ('okx', 'bybit', 'dydx', 'apexpro'):
+            app.router.add_get(f'/{ex_name}/ws', self.__ws)
+        app.router.add_get('/stats', self.__get_stats)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f'http://{host}:{port}'
+        self.ws_url = f'ws://{host}:{port}'
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def get_endpoints(self):
+        '''
+        the endpoints in the format of ignore/apiendpoints.yaml
+        '''
+        return {'okx': {'ticker': self.url + '/okx/instruments', 'ohlc': self.url + '/okx/history-candles', 'ws': self.ws_url + '/okx/ws'},
+                'bybit': {'ticker': self.url + '/bybit/instruments-info', 'ohlc': self.url + '/bybit/kline', 'ws': self.ws_url + '/bybit/ws'},
+                'dydx': {'ticker': self.url + '/dydx/perpetualMarkets', 'ohlc': self.url + '/dydx/candles/perpetualMarkets/', 'ws': self.ws_url + '/dydx/ws'},
+                'apexpro': {'ticker': self.url + '/apexpro/symbols', 'ohlc': self.url + '/apexpro/klines', 'ws': self.ws_url + '/apexpro/ws'}}
+
+    def get_num_bars(self):
+        '''
+        bars per symbol, the count a complete download stores
+        '''
+        return len([ts for ts in range(self.start_ts, self.end_ts + 1, self.interval_ms) if not self.is_missing(ts)])
+
+    def is_missing(self, ts):
+        return any(since_ts <= ts <= till_ts for since_ts, till_ts in self.missing_ranges)
+
+    def get_bar(self, ts):
+        '''
+        (open, high, low, close) strings of the bar at ts
+        '''
+        step = (ts // self.interval_ms) % 1000
+        return f'{100 + step * 0.01:.2f}', f'{100.5 + step * 0.01:.2f}', f'{99.5 + step * 0.01:.2f}', f'{100.25 + step * 0.01:.2f}'
+
+    def __get_timestamps(self, since_ts, till_ts, limit, newest_first):
+        '''
+        up to limit bar timestamps in [since_ts, till_ts], taken from the newest or the oldest end of the range
+        '''
+        limit = min(limit, self.page_size) if self.page_size else limit
+        since_ts = max(since_ts, self.start_ts)
+        till_ts = min(till_ts, self.end_ts - self.rest_lag_bars * self.interval_ms)
+        first = -(-since_ts // self.interval_ms) * self.interval_ms
+        last = (till_ts // self.interval_ms) * self.interval_ms
+        if first > last:
+            return []
+        if newest_first:
+            timestamps = range(last, first - 1, -self.interval_ms)
+        else:
+            timestamps = range(first, last + 1, self.interval_ms)
+        timestamps = list(itertools.islice((ts for ts in timestamps if not self.is_missing(ts)), limit))
+        self.stats['bars'] += len(timestamps)
+        return timestamps
+
+    async def __respond(self, ex_name, symbol, error_body):
+        '''
+        waits for latency, applies max_requests_per_sec and draws an injected failure.
+        returns the failure response or None, and the rate limit headers of the response
+        '''
+        self.stats['requests'] += 1
+        self.stats['kline_requests'] += 1
+        self.kline_requests_by_symbol[(ex_name, symbol)] += 1
+        headers = {}
+        if self.max_requests_per_sec is not None:
+            second = int(time.time())
+            window_second, count = self.windows.get(ex_name, (second, 0))
+            count = count + 1 if window_second == second else 1
+            self.windows[ex_name] = (second, count)
+            remaining = max(0, self.max_requests_per_sec - count)
+            if ex_name == 'bybit':
+                headers = {'X-Bapi-Limit': str(self.max_requests_per_sec), 'X-Bapi-Limit-Status': str(remaining),
+                           'X-Bapi-Limit-Reset-Timestamp': str((second + 1) * 1000)}
+            else:
+                headers = {'RateLimit-Limit': str(self.max_requests_per_sec), 'RateLimit-Remaining': str(remaining),
+                           'RateLimit-Reset': f'{second + 1 - time.time():.3f}'}
+            if count > self.max_requests_per_sec:
+                self.stats['throttled'] += 1
+                return web.json_response(error_body, status=429, headers=dict(headers, **{'Retry-After': '1'})), headers
+        if self.latency > 0:
+            self.requests_in_flight[(ex_name, symbol)] += 1
+            num_symbols = sum(1 for (ex, _), count in self.requests_in_flight.items() if ex == ex_name and count > 0)
+            self.max_symbols_in_flight[ex_name] = max(self.max_symbols_in_flight[ex_name], num_symbols)
+            try:
+                await asyncio.sleep(self.latency)
+            finally:
+                self.requests_in_flight[(ex_name, symbol)] -= 1
+        draw = self.random.random()
+        if draw < self.throttle_rate:
+            self.stats['throttled'] += 1
+            return web.json_response(error_body, status=429, headers=headers), headers
+        if draw < self.throttle_rate + self.error_rate:
+            self.stats['errors'] += 1
+            return web.Response(status=500, text='Internal Server Error', headers=headers), headers
+        return None, headers
+
+    async def __ws(self, request):
+        ex_name = request.path.split('/')[1]
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.ws_connections[ex_name] += 1
+        drop_after = self.ws_drop_after if self.ws_connections[ex_name] == 1 else None
+        num_frames = 0
+        async for msg in ws:
+            if msg.type != web.WSMsgType.TEXT:
+                break
+            if msg.data == 'ping':
+                await ws.send_str('pong')
+                continue
+            message = json.loads(msg.data)
+            if message.get('op') == 'ping':
+                await ws.send_json({'success': True, 'ret_msg': 'pong', 'op': 'ping'})
+                continue
+            if ex_name == 'dydx':
+                channels = [message['id']]
+                await ws.send_json({'type': 'subscribed', 'connection_id': 'mock', 'message_id': 0, 'channel': 'v4_candles', 'id': message['id'],
+                                    'contents': {'candles': []}})
+            else:
+                channels = message['args']
+                await ws.send_json({'event': 'subscribe', 'arg': channels[0]} if ex_name == 'okx' else {'success': True, 'ret_msg': '', 'op': 'subscribe'})
+            for channel in channels:
+                for frame in self.get_ws_frames(ex_name, channel):
+                    if drop_after is not None and num_frames >= drop_after:
+                        await ws.close()
+                        return ws
+                    await ws.send_str(frame)
+                    num_frames += 1
+        return ws
+
+    def get_ws_frames(self, ex_name, channel):
+        '''
+        the recorded frames of the channel (an okx arg dict, a bybit / apexpro topic or a dydx market/resolution id) or frames generated from the bars
+        '''
+        key = (ex_name, json.dumps(channel, sort_keys=True))
+        if key in self.ws_recordings:
+            return self.ws_recordings[key]
+        frames = []
+        timestamps = range(self.end_ts - (self.ws_num_bars - 1) * self.interval_ms, self.end_ts + 1, self.interval_ms)
+        for ts in timestamps:
+            o, h, l, c = self.get_bar(ts)
+            # an update of the bar while it is open, then the closed bar, except for the bar still open at end_ts
+            updates = [(o, o, o, o, False)] + ([(o, h, l, c, True)] if ts < self.end_ts else [])
+            for update in updates:
+                frames.append(json.dumps(self.__to_ws_frame(ex_name, channel, ts, *update)))
+        return frames
+
+    def __to_ws_frame(self, ex_name, channel, ts, o, h, l, c, confirm):
+        if ex_name == 'okx':
+            return {'arg': channel, 'data': [[str(ts), o, h, l, c, '8', '0.08', '800', '1' if confirm else '0']]}
+        if ex_name == 'dydx':
+            market, resolution = channel.split('/')
+            return {'type': 'channel_data', 'connection_id': 'mock', 'message_id': 1, 'id': channel, 'channel': 'v4_candles', 'version': '4.0.0',
+                    'contents': {'startedAt': self.__to_iso(ts), 'ticker': market, 'resolution': resolution, 'low': l, 'high': h, 'open': o, 'close': c,
+                                 'baseTokenVolume': '134.4184', 'usdVolume': '3492552.6768', 'trades': 381, 'startingOpenInterest': '2521.6992'}}
+        row = {'start': ts, 'end': ts + self.interval_ms - 1, 'interval': channel.split('.')[1], 'open': o, 'close': c, 'high': h, 'low': l,
+               'volume': '2.081', 'turnover': '34666.4005', 'confirm': confirm, 'timestamp': ts + self.interval_ms - 1}
+        return {'topic': channel, 'data': [row], 'ts': ts + self.interval_ms - 1, 'type': 'snapshot'}
+
+    async def __get_stats(self, request):
+        return web.json_response(self.stats)
+
+    async def __okx_instruments(self, request):
+        self.stats['requests'] += 1
+        return web.json_response({'code': '0', 'msg': '', 'data': [{'instId': base + '-USDT-SWAP', 'instType': 'SWAP', 'ctType': 'linear', 'state': 'live',
+                                                                    'ctValCcy': base, 'settleCcy': 'USDT'} for base in self.bases]})
+
+    async def __okx_candles(self, request):
+        failure, headers = await self.__respond('okx', request.query['instId'], {'code': '50011', 'msg': 'Too Many Requests', 'data': []})
+        if failure is not None:
+            return failure
+        after = int(request.query.get('after', self.end_ts + 1))
+        limit = int(request.query.get('limit', 100))
+        timestamps = self.__get_timestamps(self.start_ts, after - 1, limit, newest_first=True)
+        return web.json_response({'code': '0', 'msg': '', 'data': [[str(ts), *self.get_bar(ts), '1193839', '11938.39', '314978168.712', '1'] for ts in timestamps]}, headers=headers)
+
+    async def __bybit_instruments(self, request):
+        self.stats['requests'] += 1
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {'category': 'linear', 'list': [
+            {'symbol': base + 'USDT', 'contractType': 'LinearPerpetual', 'status': 'Trading', 'baseCoin': base, 'quoteCoin': 'USDT'} for base in self.bases]}})
+
+    async def __bybit_kline(self, request):
+        failure, headers = await self.__respond('bybit', request.query['symbol'], {'retCode': 10006, 'retMsg': 'Too many visits!', 'result': {}})
+        if failure is not None:
+            return failure
+        timestamps = self.__get_timestamps(int(request.query['start']), int(request.query.get('end', self.end_ts)),
+                                           int(request.query.get('limit', 200)), newest_first=True)
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {'category': 'linear', 'symbol': request.query['symbol'],
+                                                                           'list': [[str(ts), *self.get_bar(ts), '508', '0.26757263'] for ts in timestamps]}}, headers=headers)
+
+    async def __dydx_markets(self, request):
+        self.stats['requests'] += 1
+        return web.json_response({'markets': {base + '-USD': {'ticker': base + '-USD', 'status': 'ACTIVE', 'type': 'PERPETUAL'} for base in self.bases}})
+
+    async def __dydx_candles(self, request):
+        failure, headers = await self.__respond('dydx', request.match_info['market'], {'errors': [{'msg': 'Too many requests'}]})
+        if failure is not None:
+            return failure
+        timestamps = self.__get_timestamps(self.__from_iso(request.query['fromISO']), self.__from_iso(request.query['toISO']),
+                                           int(request.query.get('limit', 100)), newest_first=True)
+        candles = []
+        for ts in timestamps:
+            o, h, l, c = self.get_bar(ts)
+            started_at = self.__to_iso(ts)
+            candles.append({'startedAt': started_at, 'ticker': request.match_info['market'], 'resolution': request.query.get('resolution', '1MIN'),
+                            'low': l, 'high': h, 'open': o, 'close': c, 'baseTokenVolume': '134.4184', 'usdVolume': '3492552.6768',
+                            'trades': 381, 'startingOpenInterest': '2521.6992'})
+        return web.json_response({'candles': candles}, headers=headers)
+
+    async def __apexpro_symbols(self, request):
+        self.stats['requests'] += 1
+        return web.json_response({'data': {'perpetualContract': [{'crossSymbolName': base + 'USDC', 'underlyingCurrencyId': base,
+                                                                  'settleCurrencyId': 'USDC', 'enableTrade': True} for base in self.bases]}})
+
+    async def __apexpro_klines(self, request):
+        failure, headers = await self.__respond('apexpro', request.query['symbol'], {'code': 429, 'msg': 'Too many requests'})
+        if failure is not None:
+            return failure
+        symbol = request.query['symbol']
+        timestamps = self.__get_timestamps(int(request.query['start']) * 1000, int(request.query['end']) * 1000,
+                                           int(request.query.get('limit', 1500)), newest_first=False)
+        rows = []
+        for ts in timestamps:
+            o, h, l, c = self.get_bar(ts)
+            rows.append({'s': symbol, 'i': request.query.get('interval', '1'), 't': ts, 'c': c, 'h': h, 'l': l, 'o': o, 'v': '2.266', 'tr': '56967.19'})
+        #an empty range is an empty dict, as the real API answers
+        return web.json_response({'data': {symbol: rows} if len(rows) > 0 else {}, 'timeCost': 4266657}, headers=headers)
+
+    @staticmethod
+    def __from_iso(iso):
+        return int(datetime.datetime.fromisoformat(iso.replace('Z', '+00:00')).timestamp() * 1000)
+
+    @staticmethod
+    def __to_iso(ts):
+        return datetime.datetime.fromtimestamp(ts / 1000, tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
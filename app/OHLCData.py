@@ -1,51 +1,47 @@
-import threading
+import numpy as np
+import pandas as pd
 
-class OHLCData:
-    data = {}
-    lock = threading.Lock()
 
-    @classmethod
-    def initialize(cls):
-        with cls.lock:
-            cls.data = {}
+class OHLCSeries:
+    '''
+    one OHLC series stored as contiguous typed columns (int64 timestamp in ms, float64 open/high/low/close).
+    columns are numpy arrays and are handed out without copying.
+    '''
+    __slots__ = ('timestamp', 'open', 'high', 'low', 'close')
+    columns = ('timestamp', 'open', 'high', 'low', 'close')
 
-    @staticmethod
-    def add_data(exchange, symbol, base, quote, open_prices, high_prices, low_prices, close_prices, timestamps):
-        with OHLCData.lock:
-            standardized_data = [
-                {
-                    'timestamp': timestamp,
-                    'open': float(open_price),
-                    'high': float(high_price),
-                    'low': float(low_price),
-                    'close': float(close_price),
-                } 
-                for open_price, high_price, low_price, close_price, timestamp in zip(open_prices, high_prices, low_prices, close_prices, timestamps)
-            ]
-
-            key = (exchange, symbol, base, quote)
-            OHLCData.data[key] = standardized_data #[{'timestamp': 1686632400000, 'open': 26056.4, 'high': 26123.0, 'low': 26029.1, 'close': 26077.6}]
+    def __init__(self, timestamps, opens, highs, lows, closes):
+        self.timestamp = np.asarray(timestamps, dtype=np.int64)
+        self.open = np.asarray(opens, dtype=np.float64)
+        self.high = np.asarray(highs, dtype=np.float64)
+        self.low = np.asarray(lows, dtype=np.float64)
+        self.close = np.asarray(closes, dtype=np.float64)
 
-    @staticmethod
-    def get_data(exchange, symbol, base, quote):
-        with OHLCData.lock:
-            key = (exchange, symbol, base, quote)
-            return OHLCData.data.get(key)
+    def __len__(self):
+        return len(self.timestamp)
 
-    @staticmethod
-    def delete_data(exchange, symbol, base, quote):
-        with OHLCData.lock:
-            key = (exchange, symbol, base, quote)
-            if key in OHLCData.data:
-                del OHLCData.data[key]
+    def get_column(self, name):
+        return getattr(self, name)
 
-    @staticmethod
-    def get_symbols(exchange):
-        with OHLCData.lock:
-            return [(symbol, base, quote) for (ex, symbol, base, quote) in OHLCData.data.keys() if ex == exchange]
+    def take(self, indexer):
+        '''
+        returns the rows selected by a boolean mask or an index array as a new series
+        '''
+        return OHLCSeries(*[getattr(self, name)[indexer] for name in OHLCSeries.columns])
 
     @staticmethod
-    def has_data(exchange, symbol, base, quote):
-        with OHLCData.lock:
-            key = (exchange, symbol, base, quote)
-            return key in OHLCData.data
\ No newline at end of file
+    def concat(series_list):
+        if len(series_list) == 1:
+            return series_list[0]
+        return OHLCSeries(*[np.concatenate([getattr(series, name) for series in series_list]) for name in OHLCSeries.columns])
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in OHLCSeries.columns}
+
+    def to_frame(self):
+        return pd.DataFrame(self.to_dict(), copy=False)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in OHLCSeries.columns)
+
@@ -0,0 +1,79 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from StorageBackend import StorageBackend
+
+
+class OHLCRollup:
+    '''
+    builds higher timeframes (e.g. 5m, 1h, 1d) from the stored base series and keeps each one in its own storage under <data_dir>/rollup/<timeframe>.
+    buckets are aligned to UTC and only complete buckets are stored, so an update aggregates just the buckets completed since the last one.
+    '''
+    __units = {'m': 60000, 'h': 3600000, 'd': 86400000}
+
+    def __init__(self, base_storage, storage_format, data_dir, timeframes):
+        self.base_storage = base_storage
+        self.timeframe_ms = {timeframe: self.to_ms(timeframe) for timeframe in timeframes}
+        self.storages = {timeframe: StorageBackend.create(storage_format, self.get_rollup_dir(data_dir, timeframe)) for timeframe in timeframes}
+
+    @staticmethod
+    def get_rollup_dir(data_dir, timeframe):
+        return os.path.join(data_dir, 'rollup', timeframe)
+
+    @classmethod
+    def to_ms(cls, timeframe):
+        match = re.fullmatch(r'(\d+)([mhd])', str(timeframe))
+        if match is None:
+            raise ValueError(f'Unknown timeframe {timeframe}, expected <number><m|h|d> like 5m, 1h, 1d')
+        return int(match.group(1)) * cls.__units[match.group(2)]
+
+    def update(self, exchange, base, quote, since=None):
+        '''
+        aggregates the base bars into every timeframe. buckets after the last stored one are added,
+        and if since is given the buckets from since on are rebuilt too (rows merged into the middle of the base series).
+        returns the number of buckets written per timeframe.
+        '''
+        info = self.base_storage.get_series_info(exchange, base, quote)
+        if info is None or not info.get('interval_ms'):
+            return {}
+        base_interval = info['interval_ms']
+        updated = {}
+        for timeframe, storage in self.storages.items():
+            timeframe_ms = self.timeframe_ms[timeframe]
+            if timeframe_ms <= base_interval or timeframe_ms % base_interval != 0:
+                continue
+            rollup_info = storage.get_series_info(exchange, base, quote)
+            start = rollup_info['last_ts'] + timeframe_ms if rollup_info is not None else info['first_ts'] - info['first_ts'] % timeframe_ms
+            if since is not None:
+                start = min(start, int(since) - int(since) % timeframe_ms)
+            # end of the last bucket whose final base bar is stored
+            end = (info['last_ts'] + base_interval) // timeframe_ms * timeframe_ms
+            if end <= start:
+                continue
+            df = self.base_storage.read(exchange, base, quote, start, end - 1)
+            if df is None or len(df) == 0:
+                continue
+            bars = self.aggregate(df, timeframe_ms)
+            storage.write(exchange, base, quote, bars)
+            updated[timeframe] = len(bars)
+        return updated
+
+    @staticmethod
+    def aggregate(df, timeframe_ms):
+        '''
+        df must be sorted by timestamp. each bar is labeled with the start of its bucket
+        '''
+        timestamps = df['timestamp'].to_numpy(dtype=np.int64)
+        buckets = timestamps - timestamps % timeframe_ms
+        bucket_ts, first_index = np.unique(buckets, return_index=True)
+        last_index = np.append(first_index[1:], len(buckets)) - 1
+        return pd.DataFrame({
+            'timestamp': bucket_ts,
+            'open': df['open'].to_numpy()[first_index],
+            'high': np.maximum.reduceat(df['high'].to_numpy(), first_index),
+            'low': np.minimum.reduceat(df['low'].to_numpy(), first_index),
+            'close': df['close'].to_numpy()[last_index],
+        })
@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import numpy as np
+
+from OHLCData import OHLCSeries
+
+
+class OHLCSpool:
+    '''
+    converted chunks of one download kept on disk (one .npz per chunk) until they can be written in time order.
+    used when pages arrive newest first, so only one chunk is held in memory at a time.
+    '''
+    def __init__(self, spool_dir, num_chunks=0, num_records=0):
+        '''
+        num_chunks / num_records reopen a spool whose first num_chunks chunks were added by an earlier run
+        '''
+        self.spool_dir = spool_dir
+        self.num_chunks = num_chunks
+        self.num_records = num_records
+
+    def add(self, series):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        np.savez(self.__get_chunk_path(self.num_chunks), **series.to_dict())
+        self.num_chunks += 1
+        self.num_records += len(series)
+
+    def get_chunks(self, reverse=False):
+        '''
+        yields the chunks as OHLCSeries in the order they were added, or the reverse
+        '''
+        indexes = range(self.num_chunks - 1, -1, -1) if reverse else range(self.num_chunks)
+        for index in indexes:
+            yield self.get_chunk(index)
+
+    def get_chunk(self, index):
+        with np.load(self.__get_chunk_path(index)) as chunk:
+            return OHLCSeries(*[chunk[name] for name in OHLCSeries.columns])
+
+    def clear(self):
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        self.num_chunks = 0
+        self.num_records = 0
+
+    def __get_chunk_path(self, index):
+        return os.path.join(self.spool_dir, f'chunk_{index:06d}.npz')
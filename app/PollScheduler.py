@@ -0,0 +1,51 @@
+import heapq
+import itertools
+
+
+class PollScheduler:
+    '''
+    priority queue of keys ordered by due time (ms). a key is in the queue at most once, scheduling it again replaces its due time.
+    replaced and removed entries are left in the heap and skipped once they reach the top.
+    '''
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def schedule(self, key, due_ts):
+        entry_id = next(self.counter)
+        self.entries[key] = entry_id
+        heapq.heappush(self.heap, (due_ts, entry_id, key))
+
+    def remove(self, key):
+        self.entries.pop(key, None)
+
+    def next_due(self):
+        '''
+        due time of the first key, or None if the queue is empty
+        '''
+        self.__drop_replaced()
+        return self.heap[0][0] if len(self.heap) > 0 else None
+
+    def pop_due(self, now_ts):
+        '''
+        removes and returns the keys due at now_ts, earliest first
+        '''
+        keys = []
+        self.__drop_replaced()
+        while len(self.heap) > 0 and self.heap[0][0] <= now_ts:
+            due_ts, entry_id, key = heapq.heappop(self.heap)
+            del self.entries[key]
+            keys.append(key)
+            self.__drop_replaced()
+        return keys
+
+    def __drop_replaced(self):
+        while len(self.heap) > 0 and self.entries.get(self.heap[0][2]) != self.heap[0][1]:
+            heapq.heappop(self.heap)
@@ -0,0 +1,40 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ProcessPool:
+    '''
+    runs CPU bound work (page conversion, serializing and writing series) in worker processes, so the event loop keeps serving http requests.
+    with size 0 the work runs inline on the event loop thread.
+    '''
+    executor = None
+    size = 0
+
+    @classmethod
+    def initialize(cls, size=0, initializer=None, initargs=()):
+        '''
+        initializer(*initargs) runs once in every worker, e.g. to select the storage backend the worker writes to
+        '''
+        cls.shutdown()
+        cls.size = size
+        if size > 0:
+            # spawn: workers must not inherit the event loop and the sockets of the downloader
+            cls.executor = ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context('spawn'),
+                                               initializer=initializer, initargs=initargs)
+
+    @classmethod
+    async def run(cls, func, *args):
+        '''
+        func and args must be picklable when the pool is enabled: module level functions or classmethods, numpy arrays rather than DataFrames
+        '''
+        if cls.executor is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(cls.executor, func, *args)
+
+    @classmethod
+    def shutdown(cls):
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=True)
+            cls.executor = None
+        cls.size = 0
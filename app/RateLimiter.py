@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    '''
+    Token bucket shared by every request to one exchange.
+    rate: requests per second to start with, burst: max number of requests that can be sent back to back.
+    The rate adapts to the exchange: every 429 halves it (down to min_rate), and it grows back by increase requests/sec
+    per second of successful requests (up to max_rate). When the rate limit headers of a response say no request is left
+    in the current window, the bucket pauses until the window resets.
+    '''
+    # (remaining, reset) header pairs, bybit's reset is a ms timestamp, the others seconds from now or an epoch timestamp
+    limit_headers = [('X-Bapi-Limit-Status', 'X-Bapi-Limit-Reset-Timestamp'),
+                     ('RateLimit-Remaining', 'RateLimit-Reset'),
+                     ('X-RateLimit-Remaining', 'X-RateLimit-Reset')]
+    max_pause = 60.0
+
+    def __init__(self, rate, burst=None, max_rate=None, min_rate=None, increase=None):
+        self.rate = float(rate)
+        self.max_rate = max(float(max_rate), self.rate) if max_rate is not None else self.rate
+        self.min_rate = float(min_rate) if min_rate is not None else min(self.rate, 1.0)
+        self.increase = float(increase) if increase is not None else max(self.max_rate * 0.05, 0.1)
+        self.capacity = float(burst) if burst is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.num_acquired = 0
+        self.num_throttled = 0
+        self.total_wait = 0.0
+        self.lock = asyncio.Lock()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        started_at = time.monotonic()
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.__refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        self.num_acquired += 1
+        self.total_wait += time.monotonic() - started_at
+
+    def on_success(self):
+        # +increase per second at full speed, as there are rate successes per second
+        self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttled(self, retry_after=None):
+        '''
+        the exchange answered 429: halve the rate, empty the bucket and pause for retry_after seconds if the response gave one
+        '''
+        self.num_throttled += 1
+        self.__refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        if retry_after is not None:
+            self.pause(retry_after)
+
+    def update_from_headers(self, headers):
+        '''
+        pauses until the window resets when the response says no request is left in it
+        '''
+        for remaining_header, reset_header in self.limit_headers:
+            if remaining_header not in headers:
+                continue
+            try:
+                remaining = int(float(headers[remaining_header]))
+                reset = float(headers.get(reset_header, 0))
+            except ValueError:
+                return
+            if remaining <= 0 and reset > 0:
+                self.pause(self.__to_delay(reset))
+            return
+
+    def pause(self, delay):
+        self.paused_until = max(self.paused_until, time.monotonic() + min(max(delay, 0.0), self.max_pause))
+
+    @staticmethod
+    def __to_delay(reset):
+        if reset > 1e12:
+            return reset / 1000 - time.time()
+        if reset > 1e9:
+            return reset - time.time()
+        return reset
@@ -0,0 +1,125 @@
+import asyncio
+import collections
+import contextlib
+import fcntl
+import json
+import os
+import time
+
+
+class SeriesLease:
+    '''
+    leases on series in lease_dir, so two workers sharing the data directory, as processes or on several hosts, never write the same series.
+    a lease is a json file with its owner and expiry time, renewed every ttl_sec / 3 while held. the lease of a worker that died expires and can be taken over.
+    leases are taken, renewed and released under a lock file, like SeriesManifest.
+    the owner can acquire a lease it holds again, it is released by the last release.
+    '''
+    def __init__(self, lease_dir, owner, ttl_sec=60):
+        self.lease_dir = lease_dir
+        self.owner = owner
+        self.ttl_sec = ttl_sec
+        self.held = collections.Counter()
+        self.renewal_task = None
+
+    def acquire(self, exchange, base, quote):
+        '''
+        returns True if the lease is held by this owner now, False if another owner holds it
+        '''
+        key = self.get_key(exchange, base, quote)
+        with self.__locked():
+            lease = self.__read(key)
+            if lease is not None and lease['owner'] != self.owner and lease['expires_at'] > time.time():
+                return False
+            self.__write(key)
+        self.held[(exchange, base, quote)] += 1
+        return True
+
+    def get_holder(self, exchange, base, quote):
+        '''
+        owner of the unexpired lease of the series, or None
+        '''
+        lease = self.__read(self.get_key(exchange, base, quote))
+        return lease['owner'] if lease is not None and lease['expires_at'] > time.time() else None
+
+    def release(self, exchange, base, quote):
+        series = (exchange, base, quote)
+        self.held[series] -= 1
+        if self.held[series] > 0:
+            return
+        del self.held[series]
+        key = self.get_key(exchange, base, quote)
+        with self.__locked():
+            lease = self.__read(key)
+            if lease is not None and lease['owner'] == self.owner:
+                os.remove(self.__get_path(key))
+
+    def release_all(self):
+        for series in list(self.held):
+            self.held[series] = 1
+            self.release(*series)
+
+    def renew(self):
+        '''
+        extends every held lease, a lease taken over by another owner meanwhile is dropped
+        '''
+        with self.__locked():
+            for series in list(self.held):
+                key = self.get_key(*series)
+                lease = self.__read(key)
+                if lease is not None and lease['owner'] != self.owner:
+                    print(f'Lease of {key} was taken over by {lease["owner"]}')
+                    del self.held[series]
+                    continue
+                self.__write(key)
+
+    def start_renewal(self):
+        '''
+        renews the held leases in the background, must be called from the event loop
+        '''
+        self.renewal_task = asyncio.create_task(self.__renew_periodically())
+
+    async def stop_renewal(self):
+        if self.renewal_task is not None:
+            self.renewal_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.renewal_task
+            self.renewal_task = None
+
+    @staticmethod
+    def get_key(exchange, base, quote):
+        return exchange + '-' + base + '-' + quote
+
+    async def __renew_periodically(self):
+        while True:
+            await asyncio.sleep(self.ttl_sec / 3)
+            await asyncio.to_thread(self.renew)
+
+    def __get_path(self, key):
+        return os.path.join(self.lease_dir, key + '.lease')
+
+    def __read(self, key):
+        try:
+            with open(self.__get_path(key), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # a partly written lease counts as expired
+            return {'owner': None, 'expires_at': 0}
+
+    def __write(self, key):
+        path = self.__get_path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'owner': self.owner, 'expires_at': time.time() + self.ttl_sec}, f)
+        os.replace(tmp_path, path)
+
+    @contextlib.contextmanager
+    def __locked(self):
+        os.makedirs(self.lease_dir, exist_ok=True)
+        with open(os.path.join(self.lease_dir, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
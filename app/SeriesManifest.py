@@ -0,0 +1,132 @@
+import contextlib
+import fcntl
+import json
+import os
+import threading
+
+
+class SeriesManifest:
+    '''
+    persistent summary (first/last timestamp, row count, interval, size) of every series of one storage backend, kept in a json file.
+    an entry is trusted only while the size and mtime of its data path are unchanged, otherwise scan_func(path, stat, previous_entry) rebuilds it cheaply.
+    several processes can share the manifest: changes are made under a lock file, and the file is reloaded when another process saved it.
+    '''
+    def __init__(self, manifest_path, scan_func):
+        self.manifest_path = manifest_path
+        self.scan_func = scan_func
+        self.lock = threading.Lock()
+        self.entries = None
+        self.loaded_stamp = None
+
+    def get_entry(self, exchange, base, quote, path):
+        '''
+        returns the entry of the series, rebuilding it when it is missing or stale, or None if path doesn't exist
+        '''
+        key = self.get_key(exchange, base, quote)
+        with self.__locked():
+            entries = self.__load()
+            entry = entries.get(key)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                if key in entries:
+                    del entries[key]
+                    self.__save()
+                return None
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return dict(entry)
+            entry = self.scan_func(path, stat, entry)
+            if entry is None:
+                return None
+            entry.update({'exchange': exchange, 'base': base, 'quote': quote, 'file': os.path.basename(path),
+                          'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+            entries[key] = entry
+            self.__save()
+            return dict(entry)
+
+    def update_entry(self, exchange, base, quote, path, first_ts, last_ts, rows, interval_ms):
+        '''
+        called by the writer right after path was written
+        '''
+        stat = os.stat(path)
+        with self.__locked():
+            entries = self.__load()
+            entries[self.get_key(exchange, base, quote)] = {
+                'exchange': exchange,
+                'base': base,
+                'quote': quote,
+                'file': os.path.basename(path),
+                'first_ts': int(first_ts),
+                'last_ts': int(last_ts),
+                'rows': int(rows),
+                'interval_ms': int(interval_ms) if interval_ms is not None else None,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+            }
+            self.__save()
+
+    def remove_entry(self, exchange, base, quote):
+        with self.__locked():
+            entries = self.__load()
+            if entries.pop(self.get_key(exchange, base, quote), None) is not None:
+                self.__save()
+
+    def get_entries(self):
+        with self.__locked():
+            return {key: dict(entry) for key, entry in self.__load().items()}
+
+    def prune(self, file_names):
+        '''
+        drops the entries whose data path is not in file_names
+        '''
+        with self.__locked():
+            entries = self.__load()
+            removed = [key for key, entry in entries.items() if entry['file'] not in file_names]
+            for key in removed:
+                del entries[key]
+            if len(removed) > 0:
+                self.__save()
+
+    @staticmethod
+    def get_key(exchange, base, quote):
+        return exchange + '-' + base + '-' + quote
+
+    @contextlib.contextmanager
+    def __locked(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with self.lock, open(self.manifest_path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __get_stamp(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def __load(self):
+        stamp = self.__get_stamp()
+        if self.entries is None or stamp != self.loaded_stamp:
+            self.entries = {}
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    self.entries = json.load(f)['series']
+            except FileNotFoundError:
+                pass
+            except (ValueError, KeyError) as e:
+                print(f'Manifest is broken and will be rebuilt: {e}')
+            self.loaded_stamp = stamp
+        return self.entries
+
+    def __save(self):
+        # write a temp file and rename it so a crash never leaves a half written manifest
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': 1, 'series': self.entries}, f)
+        os.replace(tmp_path, self.manifest_path)
+        self.loaded_stamp = self.__get_stamp()
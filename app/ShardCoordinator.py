@@ -0,0 +1,117 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import time
+
+from DataDownLoader import DataDownLoader
+
+
+class ShardCoordinator:
+    '''
+    runs DataDownLoader sharded: worker i of num_shards downloads only the series ShardRing assigns to shard i and leaves its summary
+    in <data_dir>/.shards/<mode>-<i>-of-<num_shards>.json. start_workers runs the workers as local processes sharing the rate limits of one IP,
+    workers on several hosts sharing the data directory are started with main.py --shard i/num_shards and merged with merge_summaries.
+    '''
+
+    @classmethod
+    def start_workers(cls, mode, params_path, endpoints_path, num_workers):
+        '''
+        refreshes the instrument catalog once, runs num_workers worker processes and returns their merged summary.
+        SIGTERM and SIGINT are passed on to the workers, which stop like a single daemon or live run
+        '''
+        started_at = time.time()
+        ddl = DataDownLoader(params_path, endpoints_path)
+        # the workers find a fresh catalog, so the instrument lists are downloaded once, not once per worker
+        asyncio.run(ddl.refresh_catalog())
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=cls.run_worker, args=(mode, params_path, endpoints_path, i, num_workers, 1 / num_workers),
+                                   name=f'shard-{i}-of-{num_workers}') for i in range(num_workers)]
+        for worker in workers:
+            worker.start()
+
+        def stop_workers(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    os.kill(worker.pid, signum)
+
+        handlers = {sig: signal.signal(sig, stop_workers) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for worker in workers:
+                worker.join()
+        finally:
+            for sig, handler in handlers.items():
+                signal.signal(sig, handler)
+        for worker in workers:
+            if worker.exitcode != 0:
+                print(f'Worker {worker.name} exited with code {worker.exitcode}')
+        return cls.merge_summaries(ddl.data_dir, mode, num_workers, since=started_at)
+
+    @staticmethod
+    def run_worker(mode, params_path, endpoints_path, shard_index, num_shards, rate_share=1.0):
+        async def run():
+            ddl = DataDownLoader(params_path, endpoints_path, shard=(shard_index, num_shards), rate_share=rate_share)
+            if mode in ('daemon', 'live'):
+                loop = asyncio.get_running_loop()
+                for sig in (signal.SIGTERM, signal.SIGINT):
+                    loop.add_signal_handler(sig, ddl.stop)
+            await ddl.start(mode)
+        asyncio.run(run())
+
+    @classmethod
+    def merge_summaries(cls, data_dir, mode, num_shards, since=None):
+        '''
+        merges the summaries of the shards of a run, the ones finished before since (e.g. by an earlier run) are reported as missing
+        '''
+        summaries = []
+        missing = []
+        for shard_index in range(num_shards):
+            path = DataDownLoader.get_summary_path(data_dir, mode, shard_index, num_shards)
+            try:
+                with open(path, 'r') as f:
+                    summary = json.load(f)
+            except (FileNotFoundError, ValueError):
+                missing.append(shard_index)
+                continue
+            if since is not None and summary['finished_at'] < since:
+                missing.append(shard_index)
+                continue
+            summaries.append(summary)
+        records = {}
+        http = {}
+        for summary in summaries:
+            for ex, num_records in summary['records'].items():
+                records[ex] = records.get(ex, 0) + num_records
+            for ex, stats in summary['http'].items():
+                merged = http.setdefault(ex, {'requests': 0, 'retries': 0, 'throttled': 0})
+                for name in merged:
+                    merged[name] += stats.get(name, 0)
+        elapsed = max([summary['elapsed'] for summary in summaries], default=0.0)
+        total_records = sum(records.values())
+        return {'mode': mode,
+                'num_shards': num_shards,
+                'missing_shards': missing,
+                'elapsed': elapsed,
+                'num_series': sum(summary['num_series'] for summary in summaries),
+                'records': records,
+                'total_records': total_records,
+                'records_per_sec': total_records / elapsed if elapsed > 0 else 0.0,
+                'http': http,
+                'skipped': [series for summary in summaries for series in summary['skipped']],
+                'shards': {summary['shard']: {'owner': summary['owner'], 'elapsed': summary['elapsed'], 'num_series': summary['num_series'],
+                                              'records': sum(summary['records'].values())} for summary in summaries}}
+
+    @classmethod
+    def print_summary(cls, summary):
+        print(f'Sharded {summary["mode"]} summary ({summary["num_shards"]} shards):')
+        for shard_index, shard in sorted(summary['shards'].items()):
+            print(f'  shard {shard_index}: {shard["num_series"]} series, {shard["records"]} records in {shard["elapsed"]:.1f}s ({shard["owner"]})')
+        for ex, num_records in summary['records'].items():
+            stats = summary['http'].get(ex, {})
+            print(f'  {ex}: {num_records} records, {stats.get("requests", 0)} requests, {stats.get("retries", 0)} retries, {stats.get("throttled", 0)} throttled')
+        print(f'  total: {summary["num_series"]} series, {summary["total_records"]} records in {summary["elapsed"]:.1f}s ({summary["records_per_sec"]:.1f} records/sec)')
+        if len(summary['skipped']) > 0:
+            print(f'  skipped, leased by another worker: {", ".join(summary["skipped"])}')
+        if len(summary['missing_shards']) > 0:
+            print(f'  no summary from shards: {", ".join(map(str, summary["missing_shards"]))}')
@@ -0,0 +1,27 @@
+import bisect
+import hashlib
+
+
+class ShardRing:
+    '''
+    consistent hash ring assigning every (exchange, symbol) to one of num_shards shards, with vnodes points on the ring per shard.
+    the assignment depends only on the key and num_shards, so workers on any host compute the same partition,
+    and going from K to K + 1 shards moves only about 1 / (K + 1) of the series.
+    '''
+    def __init__(self, num_shards, vnodes=64):
+        if num_shards < 1:
+            raise ValueError(f'num_shards must be at least 1, got {num_shards}')
+        self.num_shards = num_shards
+        points = sorted((self.__hash(f'shard-{shard}-{i}'), shard) for shard in range(num_shards) for i in range(vnodes))
+        self.points = [point for point, shard in points]
+        self.shards = [shard for point, shard in points]
+
+    def get_shard(self, exchange, symbol):
+        # the first point clockwise from the key, wrapping around at the end of the ring
+        i = bisect.bisect(self.points, self.__hash(exchange + ':' + symbol)) % len(self.points)
+        return self.shards[i]
+
+    @staticmethod
+    def __hash(key):
+        # hash() is salted per process, md5 gives every worker the same ring
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
@@ -0,0 +1,596 @@
+import io
+import os
+import struct
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from SeriesManifest import SeriesManifest
+
+
+class StorageBackend:
+    '''
+    base class of the storage formats DataWriter can write OHLC series to.
+    a series is identified by (exchange, base, quote) and stored sorted by timestamp without duplicates.
+    '''
+    name = None
+    columns = ['timestamp', 'open', 'high', 'low', 'close']
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.manifest = None
+
+    @staticmethod
+    def create(storage_format, data_dir):
+        backends = {'csv': CsvStorage, 'parquet': ParquetStorage, 'binary': BinaryStorage}
+        if storage_format not in backends:
+            raise ValueError(f'Unknown storage format {storage_format}, expected one of {list(backends)}')
+        return backends[storage_format](data_dir)
+
+    def get_series_path(self, exchange, base, quote):
+        raise NotImplementedError
+
+    def get_series_info(self, exchange, base, quote):
+        '''
+        returns the manifest entry (first_ts, last_ts, rows, interval_ms) of the series, or None if it isn't stored
+        '''
+        path = self.get_series_path(exchange, base, quote)
+        try:
+            return self.manifest.get_entry(exchange, base, quote, path)
+        except Exception as e:
+            print(f'Error reading existing data {path}: {e}')
+        return None
+
+    def exists(self, exchange, base, quote):
+        return os.path.exists(self.get_series_path(exchange, base, quote))
+
+    def write(self, exchange, base, quote, df):
+        '''
+        merges df (columns: timestamp, open, high, low, close) into the stored series
+        '''
+        raise NotImplementedError
+
+    def read(self, exchange, base, quote, start=None, end=None, columns=None):
+        '''
+        returns the rows with start <= timestamp <= end as a DataFrame, or None if the series isn't stored
+        '''
+        raise NotImplementedError
+
+    @staticmethod
+    def sort_unique(df):
+        '''
+        sorts by timestamp and drops duplicated timestamps, keeping the last occurrence
+        '''
+        df = df.drop_duplicates(subset=['timestamp'], keep='last')
+        if not df['timestamp'].is_monotonic_increasing:
+            df = df.sort_values('timestamp', kind='stable')
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def filter_range(df, start=None, end=None):
+        if start is not None:
+            df = df[df['timestamp'] >= start]
+        if end is not None:
+            df = df[df['timestamp'] <= end]
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def replace_file(file_path, write):
+        '''
+        write(tmp_path) writes the new content to a uniquely named temp file next to file_path, which is then renamed over it,
+        so a crash never leaves a truncated file behind and concurrent writers never share a temp file
+        '''
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=os.path.basename(file_path) + '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            os.chmod(tmp_path, 0o644)
+            write(tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def get_interval(timestamps, info=None):
+        if len(timestamps) > 1:
+            return timestamps[-1] - timestamps[-2]
+        return info['interval_ms'] if info is not None else None
+
+
+class CsvStorage(StorageBackend):
+    '''
+    one csv per series: <data_dir>/<exchange>-<base>-<quote>.csv
+    '''
+    name = 'csv'
+    __tail_block_size = 4096
+    __count_block_size = 1 << 20
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+        self.manifest = SeriesManifest(os.path.join(data_dir, 'manifest.json'), self.__scan_csv)
+
+    def get_series_path(self, exchange, base, quote):
+        file_name = exchange + '-' + base + '-' + quote + '.csv'
+        return os.path.join(self.data_dir, file_name)
+
+    def write(self, exchange, base, quote, df):
+        file_path = self.get_series_path(exchange, base, quote)
+        new_df = self.sort_unique(df)
+        if len(new_df) == 0:
+            return
+        info = self.get_series_info(exchange, base, quote)
+        if info is None:
+            # Create Data directory if it doesn't exist
+            os.makedirs(self.data_dir, exist_ok=True)
+            self.__replace_file(file_path, new_df)
+            first_ts, rows = int(new_df['timestamp'].iloc[0]), len(new_df)
+        elif int(new_df['timestamp'].iloc[0]) > info['last_ts'] and self.__has_header(file_path, new_df.columns):
+            # Normal incremental case: every new bar is after the stored ones, so only the new rows are written
+            self.__append_rows(file_path, new_df)
+            first_ts, rows = info['first_ts'], info['rows'] + len(new_df)
+        else:
+            # Ranges overlap, merge with the existing rows. if they can't be read the write fails, the stored history is never replaced by new_df alone
+            try:
+                existing_df = pd.read_csv(file_path)
+            except Exception as e:
+                print(f'Error reading existing file {os.path.basename(file_path)}, not writing: {e}')
+                raise
+            # Combine existing and new data, keeping the last occurrence of duplicated timestamps
+            combined_df = self.sort_unique(pd.concat([existing_df, new_df], ignore_index=True))
+            self.__replace_file(file_path, combined_df)
+            first_ts, rows = int(combined_df['timestamp'].iloc[0]), len(combined_df)
+            new_df = combined_df
+        timestamps = new_df['timestamp'].to_numpy()
+        self.manifest.update_entry(exchange, base, quote, file_path, first_ts, timestamps[-1], rows, self.get_interval(timestamps, info))
+
+    def read(self, exchange, base, quote, start=None, end=None, columns=None):
+        '''
+        rows are sorted by timestamp, so a range read binary searches the byte offsets of start and end and parses only the lines between them
+        '''
+        file_path = self.get_series_path(exchange, base, quote)
+        if not os.path.exists(file_path):
+            return None
+        usecols = None if columns is None else ['timestamp'] + [column for column in columns if column != 'timestamp']
+        if start is None and end is None:
+            df = pd.read_csv(file_path, usecols=usecols)
+        else:
+            with open(file_path, 'rb') as f:
+                header = f.readline()
+                ts_index = header.decode().strip().split(',').index('timestamp')
+                data_start = f.tell()
+                data_end = self.__get_data_end(f)
+                begin = self.__find_offset(f, int(start), data_start, data_end, ts_index) if start is not None else data_start
+                stop = self.__find_offset(f, int(end) + 1, begin, data_end, ts_index) if end is not None else data_end
+                f.seek(begin)
+                df = pd.read_csv(io.BytesIO(header + f.read(max(0, stop - begin))), usecols=usecols)
+        return df if columns is None else df[list(columns)]
+
+    def rebuild_manifest(self):
+        '''
+        refreshes the entry of every csv file in the data directory and drops entries of deleted files
+        '''
+        if not os.path.isdir(self.data_dir):
+            return
+        file_names = [file_name for file_name in os.listdir(self.data_dir) if file_name.endswith('.csv')]
+        self.manifest.prune(file_names)
+        for file_name in file_names:
+            parts = file_name[:-len('.csv')].split('-')
+            if len(parts) >= 3:
+                self.get_series_info(parts[0], '-'.join(parts[1:-1]), parts[-1])
+
+    @staticmethod
+    def __has_header(file_path, columns):
+        with open(file_path, 'r') as f:
+            return f.readline().strip() == ','.join(columns)
+
+    @classmethod
+    def __replace_file(cls, file_path, df):
+        def write(tmp_path):
+            df.to_csv(tmp_path, index=False)
+            with open(tmp_path, 'rb+') as f:
+                os.fsync(f.fileno())
+        cls.replace_file(file_path, write)
+
+    @staticmethod
+    def __append_rows(file_path, df):
+        '''
+        appends rows in one write. existing rows are never rewritten, a row cut by an earlier crash is dropped first
+        '''
+        data = df.to_csv(index=False, header=False).encode()
+        with open(file_path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size > 0:
+                f.seek(max(0, size - 4096))
+                tail = f.read()
+                if not tail.endswith(b'\n'):
+                    f.truncate(size - len(tail) + tail.rfind(b'\n') + 1)
+                    f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __scan_csv(self, file_path, stat, previous_entry):
+        '''
+        builds a manifest entry from the first data line and the tail of a csv sorted by timestamp.
+        rows are counted from the bytes appended since previous_entry when the file only grew, otherwise by counting newlines of the whole file.
+        '''
+        with open(file_path, 'rb') as f:
+            header = f.readline()
+            first_line = f.readline()
+            if not header or not first_line.strip():
+                return None
+            ts_index = header.decode().strip().split(',').index('timestamp')
+            tail_lines = self.__read_tail_lines(f, stat.st_size)
+            if self.__is_appended(f, stat, previous_entry, ts_index):
+                rows = previous_entry['rows'] + self.__count_newlines(f, previous_entry['size'])
+            else:
+                rows = self.__count_newlines(f, 0) - 1
+        timestamps = [int(float(line.split(b',')[ts_index])) for line in tail_lines[-2:]]
+        return {
+            'first_ts': int(float(first_line.split(b',')[ts_index])),
+            'last_ts': timestamps[-1],
+            'rows': rows,
+            'interval_ms': timestamps[-1] - timestamps[-2] if len(timestamps) == 2 else None,
+        }
+
+    def __is_appended(self, f, stat, previous_entry, ts_index):
+        '''
+        true if the file only grew since previous_entry, i.e. the old last row still ends at the old file size
+        '''
+        if previous_entry is None or previous_entry.get('rows') is None or stat.st_size <= previous_entry['size']:
+            return False
+        previous_size = previous_entry['size']
+        f.seek(max(0, previous_size - self.__tail_block_size))
+        block = f.read(min(previous_size, self.__tail_block_size))
+        if not block.endswith(b'\n'):
+            return False
+        try:
+            return int(float(block.rstrip(b'\n').split(b'\n')[-1].split(b',')[ts_index])) == previous_entry['last_ts']
+        except (ValueError, IndexError):
+            return False
+
+    def __read_tail_lines(self, f, file_size):
+        block_size = self.__tail_block_size
+        while True:
+            f.seek(max(0, file_size - block_size))
+            lines = f.read().split(b'\n')
+            #the last element is either empty or a row cut by a crash
+            lines = [line for line in lines[:-1] if line.strip()]
+            if block_size >= file_size or len(lines) >= 4:
+                #the first line of the block is either partial or the header
+                return lines[1:]
+            block_size *= 2
+
+    def __get_data_end(self, f):
+        '''
+        offset right after the last complete line, a row cut by a crash is not read
+        '''
+        size = f.seek(0, os.SEEK_END)
+        block_size = self.__tail_block_size
+        while True:
+            f.seek(max(0, size - block_size))
+            block = f.read(min(size, block_size))
+            if block.rfind(b'\n') >= 0:
+                return size - len(block) + block.rfind(b'\n') + 1
+            if block_size >= size:
+                return 0
+            block_size *= 2
+
+    def __find_offset(self, f, ts, lo, hi, ts_index):
+        '''
+        offset of the first line in [lo, hi) whose timestamp is >= ts, or hi if there is none.
+        lo must be the start of a line and every line before it is older than ts.
+        '''
+        while hi - lo > self.__tail_block_size:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()
+            line_start = f.tell()
+            if line_start >= hi:
+                break
+            line = f.readline()
+            if int(float(line.split(b',')[ts_index])) < ts:
+                lo = line_start + len(line)
+            else:
+                hi = line_start
+        f.seek(lo)
+        offset = lo
+        for line in f.read(hi - lo).splitlines(keepends=True):
+            if int(float(line.split(b',')[ts_index])) >= ts:
+                return offset
+            offset += len(line)
+        return hi
+
+    def __count_newlines(self, f, offset):
+        f.seek(offset)
+        count = 0
+        while True:
+            block = f.read(self.__count_block_size)
+            if not block:
+                return count
+            count += block.count(b'\n')
+
+
+class ParquetStorage(StorageBackend):
+    '''
+    parquet partitioned by exchange / symbol / month: <data_dir>/parquet/<exchange>/<base>-<quote>/<YYYY-MM>.parquet
+    a write rewrites only the months its rows fall in, and reads skip the months outside the requested range.
+    '''
+    name = 'parquet'
+
+    def __init__(self, data_dir, compression='zstd'):
+        super().__init__(data_dir)
+        self.root_dir = os.path.join(data_dir, 'parquet')
+        self.compression = compression
+        # every partition write renames a file inside the series directory, which updates the directory mtime the manifest checks
+        self.manifest = SeriesManifest(os.path.join(self.root_dir, 'manifest.json'), self.__scan_series_dir)
+
+    def get_series_path(self, exchange, base, quote):
+        return os.path.join(self.root_dir, exchange, base + '-' + quote)
+
+    def get_partition_files(self, exchange, base, quote, start=None, end=None):
+        '''
+        returns the partition files of the series in month order, skipping months outside [start, end]
+        '''
+        series_dir = self.get_series_path(exchange, base, quote)
+        if not os.path.isdir(series_dir):
+            return []
+        months = sorted(file_name[:-len('.parquet')] for file_name in os.listdir(series_dir) if file_name.endswith('.parquet'))
+        if start is not None:
+            months = [month for month in months if month >= self.__to_month(start)]
+        if end is not None:
+            months = [month for month in months if month <= self.__to_month(end)]
+        return [os.path.join(series_dir, month + '.parquet') for month in months]
+
+    def write(self, exchange, base, quote, df):
+        new_df = self.sort_unique(df)
+        if len(new_df) == 0:
+            return
+        info = self.get_series_info(exchange, base, quote)
+        series_dir = self.get_series_path(exchange, base, quote)
+        os.makedirs(series_dir, exist_ok=True)
+        months = self.__to_months(new_df['timestamp'].to_numpy())
+        rows = info['rows'] if info is not None else 0
+        for month in np.unique(months):
+            partition_df = new_df[months == month]
+            file_path = os.path.join(series_dir, month + '.parquet')
+            if os.path.exists(file_path):
+                existing_df = pq.read_table(file_path).to_pandas()
+                rows -= len(existing_df)
+                partition_df = self.sort_unique(pd.concat([existing_df, partition_df], ignore_index=True))
+            rows += len(partition_df)
+            self.__replace_file(file_path, partition_df)
+        timestamps = new_df['timestamp'].to_numpy()
+        first_ts = min(info['first_ts'], timestamps[0]) if info is not None else timestamps[0]
+        last_ts = max(info['last_ts'], timestamps[-1]) if info is not None else timestamps[-1]
+        self.manifest.update_entry(exchange, base, quote, series_dir, first_ts, last_ts, rows, self.get_interval(timestamps, info))
+
+    def read(self, exchange, base, quote, start=None, end=None, columns=None):
+        files = self.get_partition_files(exchange, base, quote, start, end)
+        if len(files) == 0:
+            return None if not self.exists(exchange, base, quote) else pd.DataFrame(columns=columns or self.columns)
+        filters = []
+        if start is not None:
+            filters.append(('timestamp', '>=', int(start)))
+        if end is not None:
+            filters.append(('timestamp', '<=', int(end)))
+        read_columns = None if columns is None else ['timestamp'] + [column for column in columns if column != 'timestamp']
+        tables = [pq.read_table(file_path, columns=read_columns, filters=filters or None) for file_path in files]
+        df = pa.concat_tables(tables).to_pandas()
+        return df if columns is None else df[list(columns)]
+
+    def rebuild_manifest(self):
+        if not os.path.isdir(self.root_dir):
+            return
+        for exchange in os.listdir(self.root_dir):
+            exchange_dir = os.path.join(self.root_dir, exchange)
+            if not os.path.isdir(exchange_dir):
+                continue
+            for pair in os.listdir(exchange_dir):
+                base, _, quote = pair.rpartition('-')
+                self.get_series_info(exchange, base, quote)
+
+    def __replace_file(self, file_path, df):
+        self.replace_file(file_path, lambda tmp_path: pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path, compression=self.compression))
+
+    def __scan_series_dir(self, series_dir, stat, previous_entry):
+        '''
+        builds a manifest entry from the parquet footers only, no data page is read except the timestamps of the last month
+        '''
+        files = sorted(os.path.join(series_dir, file_name) for file_name in os.listdir(series_dir) if file_name.endswith('.parquet'))
+        if len(files) == 0:
+            return None
+        rows = sum(pq.read_metadata(file_path).num_rows for file_path in files)
+        first_ts = self.__get_timestamp_statistics(files[0])[0]
+        last_timestamps = pq.read_table(files[-1], columns=['timestamp'])['timestamp'].to_numpy()
+        return {
+            'first_ts': int(first_ts),
+            'last_ts': int(last_timestamps[-1]),
+            'rows': rows,
+            'interval_ms': int(last_timestamps[-1] - last_timestamps[-2]) if len(last_timestamps) > 1 else None,
+        }
+
+    @staticmethod
+    def __get_timestamp_statistics(file_path):
+        metadata = pq.read_metadata(file_path)
+        column_index = metadata.schema.names.index('timestamp')
+        mins = []
+        maxs = []
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(column_index).statistics
+            mins.append(statistics.min)
+            maxs.append(statistics.max)
+        return min(mins), max(maxs)
+
+    @staticmethod
+    def __to_months(timestamps):
+        return np.datetime_as_string(np.asarray(timestamps, dtype=np.int64).astype('datetime64[ms]').astype('datetime64[M]'))
+
+    @classmethod
+    def __to_month(cls, ts):
+        return str(cls.__to_months([int(ts)])[0])
+
+
+class BinaryStorage(StorageBackend):
+    '''
+    fixed-width binary file per series: <data_dir>/binary/<exchange>-<base>-<quote>.ohlc
+    a 128 byte header (magic, version, interval_ms, exchange, base, quote) is followed by 40 byte records (int64 timestamp, float64 open/high/low/close).
+    readers map the records with numpy.memmap, and a bar is found at (ts - first_ts) // interval_ms unless the series has gaps.
+    '''
+    name = 'binary'
+    magic = b'OHLCBIN1'
+    version = 1
+    header_format = '<8sIIq32s32s32s'
+    header_size = 128
+    record_dtype = np.dtype([('timestamp', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8')])
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+        self.root_dir = os.path.join(data_dir, 'binary')
+        self.manifest = SeriesManifest(os.path.join(self.root_dir, 'manifest.json'), self.__scan_file)
+
+    def get_series_path(self, exchange, base, quote):
+        return os.path.join(self.root_dir, exchange + '-' + base + '-' + quote + '.ohlc')
+
+    def read_header(self, file_path):
+        with open(file_path, 'rb') as f:
+            data = f.read(struct.calcsize(self.header_format))
+        magic, version, header_size, interval_ms, exchange, base, quote = struct.unpack(self.header_format, data)
+        if magic != self.magic:
+            raise ValueError(f'{file_path} is not an OHLC binary file')
+        return {'version': version, 'header_size': header_size, 'interval_ms': interval_ms,
+                'exchange': exchange.rstrip(b'\0').decode(), 'base': base.rstrip(b'\0').decode(), 'quote': quote.rstrip(b'\0').decode()}
+
+    def open_series(self, exchange, base, quote):
+        '''
+        returns the records of the series as a read-only numpy.memmap (zero-copy), or None if the series isn't stored
+        '''
+        file_path = self.get_series_path(exchange, base, quote)
+        if not os.path.exists(file_path):
+            return None
+        num_records = (os.path.getsize(file_path) - self.header_size) // self.record_dtype.itemsize
+        if num_records <= 0:
+            return np.empty(0, dtype=self.record_dtype)
+        return np.memmap(file_path, dtype=self.record_dtype, mode='r', offset=self.header_size, shape=(num_records,))
+
+    def get_index(self, records, ts, interval_ms, side='left'):
+        '''
+        index of the first record with timestamp >= ts (side='left') or > ts (side='right').
+        the offset is computed directly when the bars before ts have no gap, otherwise it falls back to a binary search.
+        '''
+        if len(records) == 0:
+            return 0
+        first_ts = int(records[0]['timestamp'])
+        if interval_ms > 0 and ts >= first_ts and (ts - first_ts) % interval_ms == 0:
+            index = (ts - first_ts) // interval_ms
+            if index < len(records) and int(records[index]['timestamp']) == ts:
+                return index if side == 'left' else index + 1
+        return int(np.searchsorted(records['timestamp'], ts, side=side))
+
+    def write(self, exchange, base, quote, df):
+        file_path = self.get_series_path(exchange, base, quote)
+        new_df = self.sort_unique(df)
+        if len(new_df) == 0:
+            return
+        new_records = self.__to_records(new_df)
+        info = self.get_series_info(exchange, base, quote)
+        if info is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            interval_ms = self.get_interval(new_records['timestamp'])
+            self.__replace_file(file_path, exchange, base, quote, interval_ms, new_records)
+            first_ts, rows = new_records['timestamp'][0], len(new_records)
+        elif new_records['timestamp'][0] > info['last_ts']:
+            # every new bar is after the stored ones, append the records
+            self.__append_records(file_path, new_records)
+            if not info['interval_ms'] and self.read_header(file_path)['interval_ms'] == 0:
+                # the file was created with a single bar, its interval is known only now
+                self.__write_header_interval(file_path, self.get_interval(np.append(info['last_ts'], new_records['timestamp'])))
+            first_ts, rows = info['first_ts'], info['rows'] + len(new_records)
+        else:
+            header = self.read_header(file_path)
+            existing_df = pd.DataFrame(np.array(self.open_series(exchange, base, quote)))
+            combined_df = self.sort_unique(pd.concat([existing_df, new_df], ignore_index=True))
+            new_records = self.__to_records(combined_df)
+            interval_ms = header['interval_ms'] or self.get_interval(new_records['timestamp'])
+            self.__replace_file(file_path, exchange, base, quote, interval_ms, new_records)
+            first_ts, rows = new_records['timestamp'][0], len(new_records)
+        timestamps = new_records['timestamp']
+        self.manifest.update_entry(exchange, base, quote, file_path, first_ts, timestamps[-1], rows, self.get_interval(timestamps, info))
+
+    def read(self, exchange, base, quote, start=None, end=None, columns=None):
+        records = self.open_series(exchange, base, quote)
+        if records is None:
+            return None
+        interval_ms = self.read_header(self.get_series_path(exchange, base, quote))['interval_ms']
+        begin = self.get_index(records, int(start), interval_ms) if start is not None else 0
+        stop = self.get_index(records, int(end), interval_ms, side='right') if end is not None else len(records)
+        selected = records[begin:stop]
+        columns = list(columns) if columns is not None else self.columns
+        return pd.DataFrame({column: np.array(selected[column]) for column in columns})
+
+    def rebuild_manifest(self):
+        if not os.path.isdir(self.root_dir):
+            return
+        file_names = [file_name for file_name in os.listdir(self.root_dir) if file_name.endswith('.ohlc')]
+        self.manifest.prune(file_names)
+        for file_name in file_names:
+            header = self.read_header(os.path.join(self.root_dir, file_name))
+            self.get_series_info(header['exchange'], header['base'], header['quote'])
+
+    def __to_records(self, df):
+        records = np.empty(len(df), dtype=self.record_dtype)
+        for column in self.columns:
+            records[column] = df[column].to_numpy()
+        return records
+
+    def __replace_file(self, file_path, exchange, base, quote, interval_ms, records):
+        header = struct.pack(self.header_format, self.magic, self.version, self.header_size, int(interval_ms or 0),
+                             exchange.encode()[:32], base.encode()[:32], quote.encode()[:32])
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(header.ljust(self.header_size, b'\0'))
+                f.write(records.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self.replace_file(file_path, write)
+
+    def __write_header_interval(self, file_path, interval_ms):
+        # interval_ms follows magic, version and header_size
+        with open(file_path, 'rb+') as f:
+            f.seek(struct.calcsize('<8sII'))
+            f.write(struct.pack('<q', int(interval_ms)))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __append_records(self, file_path, records):
+        with open(file_path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            # drop a record cut by an earlier crash
+            torn = (size - self.header_size) % self.record_dtype.itemsize
+            if torn > 0:
+                f.truncate(size - torn)
+                f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __scan_file(self, file_path, stat, previous_entry):
+        '''
+        the header and the first and last records are enough to rebuild a manifest entry
+        '''
+        header = self.read_header(file_path)
+        num_records = (stat.st_size - self.header_size) // self.record_dtype.itemsize
+        if num_records <= 0:
+            return None
+        records = np.memmap(file_path, dtype=self.record_dtype, mode='r', offset=self.header_size, shape=(num_records,))
+        return {
+            'first_ts': int(records[0]['timestamp']),
+            'last_ts': int(records[-1]['timestamp']),
+            'rows': int(num_records),
+            'interval_ms': header['interval_ms'] or None,
+        }
@@ -0,0 +1,33 @@
+"""
+One minute bars and series shared by the tests
+"""
+import numpy as np
+import pandas as pd
+
+from OHLCData import OHLCSeries
+
+MINUTE = 60000
+JAN_31 = 1706659200000  # 2024-01-31 00:00:00 UTC
+
+
+def get_timestamps(start_ts, num_bars):
+    return start_ts + np.arange(num_bars, dtype=np.int64) * MINUTE
+
+
+def make_bars(start_ts, num_bars, close=None):
+    '''
+    DataFrame of num_bars bars from start_ts. close is one price for every bar or one per bar, 100 rising by 0.5 per bar by default
+    '''
+    return make_bars_at(get_timestamps(start_ts, num_bars), close)
+
+
+def make_bars_at(timestamps, close=None):
+    if close is None:
+        close = 100.0 + np.arange(len(timestamps)) * 0.5
+    close = np.broadcast_to(np.asarray(close, dtype=np.float64), len(timestamps))
+    return pd.DataFrame({'timestamp': timestamps, 'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close})
+
+
+def make_series(start_ts, num_bars, close=None):
+    df = make_bars(start_ts, num_bars, close)
+    return OHLCSeries(*[df[column].to_numpy() for column in OHLCSeries.columns])
@@ -1,8 +1,14 @@
 import threading
 
 class TickerData:
+    '''
+    registry of the tickers of every exchange, indexed by exchange and by (exchange, symbol).
+    a ticker added again for the same exchange and symbol replaces the previous one.
+    '''
+    __slots__ = ('ex_name', 'symbol', 'base', 'quote', 'type')
     _lock = threading.Lock()
-    _data = []
+    _by_exchange = {}
+    _by_symbol = {}
 
     def __init__(self, ex_name, symbol, base, quote, type):
         self.ex_name = ex_name
@@ -11,34 +17,46 @@ class TickerData:
         self.quote = quote
         self.type = type
 
-    @property
-    def ex_name(self):
-        return self._ex_name
+    def __repr__(self):
+        return f'TickerData({self.ex_name!r}, {self.symbol!r}, {self.base!r}, {self.quote!r}, {self.type!r})'
 
-    @ex_name.setter
-    def ex_name(self, value):
-        self._ex_name = value
-
-    @property
-    def symbol(self):
-        return self._symbol
-
-    @symbol.setter
-    def symbol(self, value):
-        self._symbol = value
+    def to_row(self):
+        return [self.symbol, self.base, self.quote, self.type]
 
     @classmethod
     def initialize(cls):
         with cls._lock:
-            cls._data = []
+            cls._by_exchange = {}
+            cls._by_symbol = {}
 
     @classmethod
     def add_ticker(cls, ex_name, symbol, base, quote, type):
         ticker_data = TickerData(ex_name, symbol, base, quote, type)
         with cls._lock:
-            cls._data.append(ticker_data)
+            tickers = cls._by_exchange.setdefault(ex_name, {})
+            tickers[symbol] = ticker_data
+            cls._by_symbol[(ex_name, symbol)] = ticker_data
+
+    @classmethod
+    def set_tickers(cls, ex_name, tickers):
+        '''
+        replaces every ticker of the exchange
+        '''
+        with cls._lock:
+            for symbol in cls._by_exchange.pop(ex_name, {}):
+                del cls._by_symbol[(ex_name, symbol)]
+            cls._by_exchange[ex_name] = {ticker.symbol: ticker for ticker in tickers}
+            for ticker in tickers:
+                cls._by_symbol[(ex_name, ticker.symbol)] = ticker
 
     @classmethod
     def get_tickers_by_exchange(cls, ex_name):
         with cls._lock:
-            return [ticker for ticker in cls._data if ticker.ex_name == ex_name]
+            return list(cls._by_exchange.get(ex_name, {}).values())
+
+    @classmethod
+    def get_ticker(cls, ex_name, symbol):
+        '''
+        returns the ticker, or None if the exchange has no such symbol
+        '''
+        return cls._by_symbol.get((ex_name, symbol))
@@ -0,0 +1,148 @@
+import asyncio
+import collections
+import time
+
+import numpy as np
+
+from OHLCData import OHLCSeries
+from Metrics import Metrics
+
+
+class WriterQueue:
+    '''
+    series writes served by writer workers, so download coroutines hand their bars over and go on fetching.
+    writes queued for the same series are batched into one write, and writes of one series are applied in order by one worker at a time.
+    put() waits while the queued bars take more than max_pending_bytes (backpressure when storage falls behind).
+    write_func(exchange, base, quote, series) is awaited by the workers and must run the file I/O off the event loop.
+    once a write of a series fails, the writes of the series queued after it are dropped, so no hole is left behind appended bars,
+    and the error is raised by the next put or flush of the series, or by flush() of all series.
+    '''
+    def __init__(self, write_func, num_workers=1, max_pending_bytes=256 * 1024 * 1024):
+        self.write_func = write_func
+        self.num_workers = num_workers
+        self.max_pending_bytes = max_pending_bytes
+        self.pending = {}
+        self.active = set()
+        self.ready = asyncio.Queue()
+        self.changed = asyncio.Condition()
+        self.pending_bytes = 0
+        self.errors = {}
+        self.workers = []
+        self.stats = {'writes': 0, 'batches': 0, 'bars': 0, 'errors': 0, 'max_depth': 0, 'max_pending_bytes': 0,
+                      'backpressure_wait': 0.0, 'flush_latencies': collections.deque(maxlen=10000)}
+
+    def start(self):
+        self.workers = [asyncio.create_task(self.__worker()) for i in range(self.num_workers)]
+
+    async def close(self):
+        '''
+        waits for every queued write, then stops the workers. raises the first failed write not raised yet
+        '''
+        try:
+            await self.flush()
+        finally:
+            for worker in self.workers:
+                worker.cancel()
+            await asyncio.gather(*self.workers, return_exceptions=True)
+            self.workers = []
+
+    async def put(self, exchange, base, quote, series):
+        key = (exchange, base, quote)
+        if key in self.errors:
+            raise self.errors.pop(key)
+        started_at = time.time()
+        async with self.changed:
+            # a write bigger than the limit is still accepted once nothing else is pending
+            await self.changed.wait_for(lambda: self.pending_bytes == 0 or self.pending_bytes + series.nbytes <= self.max_pending_bytes)
+            self.stats['backpressure_wait'] += time.time() - started_at
+            if key not in self.pending:
+                self.pending[key] = []
+                if key not in self.active:
+                    self.ready.put_nowait(key)
+            self.pending[key].append((series, time.time()))
+            self.pending_bytes += series.nbytes
+            self.stats['max_depth'] = max(self.stats['max_depth'], self.get_depth())
+            self.stats['max_pending_bytes'] = max(self.stats['max_pending_bytes'], self.pending_bytes)
+            self.__set_gauges()
+
+    async def flush(self, exchange=None, base=None, quote=None):
+        '''
+        waits until every queued write of the series, or of all series if none is given, is written or dropped.
+        raises the error of a failed write of the series, or the first one of all series
+        '''
+        key = (exchange, base, quote)
+        async with self.changed:
+            if exchange is None:
+                await self.changed.wait_for(lambda: len(self.pending) == 0 and len(self.active) == 0)
+                errors = list(self.errors.values())
+                self.errors.clear()
+                if len(errors) > 0:
+                    raise errors[0]
+            else:
+                await self.changed.wait_for(lambda: key not in self.pending and key not in self.active)
+                if key in self.errors:
+                    raise self.errors.pop(key)
+
+    def get_depth(self):
+        return sum(len(writes) for writes in self.pending.values())
+
+    def get_stats(self):
+        latencies = np.array(self.stats['flush_latencies']) if len(self.stats['flush_latencies']) > 0 else np.zeros(1)
+        return {
+            'writes': self.stats['writes'],
+            'batches': self.stats['batches'],
+            'bars': self.stats['bars'],
+            'errors': self.stats['errors'],
+            'depth': self.get_depth(),
+            'max_depth': self.stats['max_depth'],
+            'pending_bytes': self.pending_bytes,
+            'max_pending_bytes': self.stats['max_pending_bytes'],
+            'backpressure_wait': self.stats['backpressure_wait'],
+            'flush_latency_mean': float(latencies.mean()),
+            'flush_latency_p95': float(np.percentile(latencies, 95)),
+            'flush_latency_max': float(latencies.max()),
+        }
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f"Writer: {stats['writes']} writes in {stats['batches']} batches ({stats['bars']} bars, {stats['errors']} errors), "
+              f"max depth {stats['max_depth']}, max pending {stats['max_pending_bytes'] / 1e6:.1f}MB, "
+              f"backpressure {stats['backpressure_wait']:.1f}s, flush latency mean {stats['flush_latency_mean'] * 1000:.0f}ms "
+              f"p95 {stats['flush_latency_p95'] * 1000:.0f}ms max {stats['flush_latency_max'] * 1000:.0f}ms")
+
+    async def __worker(self):
+        while True:
+            key = await self.ready.get()
+            async with self.changed:
+                writes = self.pending.pop(key)
+                self.active.add(key)
+            batch = OHLCSeries.concat([series for series, queued_at in writes])
+            written = False
+            if key in self.errors:
+                print(f'Dropping {len(batch)} bars of {"-".join(key)} queued after a failed write')
+            else:
+                try:
+                    await self.write_func(*key, batch)
+                    written = True
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    self.errors[key] = e
+                    print(f'Error writing {"-".join(key)}: {e!r}')
+            written_at = time.time()
+            async with self.changed:
+                self.active.discard(key)
+                self.pending_bytes -= sum(series.nbytes for series, queued_at in writes)
+                if written:
+                    self.stats['writes'] += len(writes)
+                    self.stats['batches'] += 1
+                    self.stats['bars'] += len(batch)
+                    self.stats['flush_latencies'].extend(written_at - queued_at for series, queued_at in writes)
+                if key in self.pending:
+                    # more writes of the series were queued while it was being written
+                    self.ready.put_nowait(key)
+                self.__set_gauges()
+                self.changed.notify_all()
+
+    def __set_gauges(self):
+        Metrics.set_gauge('writer_queue_depth', self.get_depth())
+        Metrics.set_gauge('writer_queue_pending_bytes', self.pending_bytes)
@@ -0,0 +1,197 @@
+"""
+End-to-end downloader benchmark against the local MockExchange, no live endpoint is touched.
+The mock server runs in its own process, DataDownLoader.start runs here on a fresh data dir with the params below,
+and the run is reported as records/sec, requests/sec, peak RSS and the time of each stage.
+
+    python app/bench_downloader.py --exchanges okx bybit dydx apexpro --symbols 4 --days 3 --latency-ms 20
+    python app/bench_downloader.py --throttle-rate 0.05 --error-rate 0.01
+    python app/bench_downloader.py --max-requests-per-sec 20 --rate-limit 5 --rate-limit-max 40    # adaptive rate limiter
+    python app/bench_downloader.py --output result.json
+    python app/bench_downloader.py --baseline result.json --tolerance 0.2    # exits 1 on a regression
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+
+import yaml
+
+from MockExchange import MockExchange
+
+PARAMS = {
+    'since_num_days_before': 3,
+    'storage_format': 'csv',
+    'process_pool_size': 2,
+    'writer_workers': 2,
+    'writer_max_pending_mb': 256,
+    'rollup_timeframes': [],
+    'fast_kline_decode': True,
+    'ohlcv_data_interval': {'okx': '1m', 'bybit': 1, 'dydx': '1MIN', 'apexpro': 1},
+    'max_download_per_trial': {'okx': 100, 'bybit': 200, 'dydx': 100, 'apexpro': 1500},
+    'concurrent_downloads': {'okx': 4, 'bybit': 8, 'dydx': 4, 'apexpro': 4},
+    'rate_limit_per_sec': {'okx': 1000, 'bybit': 1000, 'dydx': 1000, 'apexpro': 1000},
+    'backfill_shards': {'bybit': 4, 'dydx': 4, 'apexpro': 4},
+    'backfill_window_pages': 10,
+}
+
+
+def serve(mock_args, conn):
+    async def run():
+        mock = MockExchange(**mock_args)
+        await mock.start()
+        conn.send((mock.get_endpoints(), mock.get_num_bars(), mock.url))
+        await asyncio.Event().wait()
+    asyncio.run(run())
+
+
+def get_peak_rss_mb(who):
+    # ru_maxrss is in KB on linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def write_yaml(path, data):
+    with open(path, 'w') as f:
+        yaml.dump(data, f)
+
+
+def run(args):
+    mock_args = {'num_symbols': args.symbols, 'num_days': args.days, 'latency': args.latency_ms / 1000, 'page_size': args.page_size,
+                 'error_rate': args.error_rate, 'throttle_rate': args.throttle_rate, 'max_requests_per_sec': args.max_requests_per_sec, 'seed': args.seed}
+    ctx = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = ctx.Pipe()
+    server = ctx.Process(target=serve, args=(mock_args, child_conn), daemon=True)
+    server.start()
+    endpoints, num_bars, url = parent_conn.recv()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_downloader_')
+    cwd = os.getcwd()
+    try:
+        # DataWriter.write_ticker_data writes ./app/all_tickers.csv
+        os.makedirs(os.path.join(work_dir, 'app'))
+        params = dict(PARAMS, exchanges=args.exchanges, since_num_days_before=args.days, storage_format=args.storage_format,
+                      rate_limit_per_sec={ex: args.rate_limit for ex in args.exchanges}, rate_limit_max_per_sec={ex: args.rate_limit_max or args.rate_limit for ex in args.exchanges},
+                      process_pool_size=args.process_pool_size, writer_workers=args.writer_workers, fast_kline_decode=not args.slow_decode,
+                      data_dir=os.path.join(work_dir, 'Data'), metrics={'path': args.metrics and os.path.abspath(args.metrics),
+                                                                        'format': 'json' if args.metrics and args.metrics.endswith('.json') else 'prometheus'})
+        write_yaml(os.path.join(work_dir, 'params.yaml'), params)
+        write_yaml(os.path.join(work_dir, 'apiendpoints.yaml'), {ex: endpoints[ex] for ex in args.exchanges})
+        os.chdir(work_dir)
+
+        from DataDownLoader import DataDownLoader
+        from DataWriter import DataWriter
+        from TickerData import TickerData
+        loader = DataDownLoader(os.path.join(work_dir, 'params.yaml'), os.path.join(work_dir, 'apiendpoints.yaml'))
+        rss_before = get_peak_rss_mb(resource.RUSAGE_SELF)
+        started_at = time.perf_counter()
+        asyncio.run(loader.start(args.mode))
+        elapsed = time.perf_counter() - started_at
+        stored_bars = 0
+        for ex in args.exchanges:
+            for ticker in TickerData.get_tickers_by_exchange(ex):
+                info = DataWriter.get_series_info(ex, ticker.base, ticker.quote)
+                stored_bars += info['rows'] if info is not None else 0
+        with urllib.request.urlopen(url + '/stats') as resp:
+            server_stats = json.load(resp)
+        num_records = sum(loader.ohlcv_download_num.values())
+        num_requests = sum(stats['requests'] for stats in loader.http_stats.values())
+        return {
+            'exchanges': args.exchanges,
+            'mock': mock_args,
+            'records': num_records,
+            'stored_bars': stored_bars,
+            'available_bars': num_bars * args.symbols * len(args.exchanges),
+            'requests': num_requests,
+            'elapsed': elapsed,
+            'records_per_sec': num_records / elapsed,
+            'requests_per_sec': num_requests / elapsed,
+            'peak_rss_mb': get_peak_rss_mb(resource.RUSAGE_SELF),
+            'rss_before_start_mb': rss_before,
+            # process pool workers, joined when the download finished
+            'peak_worker_rss_mb': get_peak_rss_mb(resource.RUSAGE_CHILDREN),
+            'stages': dict(loader.stage_elapsed),
+            'exchange_elapsed': dict(loader.download_elapsed),
+            'writer': DataWriter.writer_stats,
+            'server': server_stats,
+            'http': dict(loader.http_stats),
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        server.terminate()
+
+
+def print_result(result):
+    print('=' * 60)
+    print(f"{', '.join(result['exchanges'])}: {result['mock']['num_symbols']} symbols x {result['mock']['num_days']} days, "
+          f"latency {result['mock']['latency'] * 1000:.0f}ms, error rate {result['mock']['error_rate']}, throttle rate {result['mock']['throttle_rate']}")
+    print(f"  records       : {result['records']} downloaded, {result['stored_bars']} bars stored of {result['available_bars']} served by the mock")
+    print(f"  throughput    : {result['records_per_sec']:.0f} records/sec, {result['requests_per_sec']:.1f} requests/sec ({result['requests']} requests in {result['elapsed']:.2f}s)")
+    print(f"  peak RSS      : {result['peak_rss_mb']:.0f}MB ({result['rss_before_start_mb']:.0f}MB before start), pool workers {result['peak_worker_rss_mb']:.0f}MB")
+    print(f"  stages        : " + ', '.join(f'{stage} {elapsed:.2f}s' for stage, elapsed in result['stages'].items()))
+    print(f"  exchanges     : " + ', '.join(f'{ex} {elapsed:.2f}s' for ex, elapsed in result['exchange_elapsed'].items()))
+    if result['writer'] is not None:
+        print(f"  writer        : {result['writer']['batches']} batches, flush latency mean {result['writer']['flush_latency_mean'] * 1000:.0f}ms "
+              f"p95 {result['writer']['flush_latency_p95'] * 1000:.0f}ms, backpressure {result['writer']['backpressure_wait']:.2f}s")
+    print(f"  server        : {result['server']['kline_requests']} kline requests, {result['server']['throttled']} throttled, {result['server']['errors']} errors injected")
+    print(f"  client        : " + ', '.join(f"{ex} {stats['retries']} retries, rate {stats['rate']:.1f}/s" for ex, stats in result['http'].items()))
+
+
+def check_baseline(result, baseline_path, tolerance):
+    '''
+    returns the regressions against a result saved with --output
+    '''
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    if result['records_per_sec'] < baseline['records_per_sec'] * (1 - tolerance):
+        regressions.append(f"records/sec {result['records_per_sec']:.0f} < baseline {baseline['records_per_sec']:.0f}")
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f"peak RSS {result['peak_rss_mb']:.0f}MB > baseline {baseline['peak_rss_mb']:.0f}MB")
+    if result['stored_bars'] < baseline['stored_bars']:
+        regressions.append(f"stored bars {result['stored_bars']} < baseline {baseline['stored_bars']}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--exchanges', nargs='+', default=['okx', 'bybit', 'dydx', 'apexpro'], choices=['okx', 'bybit', 'dydx', 'apexpro'])
+    parser.add_argument('--symbols', type=int, default=4, help='symbols per exchange')
+    parser.add_argument('--days', type=int, default=3, help='days of 1 minute bars per symbol')
+    parser.add_argument('--latency-ms', type=float, default=20, help='server latency per request')
+    parser.add_argument('--page-size', type=int, default=None, help='max bars per response, below max_download_per_trial')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of kline requests answered with a 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of kline requests answered with a 429')
+    parser.add_argument('--max-requests-per-sec', type=int, default=None, help='kline requests per exchange and second the mock allows before answering 429')
+    parser.add_argument('--rate-limit', type=float, default=1000, help='rate_limit_per_sec of every exchange')
+    parser.add_argument('--rate-limit-max', type=float, default=None, help='rate_limit_max_per_sec of every exchange (default: --rate-limit)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', choices=['update', 'repair'], default='update')
+    parser.add_argument('--storage-format', choices=['csv', 'parquet', 'binary'], default='csv')
+    parser.add_argument('--process-pool-size', type=int, default=PARAMS['process_pool_size'])
+    parser.add_argument('--writer-workers', type=int, default=PARAMS['writer_workers'])
+    parser.add_argument('--slow-decode', action='store_true', help='parse kline responses with resp.json() instead of KlineDecoder')
+    parser.add_argument('--metrics', help='write the Metrics snapshot of the run here (.json for json, otherwise Prometheus text)')
+    parser.add_argument('--output', help='write the result as json')
+    parser.add_argument('--baseline', help='result json of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression against the baseline')
+    args = parser.parse_args()
+
+    result = run(args)
+    print_result(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        regressions = check_baseline(result, args.baseline, args.tolerance)
+        for regression in regressions:
+            print('✗ regression: ' + regression)
+        if len(regressions) > 0:
+            sys.exit(1)
+        print('✓ no regression against ' + args.baseline)
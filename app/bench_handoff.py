@@ -0,0 +1,99 @@
+"""
+Benchmark of the converter -> writer handoff: the previous OHLCData global dict polled by write_data against passing the OHLCSeries directly.
+Many symbols convert and hand over small pages concurrently, the write itself is a no-op so only the handoff is measured.
+Two downloads of the same symbol run at once too, to check none of their pages is lost or mixed up.
+
+    python app/bench_handoff.py [num_symbols] [pages_per_symbol]
+"""
+import asyncio
+import sys
+import threading
+import time
+
+import numpy as np
+
+from OhlcConverter import OHLCConverter
+
+MINUTE = 60000
+
+# the previous OHLCData global store and its lock, kept here only for the comparison
+legacy_store = {}
+legacy_lock = threading.Lock()
+
+
+def make_page(start_ts, num_bars=200):
+    return [[str(start_ts + i * MINUTE), '100.5', '101', '99.25', '100.75', '10', '1000'] for i in reversed(range(num_bars))]
+
+
+class NullWriter:
+    def __init__(self):
+        self.latencies = []
+        self.written = {}
+
+    async def write(self, key, series, converted_at):
+        self.latencies.append(time.perf_counter() - converted_at)
+        self.written.setdefault(key, []).append(int(series.timestamp.min()))
+        await asyncio.sleep(0)
+
+
+async def legacy_write_data(writer, exchange, symbol, base, quote, converted_at):
+    # DataWriter.write_data before the direct handoff
+    counter = 0
+    while True:
+        with legacy_lock:
+            if (exchange, symbol, base, quote) in legacy_store:
+                break
+        await asyncio.sleep(1)
+        counter += 1
+        if counter > 10:
+            return
+    with legacy_lock:
+        series = legacy_store.pop((exchange, symbol, base, quote))
+    await writer.write((exchange, symbol, base, quote), series, converted_at)
+
+
+async def download_legacy(writer, symbol, pages):
+    for page in pages:
+        converted_at = time.perf_counter()
+        series = OHLCConverter.to_series('bybit', page)
+        with legacy_lock:
+            legacy_store[('bybit', symbol, symbol, 'USDT')] = series
+        await asyncio.sleep(0)  # other downloads run between convert_ohlc and write_data
+        await legacy_write_data(writer, 'bybit', symbol, symbol, 'USDT', converted_at)
+
+
+async def download_direct(writer, symbol, pages):
+    for page in pages:
+        converted_at = time.perf_counter()
+        series = await OHLCConverter.convert_ohlc('bybit', page)
+        await asyncio.sleep(0)
+        await writer.write(('bybit', symbol, symbol, 'USDT'), series, converted_at)
+
+
+async def run_mode(download, num_symbols, num_pages):
+    legacy_store.clear()
+    writer = NullWriter()
+    symbols = ['SYM' + str(i) for i in range(num_symbols)]
+    pages = {symbol: [make_page(1704067200000 + (i * num_symbols + j) * 200 * MINUTE) for i in range(num_pages)]
+             for j, symbol in enumerate(symbols)}
+    # the same symbol downloaded twice at once, e.g. an update and a repair run
+    jobs = [download(writer, symbol, pages[symbol]) for symbol in symbols] + [download(writer, symbols[0], pages[symbols[0]])]
+    started_at = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started_at
+    expected = sorted([int(page[-1][0]) for page in pages[symbols[0]]] * 2)
+    written = sorted(writer.written.get(('bybit', symbols[0], symbols[0], 'USDT'), []))
+    return elapsed, np.array(writer.latencies), written == expected
+
+
+async def run(num_symbols=200, num_pages=20):
+    OHLCConverter.initialize()
+    print(f'{num_symbols} symbols x {num_pages} pages of 200 bars')
+    for name, download in [('global dict', download_legacy), ('direct', download_direct)]:
+        elapsed, latencies, intact = await run_mode(download, num_symbols, num_pages)
+        print(f'  {name:12s}: {elapsed * 1000:8.1f} ms total, convert+handoff latency mean {latencies.mean() * 1e6:8.1f} us '
+              f'p99 {np.percentile(latencies, 99) * 1e6:8.1f} us, concurrent downloads of one symbol intact={intact}')
+
+
+if __name__ == '__main__':
+    asyncio.run(run(*[int(arg) for arg in sys.argv[1:3]]))
@@ -0,0 +1,72 @@
+"""
+Benchmark of kline response decoding: json.loads (what resp.json() does) + OHLCConverter against the KlineDecoder backends.
+Payloads follow the recorded bybit / dydx / apexpro responses, at the page sizes of ignore/params.yaml.
+
+    python app/bench_kline_decoder.py [num_pages]
+"""
+import datetime
+import json
+import sys
+import time
+
+import numpy as np
+
+from KlineDecoder import KlineDecoder
+from OhlcConverter import OHLCConverter
+from OHLCData import OHLCSeries
+
+
+def make_payloads(num_pages):
+    start_ts = 1686632400000
+    payloads = {'bybit': [], 'dydx': [], 'apexpro': []}
+    for page in range(num_pages):
+        bybit_rows, dydx_rows, apexpro_rows = [], [], []
+        for i in range(1500):
+            ts = start_ts + (page * 1500 + i) * 60000
+            o, h, l, c = f'{26000 + (i % 1000) * 0.1:.1f}', f'{26010 + (i % 997) * 0.1:.1f}', f'{25990 + (i % 991) * 0.1:.1f}', f'{26001 + (i % 983) * 0.1:.1f}'
+            if i < 200:
+                bybit_rows.append([str(ts), o, h, l, c, '1193839', '11938.39'])
+            if i < 100:
+                started_at = datetime.datetime.fromtimestamp(ts / 1000, tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+                dydx_rows.append({'startedAt': started_at, 'updatedAt': started_at, 'market': 'BTC-USD', 'resolution': '1MIN', 'low': l, 'high': h,
+                                  'open': o, 'close': c, 'baseTokenVolume': '134.4184', 'trades': '381', 'usdVolume': '3492552.6768', 'startingOpenInterest': '2521.6992'})
+            apexpro_rows.append({'s': 'BTCUSDC', 'i': '1', 't': ts, 'c': c, 'h': h, 'l': l, 'o': o, 'v': '2.266', 'tr': '56967.19'})
+        payloads['bybit'].append(json.dumps({'retCode': 0, 'retMsg': 'OK', 'result': {'category': 'linear', 'symbol': 'BTCUSDT', 'list': bybit_rows}}).encode())
+        payloads['dydx'].append(json.dumps({'candles': dydx_rows}).encode())
+        payloads['apexpro'].append(json.dumps({'data': {'BTCUSDC': apexpro_rows}, 'timeCost': 4266657}).encode())
+    return payloads
+
+
+def decode_legacy(ex_name, body, symbol):
+    res = json.loads(body)
+    rows = {'bybit': lambda: res['result']['list'], 'dydx': lambda: res['candles'], 'apexpro': lambda: res['data'][symbol]}[ex_name]()
+    return OHLCConverter.to_series(ex_name, rows)
+
+
+def best_of(func, repeat):
+    best = None
+    for i in range(repeat):
+        started_at = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def run(num_pages=20, repeat=5):
+    payloads = make_payloads(num_pages)
+    print(f'{num_pages} pages per exchange, best of {repeat}, backends: {KlineDecoder.get_backends()}')
+    for ex_name, bodies in payloads.items():
+        num_bars = sum(len(decode_legacy(ex_name, body, 'BTCUSDC')) for body in bodies)
+        num_bytes = sum(len(body) for body in bodies)
+        expected, legacy_time = best_of(lambda: [decode_legacy(ex_name, body, 'BTCUSDC') for body in bodies], repeat)
+        line = f'  {ex_name:8s} {num_bars:6d} bars {num_bytes / 1e6:5.1f}MB: json+converter {legacy_time * 1000:7.1f} ms'
+        for backend in KlineDecoder.get_backends():
+            result, elapsed = best_of(lambda: [KlineDecoder.decode(ex_name, body, 'BTCUSDC', backend) for body in bodies], repeat)
+            same = all(np.array_equal(a.get_column(name), b.get_column(name)) for a, b in zip(result, expected) for name in OHLCSeries.columns)
+            line += f', {backend} {elapsed * 1000:7.1f} ms ({legacy_time / elapsed:4.1f}x{"" if same else " MISMATCH"})'
+        print(line)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
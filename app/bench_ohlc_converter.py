@@ -0,0 +1,78 @@
+"""
+Micro-benchmark of OHLCConverter against the previous per-element conversion.
+
+    python app/bench_ohlc_converter.py [num_bars]
+"""
+import asyncio
+import datetime
+import sys
+import time
+
+import numpy as np
+
+from OhlcConverter import OHLCConverter
+from OHLCData import OHLCSeries
+
+
+def make_pages(num_bars):
+    start_ts = 1686632400000
+    list_rows = []
+    dydx_rows = []
+    apexpro_rows = []
+    for i in range(num_bars):
+        ts = start_ts + i * 60000
+        o, h, l, c = f'{26000 + (i % 1000) * 0.1:.1f}', f'{26010 + (i % 997) * 0.1:.1f}', f'{25990 + (i % 991) * 0.1:.1f}', f'{26001 + (i % 983) * 0.1:.1f}'
+        list_rows.append([str(ts), o, h, l, c, '1193839', '11938.39', '314978168.712', '1'])
+        started_at = datetime.datetime.fromtimestamp(ts / 1000, tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        dydx_rows.append({'startedAt': started_at, 'updatedAt': started_at, 'market': 'BTC-USD', 'resolution': '1MIN',
+                          'low': l, 'high': h, 'open': o, 'close': c, 'baseTokenVolume': '134.4184', 'trades': '381'})
+        apexpro_rows.append({'s': 'BTCUSDC', 'i': '1', 't': ts, 'c': c, 'h': h, 'l': l, 'o': o, 'v': '2.266', 'tr': '56967.19'})
+    return {'okx': list_rows, 'bybit': list_rows, 'dydx': dydx_rows, 'apexpro': apexpro_rows}
+
+
+def convert_per_element(ex_name, ohlc_list):
+    # conversion done by OHLCConverter before vectorization, followed by the typed columns of OHLCSeries
+    return OHLCSeries(*parse_per_element(ex_name, ohlc_list))
+
+
+def parse_per_element(ex_name, ohlc_list):
+    if ex_name in ('okx', 'bybit'):
+        return ([int(item[0]) for item in ohlc_list], [float(item[1]) for item in ohlc_list], [float(item[2]) for item in ohlc_list],
+                [float(item[3]) for item in ohlc_list], [float(item[4]) for item in ohlc_list])
+    elif ex_name == 'dydx':
+        return ([int(datetime.datetime.fromisoformat(item['startedAt']).timestamp() * 1000) for item in ohlc_list],
+                [float(item['open']) for item in ohlc_list], [float(item['high']) for item in ohlc_list],
+                [float(item['low']) for item in ohlc_list], [float(item['close']) for item in ohlc_list])
+    return ([int(item['t']) for item in ohlc_list], [float(item['o']) for item in ohlc_list], [float(item['h']) for item in ohlc_list],
+            [float(item['l']) for item in ohlc_list], [float(item['c']) for item in ohlc_list])
+
+
+def best_of(func, repeat):
+    best = None
+    for i in range(repeat):
+        started_at = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+async def run(num_bars=130000, repeat=5):
+    OHLCConverter.initialize()
+    pages = make_pages(num_bars)
+    print(f'{num_bars} bars, best of {repeat}')
+    for ex_name, page in pages.items():
+        expected, legacy_time = best_of(lambda: convert_per_element(ex_name, page), repeat)
+        vector_time = None
+        for i in range(repeat):
+            started_at = time.perf_counter()
+            series = await OHLCConverter.convert_ohlc(ex_name, page)
+            elapsed = time.perf_counter() - started_at
+            vector_time = elapsed if vector_time is None else min(vector_time, elapsed)
+        same = all(np.array_equal(series.get_column(name), expected.get_column(name)) for name in OHLCSeries.columns)
+        print(f'  {ex_name:8s}: per-element {legacy_time * 1000:8.1f} ms, vectorized {vector_time * 1000:8.1f} ms '
+              f'({legacy_time / vector_time:4.1f}x), identical={same}')
+
+
+if __name__ == '__main__':
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 130000))
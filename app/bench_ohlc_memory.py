@@ -0,0 +1,65 @@
+"""
+Memory comparison between the previous list-of-dicts layout of OHLCData and the columnar OHLCSeries.
+
+    python app/bench_ohlc_memory.py [num_bars]
+"""
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from OHLCData import OHLCSeries
+
+
+def make_raw_columns(num_bars):
+    timestamps = [1686632400000 + i * 60000 for i in range(num_bars)]
+    opens = [26000.0 + (i % 100) * 0.5 for i in range(num_bars)]
+    highs = [o + 10.0 for o in opens]
+    lows = [o - 10.0 for o in opens]
+    closes = [o + 2.5 for o in opens]
+    return opens, highs, lows, closes, timestamps
+
+
+def build_list_of_dicts(opens, highs, lows, closes, timestamps):
+    # layout used by OHLCData.add_data before the columnar store
+    return [
+        {
+            'timestamp': timestamp,
+            'open': float(open_price),
+            'high': float(high_price),
+            'low': float(low_price),
+            'close': float(close_price),
+        }
+        for open_price, high_price, low_price, close_price, timestamp in zip(opens, highs, lows, closes, timestamps)
+    ]
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started_at
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def run(num_bars=130000):
+    raw = make_raw_columns(num_bars)
+    dicts, dict_bytes, dict_peak, dict_time = measure(build_list_of_dicts, *raw)
+    series, series_bytes, series_peak, series_time = measure(OHLCSeries, raw[4], raw[0], raw[1], raw[2], raw[3])
+    print(f'{num_bars} bars')
+    print(f'  list of dicts : {dict_bytes / 1e6:8.2f} MB retained, {dict_peak / 1e6:8.2f} MB peak, {dict_time * 1000:8.1f} ms')
+    print(f'  OHLCSeries    : {series_bytes / 1e6:8.2f} MB retained, {series_peak / 1e6:8.2f} MB peak, {series_time * 1000:8.1f} ms')
+    print(f'  column bytes  : {series.nbytes / 1e6:8.2f} MB ({series.nbytes / num_bars:.0f} bytes/bar)')
+    print(f'  ratio         : {dict_bytes / series_bytes:8.1f}x less memory')
+
+    _, frame_bytes, _, frame_time = measure(pd.DataFrame, dicts)
+    _, col_frame_bytes, _, col_frame_time = measure(series.to_frame)
+    print(f'  DataFrame from list of dicts : {frame_bytes / 1e6:8.2f} MB, {frame_time * 1000:8.1f} ms')
+    print(f'  DataFrame from columns       : {col_frame_bytes / 1e6:8.2f} MB, {col_frame_time * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 130000)
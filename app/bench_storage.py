@@ -0,0 +1,63 @@
+"""
+Benchmark of the csv, parquet and binary storage backends: write time, incremental update time, read time and size on disk.
+
+    python app/bench_storage.py [num_days]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from StorageBackend import StorageBackend
+
+MINUTE = 60000
+
+
+def make_bars(start_ts, num_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 26000 + np.cumsum(rng.normal(0, 5, num_bars)).round(1)
+    return pd.DataFrame({'timestamp': start_ts + np.arange(num_bars, dtype=np.int64) * MINUTE,
+                         'open': np.roll(close, 1), 'high': close + 3.5, 'low': close - 3.5, 'close': close})
+
+
+def get_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, file_name)) for root, _, file_names in os.walk(path) for file_name in file_names)
+
+
+def timed(func, *args, **kwargs):
+    started_at = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started_at
+
+
+def run(num_days=90, num_updates=20, update_bars=60):
+    start_ts = 1704067200000  # 2024-01-01
+    history = make_bars(start_ts, num_days * 1440)
+    updates = [make_bars(start_ts + (len(history) + i * update_bars) * MINUTE, update_bars, seed=i + 1) for i in range(num_updates)]
+    print(f'{len(history)} bars ({num_days} days), {num_updates} updates of {update_bars} bars')
+    print(f'  {"format":8s} {"write":>9s} {"update":>9s} {"full read":>10s} {"1 day read":>11s} {"size":>9s}')
+    for storage_format in ['csv', 'parquet', 'binary']:
+        data_dir = tempfile.mkdtemp()
+        try:
+            storage = StorageBackend.create(storage_format, data_dir)
+            _, write_time = timed(storage.write, 'bench', 'BTC', 'USDT', history)
+            update_times = [timed(storage.write, 'bench', 'BTC', 'USDT', update)[1] for update in updates]
+            df, read_time = timed(storage.read, 'bench', 'BTC', 'USDT')
+            day_start = start_ts + (num_days // 2) * 1440 * MINUTE
+            day, day_time = timed(storage.read, 'bench', 'BTC', 'USDT', start=day_start, end=day_start + 1440 * MINUTE - 1)
+            assert len(df) == len(history) + num_updates * update_bars and len(day) == 1440
+            size = get_size(storage.get_series_path('bench', 'BTC', 'USDT'))
+            print(f'  {storage_format:8s} {write_time * 1000:7.1f}ms {np.mean(update_times) * 1000:7.1f}ms '
+                  f'{read_time * 1000:8.1f}ms {day_time * 1000:9.1f}ms {size / 1e6:7.2f}MB')
+        finally:
+            shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 90)
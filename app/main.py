@@ -1,21 +1,55 @@
+import argparse
 import asyncio
 import os
+import signal
 from DataDownLoader import DataDownLoader
+from ShardCoordinator import ShardCoordinator
 
 
 class main:
-    def __init__(self) -> None:
+    def __init__(self, mode='update', params_path='./ignore/params.yaml', endpoints_path='./ignore/apiendpoints.yaml', shard=None) -> None:
         print(os.getcwd())
+        self.mode = mode
+        self.params_path = params_path
+        self.endpoints_path = endpoints_path
+        self.shard = shard
 
     async def start(self):
-        ddl = DataDownLoader()
+        ddl = DataDownLoader(self.params_path, self.endpoints_path, self.shard)
+        if self.mode in ('daemon', 'live'):
+            # docker stop sends SIGTERM, the polls and back-fills in flight are finished and what is queued is written before exiting
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, ddl.stop)
         try:
             async with asyncio.TaskGroup() as tg:
-                task = tg.create_task(ddl.start())
+                task = tg.create_task(ddl.start(self.mode))
         except* Exception as err:
             print(f"{err.exceptions=}")
 
 
 if __name__ == '__main__':
-    m  = main()
-    asyncio.run(m.start())
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['update', 'repair', 'daemon', 'live'], default='update',
+                        help='update: download bars after the stored ones, repair: download only the gaps inside the stored series, '
+                             'daemon: keep running and poll every series as its next bar closes, '
+                             'live: keep running and stream the closed bars from the WebSocket APIs')
+    parser.add_argument('--params', default='./ignore/params.yaml', help='params file')
+    parser.add_argument('--endpoints', default='./ignore/apiendpoints.yaml', help='api endpoints file, e.g. of a local mock exchange')
+    parser.add_argument('--workers', type=int, default=0, help='run this many shard worker processes sharing the rate limits, and print their merged summary')
+    parser.add_argument('--shard', help='i/K: run only shard i of K, e.g. on one of K hosts sharing the data directory')
+    parser.add_argument('--merge-shards', type=int, metavar='K', help='print the merged summary of the last --mode run of K shards and exit')
+    args = parser.parse_args()
+    if args.merge_shards:
+        data_dir = DataDownLoader(args.params, args.endpoints).data_dir
+        ShardCoordinator.print_summary(ShardCoordinator.merge_summaries(data_dir, args.mode, args.merge_shards))
+    elif args.workers > 0:
+        ShardCoordinator.print_summary(ShardCoordinator.start_workers(args.mode, args.params, args.endpoints, args.workers))
+    else:
+        shard = None
+        if args.shard is not None:
+            shard = tuple(int(n) for n in args.shard.split('/'))
+            if len(shard) != 2 or not 0 <= shard[0] < shard[1]:
+                parser.error(f'--shard must be i/K with 0 <= i < K, got {args.shard}')
+        m  = main(args.mode, args.params, args.endpoints, shard)
+        asyncio.run(m.start())
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Test script to verify DownloadCheckpoint persists and restores the download state
+"""
+import os
+import shutil
+import tempfile
+
+from DownloadCheckpoint import DownloadCheckpoint
+
+
+def test_checkpoint_round_trip():
+    """Test save, load, overwrite and remove"""
+    print("Testing checkpoint round trip...")
+    checkpoint_dir = os.path.join(tempfile.mkdtemp(), '.checkpoints')
+    try:
+        checkpoint = DownloadCheckpoint(checkpoint_dir, 'okx', 'BTC', 'USDT')
+        assert checkpoint.load() is None, "No checkpoint should load as None"
+        state = {'symbol': 'BTC-USDT-SWAP', 'bar': '1m', 'cursor': 1706659200000, 'num_chunks': 1, 'fetched': False}
+        checkpoint.save(state)
+        state.update(cursor=1706650000000, num_chunks=2)
+        checkpoint.save(state)
+        assert DownloadCheckpoint(checkpoint_dir, 'okx', 'BTC', 'USDT').load() == state, "Restored state differs"
+        assert os.listdir(checkpoint_dir) == ['okx-BTC-USDT.json'], "Temp file left behind"
+        print("✓ latest state restored by a new instance")
+
+        with open(os.path.join(checkpoint_dir, 'okx-BTC-USDT.json'), 'w') as f:
+            f.write('{"symbol": "BTC-')
+        assert checkpoint.load() is None, "Broken checkpoint should be ignored"
+        checkpoint.remove()
+        checkpoint.remove()
+        assert not os.path.exists(os.path.join(checkpoint_dir, 'okx-BTC-USDT.json')), "Checkpoint not removed"
+        print("✓ broken checkpoint ignored, remove is idempotent")
+    finally:
+        shutil.rmtree(os.path.dirname(checkpoint_dir))
+    print("✓ test_checkpoint_round_trip passed\n")
+
+
+def test_can_resume():
+    """Test only a job whose range continues the saved one resumes it"""
+    print("Testing checkpoint matching...")
+    state = {'symbol': 'BTC-USDT-SWAP', 'bar': '1m', 'since_ts': 1000, 'till_ts': 5000}
+    assert DownloadCheckpoint.can_resume(state, 'BTC-USDT-SWAP', '1m', 1000, 5000), "The same range should resume"
+    assert DownloadCheckpoint.can_resume(state, 'BTC-USDT-SWAP', '1m', 3000, 9000), "An update after partly written chunks should resume"
+    assert not DownloadCheckpoint.can_resume(state, 'BTC-USDT-SWAP', '5m', 1000, 5000), "Another bar size should not resume"
+    assert not DownloadCheckpoint.can_resume(state, 'BTC-USDT-SWAP', '1m', 500, 5000), "A range starting earlier would skip its first bars"
+    assert not DownloadCheckpoint.can_resume(state, 'BTC-USDT-SWAP', '1m', 6000, 9000), "A range after the saved one is another gap"
+    assert not DownloadCheckpoint.can_resume(state, 'BTC-USDT-SWAP', '1m', 1000, 4000), "A range ending earlier is another job"
+    assert not DownloadCheckpoint.can_resume(None, 'BTC-USDT-SWAP', '1m', 1000, 5000)
+    print("✓ checkpoints of other ranges not resumed")
+    print("✓ test_can_resume passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running checkpoint tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_checkpoint_round_trip()
+        test_can_resume()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -5,7 +5,7 @@ import os
 import pandas as pd
 import time
 from DataWriter import DataWriter
-from OHLCData import OHLCData
+from OHLCData import OHLCSeries
 from TickerData import TickerData
 
 def simulate_initial_download():
@@ -16,7 +16,6 @@ def simulate_initial_download():
     
     # Initialize
     TickerData.initialize()
-    OHLCData.initialize()
     
     # Add a test ticker
     TickerData.add_ticker('test_exchange', 'BTC-USD', 'BTC', 'USD', 'perpetual')
@@ -42,12 +41,11 @@ def simulate_initial_download():
     lows = [90 + i for i in range(10)]
     closes = [105 + i for i in range(10)]
     
-    OHLCData.add_data('test_exchange', 'BTC-USD', 'BTC', 'USD', 
-                      opens, highs, lows, closes, timestamps)
+    series = OHLCSeries(timestamps, opens, highs, lows, closes)
     
     # Write data
     import asyncio
-    asyncio.run(DataWriter.write_data('test_exchange', 'BTC-USD', 'BTC', 'USD'))
+    asyncio.run(DataWriter.write_data('test_exchange', 'BTC-USD', 'BTC', 'USD', series))
     
     # Verify file was created
     assert DataWriter.file_exists('test_exchange', 'BTC', 'USD'), "File should exist after write"
@@ -66,9 +64,6 @@ def simulate_incremental_download():
     print("TEST 2: Simulating incremental download (existing data)")
     print("=" * 60)
     
-    # Initialize
-    OHLCData.initialize()
-    
     # Get last timestamp from existing data
     last_ts = DataWriter.get_last_timestamp('test_exchange', 'BTC', 'USD')
     assert last_ts is not None, "Should have existing data from previous test"
@@ -88,12 +83,11 @@ def simulate_incremental_download():
     new_lows = [100 + i for i in range(5)]
     new_closes = [115 + i for i in range(5)]
     
-    OHLCData.add_data('test_exchange', 'BTC-USD', 'BTC', 'USD', 
-                      new_opens, new_highs, new_lows, new_closes, new_timestamps)
+    series = OHLCSeries(new_timestamps, new_opens, new_highs, new_lows, new_closes)
     
     # Write data (should append)
     import asyncio
-    asyncio.run(DataWriter.write_data('test_exchange', 'BTC-USD', 'BTC', 'USD'))
+    asyncio.run(DataWriter.write_data('test_exchange', 'BTC-USD', 'BTC', 'USD', series))
     
     # Verify data was appended
     df = pd.read_csv('./app/Data/test_exchange-BTC-USD.csv')
@@ -134,9 +128,6 @@ def simulate_gap_in_data():
     print("TEST 4: Simulating gap in data")
     print("=" * 60)
     
-    # Initialize
-    OHLCData.initialize()
-    
     # Create data with a gap
     timestamps_before = [1000000 + i * 60000 for i in range(5)]
     timestamps_after = [2000000 + i * 60000 for i in range(5)]  # Gap between 1240000 and 2000000
@@ -0,0 +1,132 @@
+"""
+Test script to verify GapScanner finds exactly the missing bars of stored series, and the repair mode restores them from the local MockExchange
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import yaml
+
+from DataDownLoader import DataDownLoader
+from DataReader import DataReader
+from DataWriter import DataWriter
+from GapScanner import GapScanner
+from MockExchange import MockExchange
+from OHLCData import OHLCSeries
+from StorageBackend import StorageBackend
+from TestFixtures import JAN_31, MINUTE, make_bars_at
+
+QUOTES = {'okx': 'USDT', 'bybit': 'USDT'}
+PARAMS = {
+    'exchanges': ['okx', 'bybit'],
+    'since_num_days_before': 1,
+    'storage_format': 'csv',
+    'process_pool_size': 0,
+    'fast_kline_decode': True,
+    'ohlcv_data_interval': {'okx': '1m', 'bybit': 1},
+    'max_download_per_trial': {'okx': 100, 'bybit': 200},
+    'concurrent_downloads': {'okx': 4, 'bybit': 4},
+    'rate_limit_per_sec': {'okx': 1000, 'bybit': 1000},
+    'backfill_shards': {'bybit': 2},
+}
+
+
+def test_get_gaps():
+    """Test gap detection on timestamp arrays"""
+    print("Testing get_gaps...")
+    timestamps = JAN_31 + np.arange(100, dtype=np.int64) * MINUTE
+    assert GapScanner.get_gaps(timestamps, MINUTE) == [], "Contiguous series has no gap"
+    holes = np.delete(timestamps, [5, 50, 51, 52])
+    gaps = GapScanner.get_gaps(holes, MINUTE)
+    assert gaps == [(JAN_31 + 5 * MINUTE, JAN_31 + 5 * MINUTE), (JAN_31 + 50 * MINUTE, JAN_31 + 52 * MINUTE)], f"Unexpected gaps {gaps}"
+    assert GapScanner.count_missing(gaps, MINUTE) == 4, "Expected 4 missing bars"
+    print("✓ single and multi-bar gaps found")
+    print("✓ test_get_gaps passed\n")
+
+
+def test_scan_all():
+    """Test scanning every stored series"""
+    print("Testing scan_all...")
+    data_dir = tempfile.mkdtemp()
+    try:
+        storage = StorageBackend.create('csv', data_dir)
+        timestamps = JAN_31 + np.arange(1440, dtype=np.int64) * MINUTE
+        storage.write('bybit', 'BTC', 'USDT', make_bars_at(timestamps))
+        storage.write('bybit', 'ETH', 'USDT', make_bars_at(np.delete(timestamps, np.arange(600, 900))))
+        gaps = GapScanner(storage).scan_all()
+        assert list(gaps) == [('bybit', 'ETH', 'USDT')], f"Unexpected series with gaps {list(gaps)}"
+        assert gaps[('bybit', 'ETH', 'USDT')] == [(JAN_31 + 600 * MINUTE, JAN_31 + 899 * MINUTE)], "Unexpected gap range"
+
+        # filling the gap clears it
+        storage.write('bybit', 'ETH', 'USDT', make_bars_at(timestamps[600:900]))
+        assert GapScanner(storage).scan_all() == {}, "Repaired series should have no gap"
+        print("✓ only the series with a hole is reported, and not after it is filled")
+    finally:
+        shutil.rmtree(data_dir)
+    print("✓ test_scan_all passed\n")
+
+
+async def repair(work_dir, writer_workers):
+    mock = MockExchange(num_symbols=1, num_days=1)
+    await mock.start()
+    try:
+        params_path = os.path.join(work_dir, 'params.yaml')
+        endpoints_path = os.path.join(work_dir, 'apiendpoints.yaml')
+        with open(params_path, 'w') as f:
+            yaml.dump(dict(PARAMS, writer_workers=writer_workers, data_dir=os.path.join(work_dir, 'Data')), f)
+        with open(endpoints_path, 'w') as f:
+            yaml.dump(mock.get_endpoints(), f)
+        loader = DataDownLoader(params_path, endpoints_path)
+        # 3 gaps of 300 bars, more than the workers need to repair them concurrently
+        timestamps = np.arange(mock.start_ts, mock.end_ts + 1, mock.interval_ms)
+        stored = np.delete(timestamps, np.concatenate([np.arange(start, start + 300) for start in (100, 500, 900)]))
+        for ex in QUOTES:
+            DataWriter.write_series(ex, 'C000', QUOTES[ex], OHLCSeries(stored, *map(np.array, zip(*[mock.get_bar(int(ts)) for ts in stored]))))
+        await loader.start('repair')
+        return len(timestamps)
+    finally:
+        await mock.stop()
+
+
+def test_repair_from_mock():
+    """Test every gap of a series is restored when the workers outnumber the gaps"""
+    print("Testing repair mode...")
+    for writer_workers in (0, 2):
+        work_dir = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        try:
+            os.makedirs(os.path.join(work_dir, 'app'))
+            os.chdir(work_dir)
+            num_bars = asyncio.run(repair(work_dir, writer_workers))
+            DataReader.initialize('csv', os.path.join(work_dir, 'Data'))
+            for ex, quote in QUOTES.items():
+                df = DataReader.load(ex, 'C000', quote)
+                assert len(df) == num_bars and df['timestamp'].is_unique, f"{ex}, writer_workers {writer_workers}: {len(df)} of {num_bars} bars stored"
+                assert GapScanner(DataWriter.storage).find_gaps(ex, 'C000', quote, MockExchange.interval_ms) == [], f"{ex}: gaps left"
+            print(f"✓ writer_workers {writer_workers}: every gap restored")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir)
+            DataWriter.initialize()
+    print("✓ test_repair_from_mock passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running gap scanner tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_get_gaps()
+        test_scan_all()
+        test_repair_from_mock()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,61 @@
+"""
+Test script to verify HttpClient reuses its pooled connections across requests against the local MockExchange
+"""
+import asyncio
+
+from HttpClient import HttpClient
+from MockExchange import MockExchange
+
+
+def test_connection_reuse():
+    """Test sequential requests share one keep-alive connection and concurrent ones stay within limit_per_host"""
+    print("Testing connection reuse...")
+
+    async def run():
+        mock = MockExchange(num_symbols=4, num_days=1, latency=0.01)
+        await mock.start()
+        url = mock.get_endpoints()['bybit']['ohlc']
+        try:
+            async with HttpClient('bybit', limit_per_host=3) as client:
+                for base in mock.bases:
+                    async with client.get(url, params={'symbol': base + 'USDT', 'start': mock.start_ts, 'end': mock.end_ts, 'limit': 10}) as resp:
+                        assert resp.status == 200, f"Request should succeed, got {resp.status}"
+                        await resp.read()
+                stats = client.get_stats()
+                assert stats['new_connections'] == 1 and stats['reused_connections'] == 3, f"Sequential requests should share one connection, {stats}"
+
+                async def request(base):
+                    async with client.get(url, params={'symbol': base + 'USDT', 'start': mock.start_ts, 'end': mock.end_ts, 'limit': 10}) as resp:
+                        return len(await resp.read())
+                sizes = await asyncio.gather(*[request(mock.bases[i % 4]) for i in range(24)])
+                assert all(size > 0 for size in sizes), "Every concurrent request should get its body"
+                stats = client.get_stats()
+                assert stats['requests'] == 28 == mock.stats['kline_requests'], f"Every request should be counted once, {stats}"
+                assert stats['new_connections'] <= 3, f"Concurrent requests should stay within limit_per_host, {stats['new_connections']} connections"
+                assert stats['new_connections'] + stats['reused_connections'] == 28 and stats['reuse_ratio'] > 0.85, f"Connections should be reused, {stats}"
+            assert client.session is None, "Closing should release the session"
+            async with client:
+                async with client.get(url, params={'symbol': 'C000USDT', 'start': mock.start_ts, 'end': mock.end_ts, 'limit': 10}) as resp:
+                    assert resp.status == 200, "The client should open a new session after it was closed"
+        finally:
+            await mock.stop()
+    asyncio.run(run())
+    print("✓ one connection for sequential requests, at most limit_per_host for concurrent ones")
+    print("✓ test_connection_reuse passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running HTTP client tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_connection_reuse()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
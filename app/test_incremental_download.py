@@ -6,7 +6,7 @@ import pandas as pd
 import tempfile
 import shutil
 from DataWriter import DataWriter
-from OHLCData import OHLCData
+from OHLCData import OHLCSeries
 
 def test_get_last_timestamp():
     """Test getting last timestamp from existing file"""
@@ -77,20 +77,18 @@ def test_append_data():
     test_file = './app/Data/test-BTC-USD.csv'
     initial_data.to_csv(test_file, index=False)
     
-    # Simulate new data being added to OHLCData
-    OHLCData.initialize()
+    # Simulate new data being downloaded
     new_timestamps = [3000000, 4000000]
     new_opens = [110, 115]
     new_highs = [120, 125]
     new_lows = [100, 105]
     new_closes = [115, 120]
     
-    OHLCData.add_data('test', 'BTC-USD', 'BTC', 'USD', 
-                      new_opens, new_highs, new_lows, new_closes, new_timestamps)
+    series = OHLCSeries(new_timestamps, new_opens, new_highs, new_lows, new_closes)
     
     # Import asyncio to run async write_data
     import asyncio
-    asyncio.run(DataWriter.write_data('test', 'BTC-USD', 'BTC', 'USD'))
+    asyncio.run(DataWriter.write_data('test', 'BTC-USD', 'BTC', 'USD', series))
     
     # Read combined data
     combined = pd.read_csv(test_file)
@@ -125,18 +123,16 @@ def test_duplicate_handling():
     initial_data.to_csv(test_file, index=False)
     
     # Simulate overlapping data
-    OHLCData.initialize()
     new_timestamps = [2000000, 3000000, 4000000]  # 2 duplicates
     new_opens = [105, 110, 115]
     new_highs = [115, 120, 125]
     new_lows = [95, 100, 105]
     new_closes = [110, 115, 120]
     
-    OHLCData.add_data('test', 'BTC-USD', 'BTC', 'USD', 
-                      new_opens, new_highs, new_lows, new_closes, new_timestamps)
+    series = OHLCSeries(new_timestamps, new_opens, new_highs, new_lows, new_closes)
     
     import asyncio
-    asyncio.run(DataWriter.write_data('test', 'BTC-USD', 'BTC', 'USD'))
+    asyncio.run(DataWriter.write_data('test', 'BTC-USD', 'BTC', 'USD', series))
     
     # Read combined data
     combined = pd.read_csv(test_file)
@@ -154,6 +150,37 @@ def test_duplicate_handling():
     print("✓ test_duplicate_handling passed\n")
 
 
+def test_manifest_refresh():
+    """Test the manifest follows files changed outside of DataWriter"""
+    print("Testing series manifest refresh...")
+
+    os.makedirs('./app/Data', exist_ok=True)
+    test_file = './app/Data/test-BTC-USD.csv'
+    pd.DataFrame([
+        {'timestamp': 1000000, 'open': 100, 'high': 110, 'low': 90, 'close': 105},
+        {'timestamp': 2000000, 'open': 105, 'high': 115, 'low': 95, 'close': 110},
+    ]).to_csv(test_file, index=False)
+
+    info = DataWriter.get_series_info('test', 'BTC', 'USD')
+    assert info['first_ts'] == 1000000 and info['last_ts'] == 2000000, f"Unexpected range {info}"
+    assert info['rows'] == 2, f"Expected 2 rows, got {info['rows']}"
+    assert info['interval_ms'] == 1000000, f"Expected interval 1000000, got {info['interval_ms']}"
+    print("✓ Manifest entry built from file head and tail")
+
+    # Append rows without DataWriter, the entry is stale and must be refreshed
+    with open(test_file, 'a') as f:
+        f.write('3000000,110,120,100,115\n4000000,115,125,105,120\n')
+    info = DataWriter.get_series_info('test', 'BTC', 'USD')
+    assert info['last_ts'] == 4000000, f"Expected 4000000, got {info['last_ts']}"
+    assert info['rows'] == 4, f"Expected 4 rows, got {info['rows']}"
+    print("✓ Stale manifest entry refreshed after append")
+
+    os.remove(test_file)
+    assert DataWriter.get_series_info('test', 'BTC', 'USD') is None, "Entry of removed file should be dropped"
+    print("✓ Entry of removed file dropped")
+    print("✓ test_manifest_refresh passed\n")
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("Running incremental download tests")
@@ -164,6 +191,7 @@ if __name__ == '__main__':
         test_file_exists()
         test_append_data()
         test_duplicate_handling()
+        test_manifest_refresh()
         
         print("=" * 60)
         print("All tests passed! ✓")
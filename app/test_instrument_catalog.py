@@ -0,0 +1,104 @@
+"""
+Test script to verify the indexed TickerData registry and the InstrumentCatalog TTL, concurrent refresh and diff
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from InstrumentCatalog import InstrumentCatalog
+from TickerData import TickerData
+
+
+def test_ticker_index():
+    """Test lookups by exchange and symbol, and replacing tickers"""
+    print("Testing TickerData indexes...")
+    TickerData.initialize()
+    TickerData.add_ticker('bybit', 'BTCUSDT', 'BTC', 'USDT', 'LinearPerpetual')
+    TickerData.add_ticker('bybit', 'ETHUSDT', 'ETH', 'USDT', 'LinearPerpetual')
+    TickerData.add_ticker('okx', 'BTC-USDT-SWAP', 'BTC', 'USDT', 'SWAP')
+    TickerData.add_ticker('bybit', 'BTCUSDT', 'BTC', 'USDT', 'InversePerpetual')
+    assert [ticker.symbol for ticker in TickerData.get_tickers_by_exchange('bybit')] == ['BTCUSDT', 'ETHUSDT'], "Same symbol should be replaced, not added"
+    assert TickerData.get_ticker('bybit', 'BTCUSDT').type == 'InversePerpetual', "Lookup should return the latest ticker"
+    assert TickerData.get_ticker('okx', 'ETHUSDT') is None, "Unknown symbol should be None"
+    assert not hasattr(TickerData.get_ticker('okx', 'BTC-USDT-SWAP'), '__dict__'), "Tickers should use __slots__"
+
+    TickerData.set_tickers('bybit', [TickerData('bybit', 'SOLUSDT', 'SOL', 'USDT', 'LinearPerpetual')])
+    assert [ticker.symbol for ticker in TickerData.get_tickers_by_exchange('bybit')] == ['SOLUSDT'], "set_tickers should replace the exchange"
+    assert TickerData.get_ticker('bybit', 'BTCUSDT') is None, "Replaced tickers should leave the symbol index"
+    assert len(TickerData.get_tickers_by_exchange('okx')) == 1, "Other exchanges should be kept"
+    print("✓ indexed by exchange and symbol")
+    print("✓ test_ticker_index passed\n")
+
+
+def test_catalog_refresh():
+    """Test concurrent refresh of stale exchanges, the TTL, the diff and the fallback to the stored list"""
+    print("Testing instrument catalog...")
+    catalog_dir = tempfile.mkdtemp()
+    path = os.path.join(catalog_dir, 'instruments.json')
+    listings = {'okx': ['BTC', 'ETH'], 'bybit': ['BTC', 'ETH', 'XRP']}
+    fetched = []
+
+    async def fetch(ex_name):
+        fetched.append(ex_name)
+        await asyncio.sleep(0.2)
+        if listings[ex_name] is None:
+            raise ConnectionError('exchange down')
+        return [TickerData(ex_name, base + 'USDT', base, 'USDT', 'perp') for base in listings[ex_name]]
+
+    try:
+        TickerData.initialize()
+        started_at = time.monotonic()
+        changes = asyncio.run(InstrumentCatalog(path, ttl_sec=60).refresh(['okx', 'bybit'], fetch))
+        assert time.monotonic() - started_at < 0.35, "Exchanges should be fetched concurrently"
+        assert changes['bybit'] == (['BTCUSDT', 'ETHUSDT', 'XRPUSDT'], []), f"Unexpected first diff {changes['bybit']}"
+        assert len(TickerData.get_tickers_by_exchange('bybit')) == 3, "Fetched tickers should be registered"
+        print("✓ first run fetches every exchange concurrently")
+
+        fetched.clear()
+        TickerData.initialize()
+        changes = asyncio.run(InstrumentCatalog(path, ttl_sec=60).refresh(['okx', 'bybit'], fetch))
+        assert fetched == [] and changes == {}, "Fresh lists should not be fetched again"
+        assert TickerData.get_ticker('okx', 'ETHUSDT') is not None, "Stored tickers should be registered"
+        print("✓ lists within the TTL are read from the catalog")
+
+        with open(path) as f:
+            entries = json.load(f)
+        entries['bybit']['fetched_at'] -= 120
+        with open(path, 'w') as f:
+            json.dump(entries, f)
+        listings['bybit'] = ['BTC', 'XRP', 'SOL']
+        changes = asyncio.run(InstrumentCatalog(path, ttl_sec=60).refresh(['okx', 'bybit'], fetch))
+        assert fetched == ['bybit'], f"Only the stale exchange should be fetched, got {fetched}"
+        assert changes == {'bybit': (['SOLUSDT'], ['ETHUSDT'])}, f"Unexpected diff {changes}"
+        assert TickerData.get_ticker('bybit', 'ETHUSDT') is None, "Delisted symbol should be dropped"
+        print("✓ stale list refreshed and diffed")
+
+        listings['okx'] = None
+        changes = asyncio.run(InstrumentCatalog(path, ttl_sec=0).refresh(['okx'], fetch))
+        assert changes == {} and len(TickerData.get_tickers_by_exchange('okx')) == 2, "Failed refresh should keep the stored list"
+        print("✓ failed refresh falls back to the stored list")
+    finally:
+        shutil.rmtree(catalog_dir)
+        TickerData.initialize()
+    print("✓ test_catalog_refresh passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running instrument catalog tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_ticker_index()
+        test_catalog_refresh()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
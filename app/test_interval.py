@@ -0,0 +1,52 @@
+"""
+Test script to verify Interval converts the interval notation of every exchange to milliseconds
+"""
+from Interval import Interval
+from TestFixtures import MINUTE
+
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+def test_to_ms():
+    """Test the notations of every exchange, okx bar sizes with the utc suffix included"""
+    print("Testing interval conversion...")
+    expected = {('okx', '1m'): MINUTE, ('okx', '15m'): 15 * MINUTE, ('okx', '4H'): 4 * HOUR,
+                ('okx', '6Hutc'): 6 * HOUR, ('okx', '1Dutc'): DAY, ('okx', '1Wutc'): 7 * DAY, ('okx', '1D'): DAY,
+                ('bybit', 1): MINUTE, ('bybit', '60'): HOUR, ('bybit', 'D'): DAY, ('apexpro', 'W'): 7 * DAY,
+                ('dydx', '1MIN'): MINUTE, ('dydx', '4HOURS'): 4 * HOUR, ('dydx', '1DAY'): DAY}
+    for (ex, interval), interval_ms in expected.items():
+        assert Interval.to_ms(ex, interval) == interval_ms, f"{ex} {interval!r}: {Interval.to_ms(ex, interval)} != {interval_ms}"
+    print(f"✓ {len(expected)} notations converted")
+    print("✓ test_to_ms passed\n")
+
+
+def test_unsupported():
+    """Test an unsupported notation raises a ValueError naming the exchange"""
+    print("Testing unsupported intervals...")
+    for ex, interval in [('okx', '1x'), ('okx', 'utc'), ('okx', '0m'), ('bybit', '1m'), ('bybit', 0), ('apexpro', 'H'), ('dydx', '2MINS')]:
+        try:
+            Interval.to_ms(ex, interval)
+            assert False, f"{ex} {interval!r} should raise"
+        except ValueError as e:
+            assert ex in str(e), f"The error should name the exchange: {e}"
+    print("✓ unsupported intervals rejected")
+    print("✓ test_unsupported passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running interval tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_to_ms()
+        test_unsupported()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
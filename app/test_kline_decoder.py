@@ -0,0 +1,87 @@
+"""
+Test script to verify every KlineDecoder backend decodes raw responses into the same series as OHLCConverter
+"""
+import asyncio
+import json
+
+import numpy as np
+
+from KlineDecoder import KlineDecoder
+from OHLCData import OHLCSeries
+from OhlcConverter import OHLCConverter
+from ProcessPool import ProcessPool
+from test_ohlc_converter import BYBIT_PAGE, DYDX_PAGE, APEXPRO_PAGE
+
+RESPONSES = {'bybit': ({'retCode': 0, 'retMsg': 'OK', 'result': {'category': 'linear', 'symbol': 'ETHUSDT', 'list': BYBIT_PAGE}}, BYBIT_PAGE),
+             'dydx': ({'candles': DYDX_PAGE}, DYDX_PAGE),
+             'apexpro': ({'data': {'BTCUSDC': APEXPRO_PAGE}, 'timeCost': 4266657}, APEXPRO_PAGE)}
+
+
+def test_same_as_converter():
+    """Test each backend against decoding with json + OHLCConverter"""
+    print("Testing decoder backends...")
+    for ex_name, (response, page) in RESPONSES.items():
+        expected = OHLCConverter.to_series(ex_name, page)
+        body = json.dumps(response).encode()
+        for backend in KlineDecoder.get_backends():
+            series = KlineDecoder.decode(ex_name, body, 'BTCUSDC', backend)
+            for name in OHLCSeries.columns:
+                column = series.get_column(name)
+                assert column.dtype == expected.get_column(name).dtype, f"{ex_name} {backend}: unexpected {name} dtype {column.dtype}"
+                assert np.array_equal(column, expected.get_column(name)), f"{ex_name} {backend}: {name} differs"
+        print(f"✓ {ex_name} identical with {KlineDecoder.get_backends()}")
+    print("✓ test_same_as_converter passed\n")
+
+
+def test_bad_responses():
+    """Test error responses and an empty apexpro range"""
+    print("Testing bad responses...")
+    for backend in KlineDecoder.get_backends():
+        assert KlineDecoder.decode('bybit', b'{"retCode": 10006, "retMsg": "Too many visits!", "result": {}}', 'BTCUSDT', backend) is None, f"{backend}: bybit error should give None"
+        assert KlineDecoder.decode('dydx', b'{"errors": [{"msg": "Invalid market"}]}', 'BTC-USD', backend) is None, f"{backend}: dydx error should give None"
+        assert KlineDecoder.decode('apexpro', b'<html>502 Bad Gateway</html>', 'BTCUSDC', backend) is None, f"{backend}: non-json body should give None"
+        series = KlineDecoder.decode('apexpro', b'{"data": {}, "timeCost": 1}', 'BTCUSDC', backend)
+        assert series is not None and len(series) == 0, f"{backend}: apexpro empty data should give an empty series"
+    print("✓ error responses give None, an empty range gives an empty series")
+    print("✓ test_bad_responses passed\n")
+
+
+def test_decode_in_pool():
+    """Test raw bodies decode the same in a ProcessPool worker, as the downloader runs them"""
+    print("Testing decoding in the process pool...")
+
+    async def decode_all():
+        return {ex_name: await ProcessPool.run(KlineDecoder.decode, ex_name, json.dumps(response).encode(), 'BTCUSDC')
+                for ex_name, (response, page) in RESPONSES.items()}
+
+    ProcessPool.initialize(1)
+    try:
+        pages = asyncio.run(decode_all())
+        bad_page = asyncio.run(ProcessPool.run(KlineDecoder.decode, 'apexpro', b'<html>502 Bad Gateway</html>', 'BTCUSDC'))
+    finally:
+        ProcessPool.shutdown()
+    for ex_name, (response, page) in RESPONSES.items():
+        expected = OHLCConverter.to_series(ex_name, page)
+        assert all(np.array_equal(pages[ex_name].get_column(name), expected.get_column(name)) for name in OHLCSeries.columns), f"{ex_name}: pool result differs"
+    assert bad_page is None, "A bad body should give None from the pool too"
+    print("✓ bytes in, typed columns out of the worker")
+    print("✓ test_decode_in_pool passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running kline decoder tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_same_as_converter()
+        test_bad_responses()
+        test_decode_in_pool()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,89 @@
+"""
+Test script to verify Metrics records counters, gauges and histograms and exports them as Prometheus text and JSON
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+
+from Metrics import Metrics
+
+
+def test_record_and_export():
+    """Test the recorded values and both export formats"""
+    print("Testing metric export...")
+    Metrics.initialize()
+    Metrics.inc('http_requests_total', exchange='okx', status=200)
+    Metrics.inc('http_requests_total', exchange='okx', status=200)
+    Metrics.inc('http_requests_total', exchange='okx', status=429)
+    Metrics.set_gauge('writer_queue_depth', 3)
+    for latency in [0.003, 0.02, 0.02, 4.0]:
+        Metrics.observe('http_request_seconds', latency, exchange='okx')
+    assert Metrics.get_value('http_requests_total', exchange='okx', status=200) == 2, "Counter should add up"
+    count, total = Metrics.get_value('http_request_seconds', exchange='okx')
+    assert count == 4 and abs(total - 4.043) < 1e-9, "Histogram should keep count and sum"
+    assert Metrics.get_value('http_requests_total', exchange='bybit', status=200) is None, "Unrecorded metric should be None"
+
+    lines = Metrics.to_prometheus().splitlines()
+    assert '# TYPE http_requests_total counter' in lines, "Missing counter type line"
+    assert 'http_requests_total{exchange="okx",status="429"} 1' in lines, "Missing counter sample"
+    assert 'writer_queue_depth 3' in lines, "Missing gauge sample"
+    assert 'http_request_seconds_bucket{exchange="okx",le="0.005"} 1' in lines, "Bucket counts should be cumulative"
+    assert 'http_request_seconds_bucket{exchange="okx",le="0.025"} 3' in lines, "Bucket counts should be cumulative"
+    assert 'http_request_seconds_bucket{exchange="okx",le="+Inf"} 4' in lines, "+Inf bucket should hold every observation"
+    assert 'http_request_seconds_count{exchange="okx"} 4' in lines, "Missing histogram count"
+    print("✓ Prometheus text format")
+
+    snapshot = Metrics.snapshot()
+    histogram = snapshot['histograms']['http_request_seconds'][0]
+    assert histogram['labels'] == {'exchange': 'okx'} and histogram['buckets']['5.0'] == 4, f"Unexpected histogram snapshot {histogram}"
+    assert snapshot['gauges']['writer_queue_depth'] == [{'labels': {}, 'value': 3}], "Unexpected gauge snapshot"
+    print("✓ JSON snapshot")
+    print("✓ test_record_and_export passed\n")
+
+
+def test_exporter():
+    """Test the periodic exporter writes the file while running and at stop"""
+    print("Testing exporter...")
+    metrics_dir = tempfile.mkdtemp()
+    path = os.path.join(metrics_dir, 'sub', 'metrics.json')
+
+    async def run():
+        Metrics.initialize(path, 'json', interval_sec=0.05)
+        Metrics.start_exporter()
+        Metrics.inc('ohlcv_pages_total', exchange='bybit')
+        await asyncio.sleep(0.2)
+        with open(path) as f:
+            assert json.load(f)['counters']['ohlcv_pages_total'][0]['value'] == 1, "Periodic snapshot should be written"
+        Metrics.inc('ohlcv_pages_total', exchange='bybit')
+        await Metrics.stop_exporter()
+
+    try:
+        asyncio.run(run())
+        with open(path) as f:
+            assert json.load(f)['counters']['ohlcv_pages_total'][0]['value'] == 2, "Final snapshot should be written at stop"
+        assert not os.path.exists(path + '.tmp'), "Temporary file should be replaced"
+        print("✓ snapshots written periodically and at stop")
+    finally:
+        shutil.rmtree(metrics_dir)
+        Metrics.initialize()
+    print("✓ test_exporter passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running metrics tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_record_and_export()
+        test_exporter()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
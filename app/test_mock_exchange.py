@@ -0,0 +1,248 @@
+"""
+Test script to verify DataDownLoader downloads complete series from the local MockExchange for every exchange
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import yaml
+
+from DataDownLoader import DataDownLoader
+from DataReader import DataReader
+from DataWriter import DataWriter
+from GapScanner import GapScanner
+from Metrics import Metrics
+from MockExchange import MockExchange
+from OHLCData import OHLCSeries
+
+EXCHANGES = ['okx', 'bybit', 'dydx', 'apexpro']
+PARAMS = {
+    'exchanges': EXCHANGES,
+    'since_num_days_before': 1,
+    'storage_format': 'csv',
+    'process_pool_size': 0,
+    'writer_workers': 1,
+    'fast_kline_decode': True,
+    'ohlcv_data_interval': {'okx': '1m', 'bybit': 1, 'dydx': '1MIN', 'apexpro': 1},
+    'max_download_per_trial': {'okx': 100, 'bybit': 200, 'dydx': 100, 'apexpro': 1500},
+    'concurrent_downloads': {'okx': 2, 'bybit': 2, 'dydx': 2, 'apexpro': 2},
+    'rate_limit_per_sec': {'okx': 1000, 'bybit': 1000, 'dydx': 1000, 'apexpro': 1000},
+    'backfill_shards': {'bybit': 2, 'dydx': 2, 'apexpro': 2},
+    'http': {'backoff_base': 0.01},
+}
+
+# apexpro pages from the oldest end of a range, with short pages its windows begin inside the halts too
+MAX_DOWNLOAD_AROUND_HALTS = dict(PARAMS['max_download_per_trial'], apexpro=200)
+
+
+async def download(work_dir):
+    # failed requests are retried, so the injected 500s and 429s must not leave holes
+    mock = MockExchange(num_symbols=2, num_days=1, error_rate=0.05, throttle_rate=0.05)
+    await mock.start()
+    try:
+        params_path = os.path.join(work_dir, 'params.yaml')
+        endpoints_path = os.path.join(work_dir, 'apiendpoints.yaml')
+        with open(params_path, 'w') as f:
+            yaml.dump(dict(PARAMS, data_dir=os.path.join(work_dir, 'Data')), f)
+        with open(endpoints_path, 'w') as f:
+            yaml.dump(mock.get_endpoints(), f)
+        loader = DataDownLoader(params_path, endpoints_path)
+        await loader.start()
+        return mock, loader
+    finally:
+        await mock.stop()
+
+
+def test_download_from_mock():
+    """Test a full update run against the mock server"""
+    print("Testing download from mock exchange...")
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.makedirs(os.path.join(work_dir, 'app'))
+        os.chdir(work_dir)
+        mock, loader = asyncio.run(download(work_dir))
+        DataReader.initialize('csv', os.path.join(work_dir, 'Data'))
+        scanner = GapScanner(DataWriter.storage)
+        for ex in EXCHANGES:
+            quote = {'okx': 'USDT', 'bybit': 'USDT', 'dydx': 'USD', 'apexpro': 'USDC'}[ex]
+            for base in mock.bases:
+                df = DataReader.load(ex, base, quote)
+                assert df['timestamp'].iloc[-1] == mock.end_ts, f"{ex}-{base}: last bar {df['timestamp'].iloc[-1]} != {mock.end_ts}"
+                assert len(df) >= mock.get_num_bars() - 1, f"{ex}-{base}: only {len(df)} bars"
+                assert scanner.find_gaps(ex, base, quote, MockExchange.interval_ms) == [], f"{ex}-{base}: gaps in the stored series"
+                expected = [float(mock.get_bar(ts)[3]) for ts in df['timestamp']]
+                assert np.array_equal(df['close'].to_numpy(), expected), f"{ex}-{base}: close prices differ from the served bars"
+            assert loader.ohlcv_download_num[ex] > 0, f"{ex}: no records counted"
+            assert Metrics.get_value('ohlcv_records_total', exchange=ex) == loader.ohlcv_download_num[ex], f"{ex}: records metric differs from the summary"
+            assert Metrics.get_value('http_request_seconds', exchange=ex)[0] == loader.http_stats[ex]['requests'], f"{ex}: one latency per request expected"
+            assert Metrics.get_value('series_written_bars_total', exchange=ex) >= loader.ohlcv_download_num[ex], f"{ex}: written bars metric too low"
+            print(f"✓ {ex} series complete and identical to the served bars")
+        assert loader.http_stats['okx']['requests'] > 0, "HTTP stats should be kept after the clients close"
+        num_retries = sum(stats['retries'] for stats in loader.http_stats.values())
+        assert num_retries == mock.stats['errors'] + mock.stats['throttled'] > 0, f"Every injected failure should be retried, {num_retries} retries"
+        assert set(loader.stage_elapsed) == {'tickers', 'download', 'flush'}, f"Unexpected stages {loader.stage_elapsed}"
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+        DataWriter.initialize()
+    print("✓ test_download_from_mock passed\n")
+
+
+async def update_okx(work_dir):
+    mock = MockExchange(num_symbols=1, num_days=1)
+    await mock.start()
+    try:
+        params_path = os.path.join(work_dir, 'params.yaml')
+        endpoints_path = os.path.join(work_dir, 'apiendpoints.yaml')
+        with open(params_path, 'w') as f:
+            yaml.dump(dict(PARAMS, exchanges=['okx'], data_dir=os.path.join(work_dir, 'Data')), f)
+        with open(endpoints_path, 'w') as f:
+            yaml.dump(mock.get_endpoints(), f)
+        loader = DataDownLoader(params_path, endpoints_path)
+        # the stored series ends 10 bars before the newest one, the okx page of 100 bars reaches back 90 bars into it
+        timestamps = range(mock.end_ts - 300 * mock.interval_ms, mock.end_ts - 10 * mock.interval_ms + 1, mock.interval_ms)
+        DataWriter.write_series('okx', 'C000', 'USDT', OHLCSeries(list(timestamps), *zip(*[mock.get_bar(ts) for ts in timestamps])))
+        inode = os.stat(DataWriter.storage.get_series_path('okx', 'C000', 'USDT')).st_ino
+        await loader.start()
+        return mock, loader, inode
+    finally:
+        await mock.stop()
+
+
+def test_okx_update_appends():
+    """Test an okx update keeps only the bars after the stored ones and appends them"""
+    print("Testing okx update...")
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.makedirs(os.path.join(work_dir, 'app'))
+        os.chdir(work_dir)
+        mock, loader, inode = asyncio.run(update_okx(work_dir))
+        DataReader.initialize('csv', os.path.join(work_dir, 'Data'))
+        assert loader.ohlcv_download_num['okx'] == 10, f"Only the 10 new bars should be counted, got {loader.ohlcv_download_num['okx']}"
+        path = DataWriter.storage.get_series_path('okx', 'C000', 'USDT')
+        assert os.stat(path).st_ino == inode, "The new bars should be appended, not the file rewritten"
+        df = DataReader.load('okx', 'C000', 'USDT')
+        assert len(df) == 301 and df['timestamp'].is_unique and df['timestamp'].iloc[-1] == mock.end_ts, "Unexpected stored series"
+        print("✓ 10 new bars appended")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+        DataWriter.initialize()
+    print("✓ test_okx_update_appends passed\n")
+
+
+async def download_slowly(work_dir, concurrent_downloads):
+    mock = MockExchange(num_symbols=6, num_days=1, latency=0.02)
+    await mock.start()
+    try:
+        params_path = os.path.join(work_dir, 'params.yaml')
+        endpoints_path = os.path.join(work_dir, 'apiendpoints.yaml')
+        with open(params_path, 'w') as f:
+            yaml.dump(dict(PARAMS, concurrent_downloads=concurrent_downloads, data_dir=os.path.join(work_dir, 'Data')), f)
+        with open(endpoints_path, 'w') as f:
+            yaml.dump(mock.get_endpoints(), f)
+        loader = DataDownLoader(params_path, endpoints_path)
+        await loader.start()
+        return mock, loader
+    finally:
+        await mock.stop()
+
+
+def test_bounded_parallelism():
+    """Test each exchange downloads concurrent_downloads symbols at once and never more"""
+    print("Testing bounded parallelism...")
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    concurrent_downloads = {'okx': 1, 'bybit': 3, 'dydx': 2, 'apexpro': 4}
+    try:
+        os.makedirs(os.path.join(work_dir, 'app'))
+        os.chdir(work_dir)
+        mock, loader = asyncio.run(download_slowly(work_dir, concurrent_downloads))
+        for ex in EXCHANGES:
+            assert mock.max_symbols_in_flight[ex] == concurrent_downloads[ex], \
+                f"{ex}: {mock.max_symbols_in_flight[ex]} symbols in flight at most, expected {concurrent_downloads[ex]}"
+            num_symbols = len([key for key in mock.kline_requests_by_symbol if key[0] == ex])
+            assert num_symbols == len(mock.bases), f"{ex}: {num_symbols} of {len(mock.bases)} symbols downloaded"
+            print(f"✓ {ex} downloaded {concurrent_downloads[ex]} symbols at once")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+        DataWriter.initialize()
+    print("✓ test_bounded_parallelism passed\n")
+
+
+async def download_around_halts(work_dir):
+    mock = MockExchange(num_symbols=1, num_days=1)
+    # windows of 2 pages (400 bybit / apexpro bars, 200 dydx bars) from the start of the day begin and end inside both halts,
+    # the dydx window of bars 400-599 has no bars at all
+    mock.missing_ranges = [(mock.start_ts + 300 * mock.interval_ms, mock.start_ts + 599 * mock.interval_ms),
+                           (mock.start_ts + 780 * mock.interval_ms, mock.start_ts + 819 * mock.interval_ms)]
+    await mock.start()
+    try:
+        params_path = os.path.join(work_dir, 'params.yaml')
+        endpoints_path = os.path.join(work_dir, 'apiendpoints.yaml')
+        with open(params_path, 'w') as f:
+            yaml.dump(dict(PARAMS, backfill_window_pages=2, max_download_per_trial=MAX_DOWNLOAD_AROUND_HALTS, data_dir=os.path.join(work_dir, 'Data')), f)
+        with open(endpoints_path, 'w') as f:
+            yaml.dump(mock.get_endpoints(), f)
+        loader = DataDownLoader(params_path, endpoints_path)
+        await loader.start()
+        return mock, loader
+    finally:
+        await mock.stop()
+
+
+def test_download_around_halts():
+    """Test the range fetch splits around sub-ranges without bars, storing every served bar with a bounded number of requests"""
+    print("Testing download around trading halts...")
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.makedirs(os.path.join(work_dir, 'app'))
+        os.chdir(work_dir)
+        mock, loader = asyncio.run(download_around_halts(work_dir))
+        DataReader.initialize('csv', os.path.join(work_dir, 'Data'))
+        scanner = GapScanner(DataWriter.storage)
+        for ex in EXCHANGES:
+            quote = {'okx': 'USDT', 'bybit': 'USDT', 'dydx': 'USD', 'apexpro': 'USDC'}[ex]
+            df = DataReader.load(ex, 'C000', quote)
+            expected = [ts for ts in range(int(df['timestamp'].iloc[0]), mock.end_ts + 1, mock.interval_ms) if not mock.is_missing(ts)]
+            assert df['timestamp'].iloc[0] <= mock.start_ts + mock.interval_ms, f"{ex}: the series should start with the first bar"
+            assert df['timestamp'].tolist() == expected, f"{ex}: the stored bars differ from the served ones"
+            assert scanner.find_gaps(ex, 'C000', quote, MockExchange.interval_ms) == mock.missing_ranges, f"{ex}: gaps other than the halts"
+            # okx pages back through the whole range, the others fetch it in windows. besides its full pages, a window costs one partly
+            # filled page and at most one empty request on either side of its pages
+            page_size = MAX_DOWNLOAD_AROUND_HALTS[ex]
+            num_windows = 1 if ex == 'okx' else -(-((mock.end_ts - mock.start_ts) // mock.interval_ms + 1) // (page_size * 2))
+            num_requests = sum(count for key, count in mock.kline_requests_by_symbol.items() if key[0] == ex)
+            assert num_requests <= mock.get_num_bars() // page_size + 3 * num_windows, f"{ex}: {num_requests} requests for {mock.get_num_bars()} bars"
+            print(f"✓ {ex} stored every served bar around the halts with {num_requests} requests")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+        DataWriter.initialize()
+    print("✓ test_download_around_halts passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running mock exchange tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_download_from_mock()
+        test_okx_update_appends()
+        test_bounded_parallelism()
+        test_download_around_halts()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,96 @@
+"""
+Test script to verify the vectorized OHLCConverter gives exactly the same values as per-element parsing
+"""
+import asyncio
+import datetime
+
+import numpy as np
+
+from OhlcConverter import OHLCConverter
+
+OKX_PAGE = [['1686276000000', '26502.6', '26533.2', '26279', '26454.5', '1193839', '11938.39', '314978168.712', '1'],
+            ['1686272400000', '26454.7', '26598', '26438.3', '26502.7', '358361', '3583.61', '95068298.681', '1'],
+            ['1686268800000', '26502.4', '26514.4', '26427.2', '26454.7', '373017', '3730.17', '98707450.164', '1']]
+BYBIT_PAGE = [["1685765160000", "1898.55", "1898.55", "1898.5", "1898.55", "508", "0.26757263"],
+              ["1685765100000", "1898", "1898.55", "1898", "1898.55", "1147", "0.60425458"],
+              ["1685765040000", "0.0000005", "1e-7", "1898", "1898", "5996", "3.15902988"]]
+DYDX_PAGE = [{"startedAt": "2023-06-14T05:00:00.000Z", "updatedAt": "2023-06-14T05:18:24.714Z", "market": "BTC-USD", "resolution": "1HOUR", "low": "25973", "high": "25989", "open": "25981", "close": "25981"},
+             {"startedAt": "2023-06-14T04:00:00.000Z", "updatedAt": "2023-06-14T04:59:58.918Z", "market": "BTC-USD", "resolution": "1HOUR", "low": "25966.1", "high": "26006", "open": "25980", "close": "25981.25"}]
+APEXPRO_PAGE = [{"s": "BTCUSDC", "i": "1", "t": 1686792300000, "c": "25142.5", "h": "25151.5", "l": "25137", "o": "25150", "v": "2.266", "tr": "56967.19"},
+                {"s": "BTCUSDC", "i": "1", "t": 1686792360000, "c": "25141.5", "h": "25147", "l": "25135", "o": "25142.5", "v": "2.087", "tr": "52462.2765"}]
+
+
+def convert(ex_name, page):
+    OHLCConverter.initialize()
+    return asyncio.run(OHLCConverter.convert_ohlc(ex_name, page))
+
+
+def assert_same(series, timestamps, opens, highs, lows, closes):
+    assert series.timestamp.dtype == np.int64, f"Unexpected timestamp dtype {series.timestamp.dtype}"
+    assert series.open.dtype == np.float64, f"Unexpected price dtype {series.open.dtype}"
+    assert series.timestamp.tolist() == timestamps, f"Timestamps differ: {series.timestamp.tolist()} != {timestamps}"
+    assert series.open.tolist() == opens, "Opens differ"
+    assert series.high.tolist() == highs, "Highs differ"
+    assert series.low.tolist() == lows, "Lows differ"
+    assert series.close.tolist() == closes, "Closes differ"
+
+
+def test_list_pages():
+    """Test okx and bybit list-of-lists pages"""
+    print("Testing okx / bybit conversion...")
+    for ex_name, page in [('okx', OKX_PAGE), ('bybit', BYBIT_PAGE)]:
+        assert_same(convert(ex_name, page),
+                    [int(item[0]) for item in page],
+                    [float(item[1]) for item in page],
+                    [float(item[2]) for item in page],
+                    [float(item[3]) for item in page],
+                    [float(item[4]) for item in page])
+        print(f"✓ {ex_name} matches per-element parsing")
+    print("✓ test_list_pages passed\n")
+
+
+def test_dict_pages():
+    """Test dydx and apexpro dict-per-candle pages"""
+    print("Testing dydx / apexpro conversion...")
+    assert_same(convert('dydx', DYDX_PAGE),
+                [int(datetime.datetime.fromisoformat(item['startedAt']).timestamp() * 1000) for item in DYDX_PAGE],
+                [float(item['open']) for item in DYDX_PAGE],
+                [float(item['high']) for item in DYDX_PAGE],
+                [float(item['low']) for item in DYDX_PAGE],
+                [float(item['close']) for item in DYDX_PAGE])
+    print("✓ dydx matches per-element parsing")
+    assert_same(convert('apexpro', APEXPRO_PAGE),
+                [int(item['t']) for item in APEXPRO_PAGE],
+                [float(item['o']) for item in APEXPRO_PAGE],
+                [float(item['h']) for item in APEXPRO_PAGE],
+                [float(item['l']) for item in APEXPRO_PAGE],
+                [float(item['c']) for item in APEXPRO_PAGE])
+    print("✓ apexpro matches per-element parsing")
+    print("✓ test_dict_pages passed\n")
+
+
+def test_empty_page():
+    """Test an empty page gives empty typed columns"""
+    print("Testing empty page...")
+    for ex_name in ['okx', 'bybit', 'dydx', 'apexpro']:
+        assert_same(convert(ex_name, []), [], [], [], [], [])
+    print("✓ test_empty_page passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running OHLC converter tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_list_pages()
+        test_dict_pages()
+        test_empty_page()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
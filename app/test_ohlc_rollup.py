@@ -0,0 +1,95 @@
+"""
+Test script to verify OHLCRollup builds the same bars as pandas resampling, incrementally
+"""
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from OHLCRollup import OHLCRollup
+from StorageBackend import StorageBackend
+from TestFixtures import JAN_31, MINUTE, make_bars
+
+
+def make_random_bars(start_ts, num_bars, seed=0):
+    return make_bars(start_ts, num_bars, close=100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, num_bars)))
+
+
+def resample(df, rule):
+    frame = df.set_index(pd.to_datetime(df['timestamp'], unit='ms'))
+    bars = frame.resample(rule).agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'}).dropna()
+    bars.insert(0, 'timestamp', bars.index.as_unit('ms').asi8)
+    return bars.reset_index(drop=True)
+
+
+def assert_same(df, expected, label):
+    assert len(df) == len(expected), f"{label}: expected {len(expected)} bars, got {len(df)}"
+    for column in ['timestamp', 'open', 'high', 'low', 'close']:
+        assert np.allclose(df[column].to_numpy(), expected[column].to_numpy()), f"{label}: {column} mismatch"
+
+
+def test_incremental_rollup():
+    """Test rollups match pandas resampling after appends and merges"""
+    print("Testing incremental rollup...")
+    for storage_format in ['csv', 'parquet', 'binary']:
+        data_dir = tempfile.mkdtemp()
+        try:
+            storage = StorageBackend.create(storage_format, data_dir)
+            rollup = OHLCRollup(storage, storage_format, data_dir, ['5m', '1h', '1d'])
+
+            # two and a half days, the last day is incomplete and must not be stored yet
+            bars = make_random_bars(JAN_31, 3600)
+            storage.write('test', 'BTC', 'USD', bars)
+            updated = rollup.update('test', 'BTC', 'USD')
+            assert updated == {'5m': 720, '1h': 60, '1d': 2}, f"Unexpected buckets {updated}"
+            assert_same(rollup.storages['1d'].read('test', 'BTC', 'USD'), resample(bars, '1D').iloc[:2], f"{storage_format} 1d")
+
+            # append the rest of the third day: only the new buckets are aggregated
+            more = make_random_bars(JAN_31 + 3600 * MINUTE, 720, seed=1)
+            storage.write('test', 'BTC', 'USD', more)
+            updated = rollup.update('test', 'BTC', 'USD', since=more['timestamp'].iloc[0])
+            assert updated == {'5m': 144, '1h': 12, '1d': 1}, f"Unexpected buckets {updated}"
+
+            # overwrite bars in the middle: their buckets are rebuilt
+            patch = make_random_bars(JAN_31 + 1500 * MINUTE, 30, seed=2)
+            storage.write('test', 'BTC', 'USD', patch)
+            rollup.update('test', 'BTC', 'USD', since=patch['timestamp'].iloc[0])
+
+            full = storage.read('test', 'BTC', 'USD')
+            for timeframe, rule in [('5m', '5min'), ('1h', '1h'), ('1d', '1D')]:
+                assert_same(rollup.storages[timeframe].read('test', 'BTC', 'USD'), resample(full, rule), f"{storage_format} {timeframe}")
+            print(f"✓ {storage_format}: 5m / 1h / 1d match pandas resample after append and merge")
+        finally:
+            shutil.rmtree(data_dir)
+    print("✓ test_incremental_rollup passed\n")
+
+
+def test_timeframe_validation():
+    """Test timeframe parsing"""
+    print("Testing timeframe parsing...")
+    assert OHLCRollup.to_ms('15m') == 15 * MINUTE and OHLCRollup.to_ms('4h') == 240 * MINUTE and OHLCRollup.to_ms('1d') == 1440 * MINUTE
+    try:
+        OHLCRollup.to_ms('1w')
+        assert False, "Unknown timeframe should raise"
+    except ValueError:
+        pass
+    print("✓ test_timeframe_validation passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running rollup tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_incremental_rollup()
+        test_timeframe_validation()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
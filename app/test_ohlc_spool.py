@@ -0,0 +1,55 @@
+"""
+Test script to verify OHLCSpool gives back spooled chunks unchanged and in either order
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from OHLCData import OHLCSeries
+from OHLCSpool import OHLCSpool
+from TestFixtures import JAN_31, MINUTE, make_series
+
+
+def test_spool_chunks():
+    """Test chunks round trip through disk, newest first in and oldest first out"""
+    print("Testing spool chunks...")
+    spool_dir = os.path.join(tempfile.mkdtemp(), 'okx-BTC-USDT')
+    try:
+        spool = OHLCSpool(spool_dir)
+        # pages arrive newest first
+        chunks = [make_series(JAN_31 + (2 - i) * 100 * MINUTE, 100) for i in range(3)]
+        for chunk in chunks:
+            spool.add(chunk)
+        assert spool.num_chunks == 3 and spool.num_records == 300, "Unexpected spool size"
+        restored = list(spool.get_chunks(reverse=True))
+        assert [series.timestamp[0] for series in restored] == [JAN_31, JAN_31 + 100 * MINUTE, JAN_31 + 200 * MINUTE], "Chunks not oldest first"
+        for series, chunk in zip(restored, reversed(chunks)):
+            for name in OHLCSeries.columns:
+                assert np.array_equal(series.get_column(name), chunk.get_column(name)), f"{name} changed on disk"
+        print("✓ 3 chunks restored oldest first")
+
+        spool.clear()
+        assert not os.path.exists(spool_dir) and spool.num_records == 0, "Spool not cleared"
+        print("✓ clear removes the spooled chunks")
+    finally:
+        shutil.rmtree(os.path.dirname(spool_dir))
+    print("✓ test_spool_chunks passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running spool tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_spool_chunks()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
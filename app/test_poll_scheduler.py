@@ -0,0 +1,140 @@
+"""
+Test script to verify PollScheduler and the daemon mode of DataDownLoader against the local MockExchange
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import yaml
+
+from DataDownLoader import DataDownLoader
+from DataWriter import DataWriter
+from GapScanner import GapScanner
+from Metrics import Metrics
+from MockExchange import MockExchange
+from OHLCData import OHLCSeries
+from PollScheduler import PollScheduler
+
+EXCHANGES = ['okx', 'bybit', 'dydx', 'apexpro']
+SYMBOLS = {'okx': '{}-USDT-SWAP', 'bybit': '{}USDT', 'dydx': '{}-USD', 'apexpro': '{}USDC'}
+QUOTES = {'okx': 'USDT', 'bybit': 'USDT', 'dydx': 'USD', 'apexpro': 'USDC'}
+PARAMS = {
+    'exchanges': EXCHANGES,
+    'since_num_days_before': 1,
+    'storage_format': 'csv',
+    'process_pool_size': 0,
+    'writer_workers': 1,
+    'fast_kline_decode': True,
+    # the next bars close a minute or more after the first polls, so every series is polled exactly once during the test
+    'daemon_poll_delay_sec': 60,
+    'ohlcv_data_interval': {'okx': '1m', 'bybit': 1, 'dydx': '1MIN', 'apexpro': 1},
+    'max_download_per_trial': {'okx': 100, 'bybit': 200, 'dydx': 100, 'apexpro': 1500},
+    'concurrent_downloads': {'okx': 2, 'bybit': 2, 'dydx': 2, 'apexpro': 2},
+    'rate_limit_per_sec': {'okx': 1000, 'bybit': 1000, 'dydx': 1000, 'apexpro': 1000},
+}
+
+
+def test_scheduler_order():
+    """Test keys come out by due time, and rescheduled or removed keys are skipped"""
+    print("Testing poll scheduler...")
+    scheduler = PollScheduler()
+    scheduler.schedule('a', 300)
+    scheduler.schedule('b', 100)
+    scheduler.schedule('c', 200)
+    scheduler.schedule('a', 50)
+    scheduler.schedule('d', 150)
+    scheduler.remove('d')
+    assert len(scheduler) == 3 and 'd' not in scheduler, "Removed key should leave the queue"
+    assert scheduler.next_due() == 50, f"Earliest due time should be 50, got {scheduler.next_due()}"
+    assert scheduler.pop_due(199) == ['a', 'b'], "Due keys should come out earliest first, each once"
+    assert scheduler.next_due() == 200
+    scheduler.schedule('c', 400)
+    assert scheduler.pop_due(399) == [], "Rescheduled key should not be due at its old time"
+    assert scheduler.pop_due(400) == ['c'] and scheduler.next_due() is None, "Queue should be empty"
+    print("✓ ordered by due time, replaced and removed entries skipped")
+    print("✓ test_scheduler_order passed\n")
+
+
+async def run_daemon(work_dir):
+    mock = MockExchange(num_symbols=3, num_days=1)
+    await mock.start()
+    try:
+        params_path = os.path.join(work_dir, 'params.yaml')
+        endpoints_path = os.path.join(work_dir, 'apiendpoints.yaml')
+        with open(params_path, 'w') as f:
+            yaml.dump(dict(PARAMS, data_dir=os.path.join(work_dir, 'Data')), f)
+        with open(endpoints_path, 'w') as f:
+            yaml.dump(mock.get_endpoints(), f)
+        loader = DataDownLoader(params_path, endpoints_path)
+        # C000 is 5 bars and C001 30 bars behind, C002 has nothing stored yet
+        for ex in EXCHANGES:
+            for base, lag in (('C000', 5), ('C001', 30)):
+                timestamps = range(mock.end_ts - 120 * mock.interval_ms, mock.end_ts - lag * mock.interval_ms + 1, mock.interval_ms)
+                bars = list(zip(*[mock.get_bar(ts) for ts in timestamps]))
+                DataWriter.write_series(ex, base, QUOTES[ex], OHLCSeries(list(timestamps), *bars))
+        task = asyncio.create_task(loader.start('daemon'))
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            # the last closed bar, or the newest bar of the mock once the minute has passed
+            target_ts = min(mock.end_ts, (int(time.time() * 1000) // mock.interval_ms - 1) * mock.interval_ms)
+            if len(loader.last_timestamps) == 12 and all(ts is not None and ts >= target_ts for ts in loader.last_timestamps.values()):
+                break
+        next_due = loader.scheduler.next_due()
+        loader.stop()
+        await task
+        return mock, loader, target_ts, next_due
+    finally:
+        await mock.stop()
+
+
+def test_daemon_from_mock():
+    """Test the daemon catches every series up with one request per series that is less than a page behind"""
+    print("Testing daemon mode...")
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.makedirs(os.path.join(work_dir, 'app'))
+        os.chdir(work_dir)
+        mock, loader, target_ts, next_due = asyncio.run(run_daemon(work_dir))
+        scanner = GapScanner(DataWriter.storage)
+        for ex in EXCHANGES:
+            for base in mock.bases:
+                last_ts = DataWriter.get_last_timestamp(ex, base, QUOTES[ex])
+                assert last_ts is not None and last_ts >= target_ts, f"{ex}-{base}: last bar {last_ts} before {target_ts}"
+                assert scanner.find_gaps(ex, base, QUOTES[ex], MockExchange.interval_ms) == [], f"{ex}-{base}: gaps in the stored series"
+            for base in ('C000', 'C001'):
+                num_requests = mock.kline_requests_by_symbol[(ex, SYMBOLS[ex].format(base))]
+                assert num_requests == 1, f"{ex}-{base}: {num_requests} requests for a series less than a page behind"
+            # a day of bars fits in one apexpro page, so C002 is a tail poll there
+            num_catchups = 1 if mock.get_num_bars() > PARAMS['max_download_per_trial'][ex] else 0
+            assert (Metrics.get_value('daemon_polls_total', exchange=ex, kind='catchup') or 0) == num_catchups, f"{ex}: C002 should be caught up"
+            assert Metrics.get_value('daemon_polls_total', exchange=ex, kind='tail') == 3 - num_catchups, f"{ex}: one poll per series expected"
+            print(f"✓ {ex} series caught up, one request per tail poll")
+        assert next_due > time.time() * 1000, "Next polls should wait for the next bar to close"
+        print("✓ next polls scheduled after the next bar closes")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+        DataWriter.initialize()
+    print("✓ test_daemon_from_mock passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running poll scheduler tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_scheduler_order()
+        test_daemon_from_mock()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
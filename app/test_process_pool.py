@@ -0,0 +1,102 @@
+"""
+Test script to verify conversion and writes give the same result in ProcessPool workers as on the event loop
+"""
+import asyncio
+import shutil
+import tempfile
+
+import numpy as np
+
+from DataWriter import DataWriter
+from OhlcConverter import OHLCConverter
+from ProcessPool import ProcessPool
+from StorageBackend import StorageBackend
+from TestFixtures import JAN_31, MINUTE, make_series
+
+
+def make_page(start_ts, num_bars):
+    # bybit rows, newest first
+    return [[str(start_ts + i * MINUTE), '100.5', '101', '99.25', f'{100 + i * 0.25}', '10', '1000'] for i in reversed(range(num_bars))]
+
+
+async def download(pages):
+    for page in pages:
+        series = await OHLCConverter.convert_ohlc('bybit', page)
+        await DataWriter.write_data('bybit', 'BTCUSDT', 'BTC', 'USDT', series)
+
+
+def run_download(pool_size, pages):
+    data_dir = tempfile.mkdtemp()
+    try:
+        OHLCConverter.initialize()
+        DataWriter.initialize('csv', data_dir, ['1h'])
+        ProcessPool.initialize(pool_size, DataWriter.initialize, ('csv', data_dir, ['1h']))
+        try:
+            asyncio.run(download(pages))
+        finally:
+            ProcessPool.shutdown()
+        info = DataWriter.get_series_info('bybit', 'BTC', 'USDT')
+        df = StorageBackend.create('csv', data_dir).read('bybit', 'BTC', 'USDT')
+        hourly = StorageBackend.create('csv', data_dir + '/rollup/1h').read('bybit', 'BTC', 'USDT')
+        return info, df, hourly
+    finally:
+        shutil.rmtree(data_dir)
+
+
+def test_pool_matches_inline():
+    """Test a 2 worker pool writes the same series, rollups and manifest as inline conversion"""
+    print("Testing process pool offload...")
+    pages = [make_page(JAN_31 + i * 200 * MINUTE, 200) for i in range(3)]
+    inline_info, inline_df, inline_hourly = run_download(0, pages)
+    pool_info, pool_df, pool_hourly = run_download(2, pages)
+    assert inline_info['rows'] == pool_info['rows'] == 600, f"Unexpected rows {inline_info['rows']} / {pool_info['rows']}"
+    assert pool_info['last_ts'] == JAN_31 + 599 * MINUTE, "Manifest written by the workers not seen by the parent"
+    assert np.array_equal(inline_df.to_numpy(), pool_df.to_numpy()), "Series differ"
+    assert len(pool_hourly) == 10 and np.array_equal(inline_hourly.to_numpy(), pool_hourly.to_numpy()), "Rollups differ"
+    print("✓ pool workers write identical data and manifest")
+    print("✓ test_pool_matches_inline passed\n")
+
+
+def test_concurrent_writes():
+    """Test writes of one series started together, in threads or pool workers, keep every bar"""
+    print("Testing concurrent writes of one series...")
+    # newest chunk first, so every write merges into the bars written before it
+    chunks = [make_series(JAN_31 + i * 200 * MINUTE, 200) for i in reversed(range(6))]
+
+    async def write_all():
+        await asyncio.gather(*[DataWriter.write_series_async('bybit', 'BTC', 'USDT', series) for series in chunks])
+
+    for pool_size in (0, 2):
+        data_dir = tempfile.mkdtemp()
+        try:
+            DataWriter.initialize('csv', data_dir)
+            ProcessPool.initialize(pool_size, DataWriter.initialize, ('csv', data_dir))
+            try:
+                asyncio.run(write_all())
+            finally:
+                ProcessPool.shutdown()
+            df = StorageBackend.create('csv', data_dir).read('bybit', 'BTC', 'USDT')
+            assert len(df) == 1200 and df['timestamp'].is_unique, f"pool_size {pool_size}: {len(df)} of 1200 bars stored"
+            print(f"✓ pool_size {pool_size}: every bar kept")
+        finally:
+            shutil.rmtree(data_dir)
+            DataWriter.initialize()
+    print("✓ test_concurrent_writes passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running process pool tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_pool_matches_inline()
+        test_concurrent_writes()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,126 @@
+"""
+Test script to verify the adaptive RateLimiter and the retries of HttpClient against the local MockExchange
+"""
+import asyncio
+import time
+
+from HttpClient import HttpClient
+from MockExchange import MockExchange
+from RateLimiter import RateLimiter
+
+
+def test_adaptive_rate():
+    """Test the rate is halved on 429s and grows back on successes"""
+    print("Testing adaptive rate...")
+
+    async def run():
+        limiter = RateLimiter(10, max_rate=20, min_rate=2)
+        limiter.on_throttled()
+        assert limiter.rate == 5, f"Rate should be halved, got {limiter.rate}"
+        limiter.on_throttled()
+        limiter.on_throttled()
+        assert limiter.rate == 2, f"Rate should stop at min_rate, got {limiter.rate}"
+        for i in range(10000):
+            limiter.on_success()
+        assert limiter.rate == 20, f"Rate should grow back up to max_rate, got {limiter.rate}"
+        assert limiter.num_throttled == 3, "Throttles should be counted"
+    asyncio.run(run())
+    print("✓ halved down to min_rate, grown back up to max_rate")
+    print("✓ test_adaptive_rate passed\n")
+
+
+def test_limit_headers():
+    """Test a response without remaining requests pauses the bucket until the window resets"""
+    print("Testing rate limit headers...")
+
+    async def run():
+        for headers in [{'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit-Reset-Timestamp': str(int((time.time() + 0.3) * 1000))},
+                        {'RateLimit-Remaining': '0', 'RateLimit-Reset': '0.3'}]:
+            limiter = RateLimiter(100)
+            limiter.update_from_headers(headers)
+            started_at = time.monotonic()
+            await limiter.acquire()
+            assert time.monotonic() - started_at >= 0.25, f"Should wait for the window to reset with {headers}"
+        limiter = RateLimiter(100)
+        limiter.update_from_headers({'X-Bapi-Limit-Status': '5', 'X-Bapi-Limit-Reset-Timestamp': str(int((time.time() + 5) * 1000))})
+        started_at = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - started_at < 0.1, "Should not wait while requests are left"
+    asyncio.run(run())
+    print("✓ bybit and RateLimit-* headers pause the bucket only when nothing is left")
+    print("✓ test_limit_headers passed\n")
+
+
+def test_retries():
+    """Test 429 and 500 responses are retried until they succeed, or returned once retries run out"""
+    print("Testing retries...")
+
+    async def run():
+        mock = MockExchange(num_symbols=1, num_days=1, error_rate=0.1, throttle_rate=0.2, seed=1)
+        await mock.start()
+        url = mock.get_endpoints()['bybit']['ohlc']
+        params = {'symbol': 'C000USDT', 'start': mock.start_ts, 'end': mock.end_ts, 'limit': 10}
+        try:
+            async with HttpClient('bybit', rate_limiter=RateLimiter(1000), max_retries=10, backoff_base=0.01) as client:
+                for i in range(30):
+                    async with client.get(url, params=params) as resp:
+                        assert resp.status == 200, f"Request should succeed after retries, got {resp.status}"
+                assert client.num_retries == mock.stats['throttled'] + mock.stats['errors'] > 0, "Every failure should be retried once"
+            async with HttpClient('bybit', max_retries=0) as client:
+                statuses = set()
+                for i in range(30):
+                    async with client.get(url, params=params) as resp:
+                        statuses.add(resp.status)
+                assert statuses == {200, 429, 500}, f"Without retries the failures should be returned, got {statuses}"
+        finally:
+            await mock.stop()
+    asyncio.run(run())
+    print("✓ failures retried with backoff, returned once retries run out")
+    print("✓ test_retries passed\n")
+
+
+def test_server_limit():
+    """Test concurrent requests stay within the server's limit using its headers"""
+    print("Testing server rate limit...")
+
+    async def run():
+        mock = MockExchange(num_symbols=1, num_days=1, max_requests_per_sec=10)
+        await mock.start()
+        url = mock.get_endpoints()['dydx']['ohlc'] + 'C000-USD'
+        params = {'fromISO': '2024-01-01T00:00:00.000Z', 'toISO': '2024-01-01T01:00:00.000Z'}
+        try:
+            async with HttpClient('dydx', rate_limiter=RateLimiter(50, max_rate=50), backoff_base=0.05) as client:
+                async def worker():
+                    for i in range(5):
+                        async with client.get(url, params=params) as resp:
+                            assert resp.status == 200, f"Request should succeed, got {resp.status}"
+                started_at = time.monotonic()
+                await asyncio.gather(*[worker() for i in range(8)])
+                assert time.monotonic() - started_at >= 2.0, "40 requests at 10/sec should take several windows"
+                # only the requests already in flight when a window runs out are throttled
+                assert mock.stats['throttled'] <= 10, f"Headers should keep most requests within the limit, {mock.stats['throttled']} throttled"
+        finally:
+            await mock.stop()
+    asyncio.run(run())
+    print("✓ all requests succeeded within the limit")
+    print("✓ test_server_limit passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running rate limiter tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_adaptive_rate()
+        test_limit_headers()
+        test_retries()
+        test_server_limit()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
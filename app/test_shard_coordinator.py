@@ -0,0 +1,165 @@
+"""
+Test script to verify ShardRing, SeriesLease and sharded downloads by ShardCoordinator worker processes against the local MockExchange
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import yaml
+
+from DataReader import DataReader
+from DataWriter import DataWriter
+from GapScanner import GapScanner
+from MockExchange import MockExchange
+from SeriesLease import SeriesLease
+from ShardCoordinator import ShardCoordinator
+from ShardRing import ShardRing
+
+EXCHANGES = ['okx', 'bybit', 'dydx', 'apexpro']
+QUOTES = {'okx': 'USDT', 'bybit': 'USDT', 'dydx': 'USD', 'apexpro': 'USDC'}
+PARAMS = {
+    'exchanges': EXCHANGES,
+    'since_num_days_before': 1,
+    'storage_format': 'csv',
+    'process_pool_size': 0,
+    'writer_workers': 1,
+    'fast_kline_decode': True,
+    'ohlcv_data_interval': {'okx': '1m', 'bybit': 1, 'dydx': '1MIN', 'apexpro': 1},
+    'max_download_per_trial': {'okx': 100, 'bybit': 200, 'dydx': 100, 'apexpro': 1500},
+    'concurrent_downloads': {'okx': 2, 'bybit': 2, 'dydx': 2, 'apexpro': 2},
+    'rate_limit_per_sec': {'okx': 1000, 'bybit': 1000, 'dydx': 1000, 'apexpro': 1000},
+}
+
+
+def test_shard_ring():
+    """Test the partition is stable, balanced, and adding a shard moves only the series it takes"""
+    print("Testing shard ring...")
+    keys = [('bybit', f'C{i:04d}USDT') for i in range(2000)]
+    ring = ShardRing(4)
+    shards = [ring.get_shard(*key) for key in keys]
+    assert shards == [ShardRing(4).get_shard(*key) for key in keys], "Every ring should assign the same shards"
+    counts = [shards.count(shard) for shard in range(4)]
+    assert all(300 < count < 700 for count in counts), f"Shards should be roughly balanced, got {counts}"
+    print(f"✓ stable and balanced: {counts}")
+
+    moved = [(old, ShardRing(5).get_shard(*key)) for key, old in zip(keys, shards) if ShardRing(5).get_shard(*key) != old]
+    assert all(new == 4 for old, new in moved), "Series should only move to the new shard"
+    assert len(moved) < 0.3 * len(keys), f"About 1/5 of the series should move, {len(moved)} moved"
+    print(f"✓ 4 -> 5 shards moves {len(moved)} of {len(keys)} series, all to the new shard")
+    print("✓ test_shard_ring passed\n")
+
+
+def test_series_lease():
+    """Test a lease excludes other owners until it is released or expires"""
+    print("Testing series leases...")
+    lease_dir = tempfile.mkdtemp()
+    try:
+        a = SeriesLease(lease_dir, 'a', ttl_sec=0.3)
+        b = SeriesLease(lease_dir, 'b', ttl_sec=0.3)
+        assert a.acquire('bybit', 'BTC', 'USDT') and a.acquire('bybit', 'BTC', 'USDT'), "The owner should acquire its lease again"
+        assert not b.acquire('bybit', 'BTC', 'USDT') and b.get_holder('bybit', 'BTC', 'USDT') == 'a', "Another owner should be refused"
+        assert b.acquire('bybit', 'ETH', 'USDT'), "Other series should be free"
+        a.release('bybit', 'BTC', 'USDT')
+        assert not b.acquire('bybit', 'BTC', 'USDT'), "The lease should be held until the last release"
+        a.release('bybit', 'BTC', 'USDT')
+        assert b.acquire('bybit', 'BTC', 'USDT'), "A released lease should be free"
+        print("✓ leases exclude other owners until released")
+
+        time.sleep(0.4)
+        assert a.acquire('bybit', 'BTC', 'USDT'), "An expired lease should be taken over"
+        b.renew()
+        assert ('bybit', 'BTC', 'USDT') not in b.held and ('bybit', 'ETH', 'USDT') in b.held, "Renewal should drop the lease taken over"
+        b.release_all()
+        a.release_all()
+        assert [name for name in os.listdir(lease_dir) if name.endswith('.lease')] == [], "Released leases should be removed"
+        print("✓ expired leases taken over, renewal notices it")
+    finally:
+        shutil.rmtree(lease_dir)
+    print("✓ test_series_lease passed\n")
+
+
+def start_mock_thread(mock):
+    '''
+    serves the mock from a thread, so the worker processes can reach it while the test waits for them
+    '''
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(mock.start(), loop).result()
+    return loop, thread
+
+
+def test_sharded_download():
+    """Test 2 worker processes download disjoint halves of the series and leased series are skipped"""
+    print("Testing sharded download...")
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    mock = MockExchange(num_symbols=3, num_days=1)
+    loop, thread = start_mock_thread(mock)
+    try:
+        os.makedirs(os.path.join(work_dir, 'app'))
+        os.chdir(work_dir)
+        data_dir = os.path.join(work_dir, 'Data')
+        params_path = os.path.join(work_dir, 'params.yaml')
+        endpoints_path = os.path.join(work_dir, 'apiendpoints.yaml')
+        with open(params_path, 'w') as f:
+            yaml.dump(dict(PARAMS, data_dir=data_dir, metrics={'path': os.path.join(data_dir, 'metrics.prom')}), f)
+        with open(endpoints_path, 'w') as f:
+            yaml.dump(mock.get_endpoints(), f)
+        # another worker is writing bybit C001 already
+        SeriesLease(os.path.join(data_dir, '.leases'), 'other-host', ttl_sec=60).acquire('bybit', 'C001', 'USDT')
+
+        summary = ShardCoordinator.start_workers('update', params_path, endpoints_path, 2)
+        ShardCoordinator.print_summary(summary)
+        assert summary['missing_shards'] == [] and sorted(summary['shards']) == [0, 1], f"Both shards should report, {summary}"
+        assert summary['num_series'] == 12, f"The shards should cover every series once, got {summary['num_series']}"
+        assert all(shard['num_series'] > 0 for shard in summary['shards'].values()), "Both shards should get series"
+        assert summary['skipped'] == ['bybit-C001USDT'], f"The leased series should be skipped, got {summary['skipped']}"
+        assert sorted(os.listdir(os.path.join(data_dir, '.leases'))) == ['.lock', 'bybit-C001-USDT.lease'], "Workers should release their leases"
+        assert all(os.path.exists(os.path.join(data_dir, f'metrics-shard-{i}-of-2.prom')) for i in range(2)), "Every worker should export its metrics"
+        print("✓ disjoint shards, leased series skipped, leases released")
+
+        DataReader.initialize('csv', data_dir)
+        scanner = GapScanner(DataWriter.storage)
+        num_records = 0
+        for ex in EXCHANGES:
+            for base in mock.bases:
+                if (ex, base) == ('bybit', 'C001'):
+                    assert DataWriter.get_last_timestamp(ex, base, QUOTES[ex]) is None, "The leased series should not be written"
+                    continue
+                df = DataReader.load(ex, base, QUOTES[ex])
+                assert df['timestamp'].iloc[-1] == mock.end_ts, f"{ex}-{base}: last bar {df['timestamp'].iloc[-1]} != {mock.end_ts}"
+                assert df['timestamp'].is_unique and scanner.find_gaps(ex, base, QUOTES[ex], MockExchange.interval_ms) == [], f"{ex}-{base}: gaps or duplicates"
+                num_records += len(df)
+        assert summary['total_records'] == num_records, f"Merged records {summary['total_records']} != stored {num_records}"
+        print("✓ every other series stored complete, merged summary matches the storage")
+    finally:
+        os.chdir(cwd)
+        asyncio.run_coroutine_threadsafe(mock.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        shutil.rmtree(work_dir)
+        DataWriter.initialize()
+    print("✓ test_sharded_download passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running shard coordinator tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_shard_ring()
+        test_series_lease()
+        test_sharded_download()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
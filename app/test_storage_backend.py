@@ -0,0 +1,120 @@
+"""
+Test script to verify the storage backends write, merge and read series the same way
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from StorageBackend import StorageBackend
+from TestFixtures import JAN_31, MINUTE, make_bars
+
+
+def check_backend(storage_format):
+    data_dir = tempfile.mkdtemp()
+    try:
+        storage = StorageBackend.create(storage_format, data_dir)
+        assert storage.get_series_info('test', 'BTC', 'USD') is None, "Empty storage should have no series"
+
+        # two days across a month boundary
+        storage.write('test', 'BTC', 'USD', make_bars(JAN_31, 2 * 1440))
+        info = storage.get_series_info('test', 'BTC', 'USD')
+        assert info['first_ts'] == JAN_31 and info['rows'] == 2 * 1440, f"Unexpected info {info}"
+        print(f"✓ {storage_format}: initial write {info['rows']} rows")
+
+        # append after the last bar, then overwrite an overlapping range
+        storage.write('test', 'BTC', 'USD', make_bars(JAN_31 + 2 * 1440 * MINUTE, 60))
+        storage.write('test', 'BTC', 'USD', make_bars(JAN_31 + 10 * MINUTE, 5, close=200.5))
+        info = storage.get_series_info('test', 'BTC', 'USD')
+        assert info['rows'] == 2 * 1440 + 60, f"Expected {2 * 1440 + 60} rows, got {info['rows']}"
+        assert info['last_ts'] == JAN_31 + (2 * 1440 + 59) * MINUTE, f"Unexpected last_ts {info['last_ts']}"
+        print(f"✓ {storage_format}: append and merge keep {info['rows']} unique rows")
+
+        df = storage.read('test', 'BTC', 'USD')
+        assert df['timestamp'].is_monotonic_increasing and df['timestamp'].is_unique, "Stored series not sorted / unique"
+        assert df['open'].iloc[10] == 200.0 and df['open'].iloc[15] == 107.0, "Merged rows not replaced"
+
+        df = storage.read('test', 'BTC', 'USD', start=JAN_31 + 1440 * MINUTE, end=JAN_31 + 1500 * MINUTE - 1, columns=['close'])
+        assert list(df.columns) == ['close'] and len(df) == 60, f"Unexpected range read {df.shape}"
+        print(f"✓ {storage_format}: range read returns {len(df)} rows")
+    finally:
+        shutil.rmtree(data_dir)
+
+
+def test_csv_storage():
+    """Test csv backend"""
+    print("Testing csv storage...")
+    check_backend('csv')
+    print("✓ test_csv_storage passed\n")
+
+
+def test_parquet_storage():
+    """Test parquet backend and its monthly partitions"""
+    print("Testing parquet storage...")
+    check_backend('parquet')
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        storage = StorageBackend.create('parquet', data_dir)
+        storage.write('test', 'BTC', 'USD', make_bars(JAN_31, 2 * 1440))
+        files = storage.get_partition_files('test', 'BTC', 'USD')
+        assert [os.path.basename(f) for f in files] == ['2024-01.parquet', '2024-02.parquet'], f"Unexpected partitions {files}"
+        january_mtime = os.stat(files[0]).st_mtime_ns
+        storage.write('test', 'BTC', 'USD', make_bars(JAN_31 + 2 * 1440 * MINUTE, 60))
+        assert os.stat(files[0]).st_mtime_ns == january_mtime, "Incremental write should not touch older partitions"
+        assert len(storage.get_partition_files('test', 'BTC', 'USD', start=JAN_31 + 1440 * MINUTE)) == 1, "Range should skip January"
+        print("✓ parquet: writes touch only their month, reads skip months outside the range")
+    finally:
+        shutil.rmtree(data_dir)
+    print("✓ test_parquet_storage passed\n")
+
+
+def test_binary_storage():
+    """Test binary backend and its memory-mapped O(1) lookup"""
+    print("Testing binary storage...")
+    check_backend('binary')
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        storage = StorageBackend.create('binary', data_dir)
+        bars = make_bars(JAN_31, 1440)
+        storage.write('test', 'BTC', 'USD', bars.drop(index=range(100, 110)))
+        header = storage.read_header(storage.get_series_path('test', 'BTC', 'USD'))
+        assert header['interval_ms'] == MINUTE and header['base'] == 'BTC', f"Unexpected header {header}"
+        records = storage.open_series('test', 'BTC', 'USD')
+        assert isinstance(records, np.memmap) and len(records) == 1430, "Records should be memory-mapped"
+        assert storage.get_index(records, JAN_31 + 50 * MINUTE, MINUTE) == 50, "Offset before the gap is computed"
+        assert storage.get_index(records, JAN_31 + 105 * MINUTE, MINUTE) == 100, "Missing bar maps to the next record"
+        assert storage.get_index(records, JAN_31 + 200 * MINUTE, MINUTE) == 190, "Lookup after the gap falls back to search"
+        print("✓ binary: memmap lookup handles gaps")
+
+        # a series started with a single bar gets its interval with the first append
+        storage.write('test', 'ETH', 'USD', bars.iloc[:1])
+        storage.write('test', 'ETH', 'USD', bars.iloc[1:10])
+        header = storage.read_header(storage.get_series_path('test', 'ETH', 'USD'))
+        assert header['interval_ms'] == MINUTE, f"Interval should be written with the first append, got {header['interval_ms']}"
+        assert storage.get_series_info('test', 'ETH', 'USD')['interval_ms'] == MINUTE, "Manifest should get the interval too"
+        print("✓ binary: header interval set by the first append")
+    finally:
+        shutil.rmtree(data_dir)
+    print("✓ test_binary_storage passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running storage backend tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_csv_storage()
+        test_parquet_storage()
+        test_binary_storage()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
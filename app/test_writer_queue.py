@@ -0,0 +1,152 @@
+"""
+Test script to verify WriterQueue batching, per-series ordering and backpressure
+"""
+import asyncio
+
+import numpy as np
+
+from TestFixtures import JAN_31, MINUTE, make_series
+from WriterQueue import WriterQueue
+
+
+class SlowStorage:
+    def __init__(self, delay):
+        self.delay = delay
+        self.writes = []
+        self.in_flight = set()
+
+    async def write(self, exchange, base, quote, series):
+        key = (exchange, base, quote)
+        assert key not in self.in_flight, f"Concurrent writes of {key}"
+        self.in_flight.add(key)
+        await asyncio.sleep(self.delay)
+        self.in_flight.discard(key)
+        self.writes.append((key, series.timestamp.copy()))
+
+
+def test_batching_and_order():
+    """Test queued writes of one series are batched and stay in order"""
+    print("Testing batching and ordering...")
+
+    async def run():
+        storage = SlowStorage(0.05)
+        queue = WriterQueue(storage.write, num_workers=2)
+        queue.start()
+        for i in range(10):
+            await queue.put('bybit', 'BTC', 'USDT', make_series(JAN_31 + i * 100 * MINUTE, 100))
+            await queue.put('bybit', 'ETH', 'USDT', make_series(JAN_31 + i * 100 * MINUTE, 100))
+        await queue.flush('bybit', 'BTC', 'USDT')
+        assert not any(key == ('bybit', 'BTC', 'USDT') for key in queue.pending), "Flushed series still queued"
+        await queue.close()
+        return storage, queue.get_stats()
+
+    storage, stats = asyncio.run(run())
+    for base in ['BTC', 'ETH']:
+        timestamps = np.concatenate([ts for key, ts in storage.writes if key[1] == base])
+        assert np.array_equal(timestamps, JAN_31 + np.arange(1000) * MINUTE), f"{base} bars written out of order"
+    assert stats['writes'] == 20 and stats['bars'] == 2000 and stats['depth'] == 0, f"Unexpected stats {stats}"
+    assert stats['batches'] < 20, f"Writes were not batched ({stats['batches']} batches)"
+    print(f"✓ 20 writes in {stats['batches']} batches, every series in order, one write per series at a time")
+    print("✓ test_batching_and_order passed\n")
+
+
+def test_backpressure():
+    """Test put waits while the pending bytes are over the limit"""
+    print("Testing backpressure...")
+
+    async def run():
+        storage = SlowStorage(0.05)
+        chunk_bytes = make_series(JAN_31, 100).nbytes
+        queue = WriterQueue(storage.write, num_workers=1, max_pending_bytes=2 * chunk_bytes)
+        queue.start()
+        for i in range(6):
+            await queue.put('bybit', 'SYM' + str(i), 'USDT', make_series(JAN_31, 100))
+            assert queue.pending_bytes <= 2 * chunk_bytes, "Pending bytes over the limit"
+        await queue.close()
+        return queue.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats['backpressure_wait'] > 0 and stats['max_pending_bytes'] <= 2 * 100 * 40, f"Unexpected stats {stats}"
+    print(f"✓ producers waited {stats['backpressure_wait']:.2f}s, pending never above the limit")
+    print("✓ test_backpressure passed\n")
+
+
+class FailingStorage(SlowStorage):
+    def __init__(self, delay, fail_at):
+        super().__init__(delay)
+        self.fail_at = fail_at
+
+    async def write(self, exchange, base, quote, series):
+        if base == 'BTC' and series.timestamp[0] <= self.fail_at <= series.timestamp[-1]:
+            await asyncio.sleep(self.delay)
+            raise OSError('disk full')
+        await super().write(exchange, base, quote, series)
+
+
+def test_failed_write():
+    """Test a failed write is raised by flush and put, and the writes queued after it are dropped"""
+    print("Testing failed writes...")
+
+    async def run():
+        storage = FailingStorage(0.05, fail_at=JAN_31 + 100 * MINUTE)
+        queue = WriterQueue(storage.write, num_workers=2)
+        queue.start()
+        await queue.put('bybit', 'BTC', 'USDT', make_series(JAN_31, 100))
+        await queue.flush('bybit', 'BTC', 'USDT')
+        for i in range(3):
+            if i > 0:
+                # the write of the second chunk fails, the third one is queued behind it
+                await queue.put('bybit', 'BTC', 'USDT', make_series(JAN_31 + i * 100 * MINUTE, 100))
+            await queue.put('bybit', 'ETH', 'USDT', make_series(JAN_31 + i * 100 * MINUTE, 100))
+        errors = []
+        try:
+            await queue.flush('bybit', 'BTC', 'USDT')
+        except OSError as e:
+            errors.append(e)
+        await queue.flush('bybit', 'ETH', 'USDT')
+        await queue.flush('bybit', 'BTC', 'USDT')
+
+        # the next put of the series raises a failure nobody flushed yet, and so does close()
+        storage.fail_at = JAN_31 + 300 * MINUTE
+        await queue.put('bybit', 'BTC', 'USDT', make_series(JAN_31 + 300 * MINUTE, 100))
+        await asyncio.sleep(0.2)
+        try:
+            await queue.put('bybit', 'BTC', 'USDT', make_series(JAN_31 + 400 * MINUTE, 100))
+        except OSError as e:
+            errors.append(e)
+        storage.fail_at = JAN_31 + 500 * MINUTE
+        await queue.put('bybit', 'BTC', 'USDT', make_series(JAN_31 + 500 * MINUTE, 100))
+        try:
+            await queue.close()
+        except OSError as e:
+            errors.append(e)
+        return storage, errors, queue.get_stats()
+
+    storage, errors, stats = asyncio.run(run())
+    assert len(errors) == 3, f"flush, put and close should each raise once, got {errors}"
+    btc = np.concatenate([ts for key, ts in storage.writes if key[1] == 'BTC'])
+    assert np.array_equal(btc, JAN_31 + np.arange(100) * MINUTE), "Bars queued after the failed write should be dropped"
+    eth = np.concatenate([ts for key, ts in storage.writes if key[1] == 'ETH'])
+    assert np.array_equal(eth, JAN_31 + np.arange(300) * MINUTE), "Other series should be written"
+    assert stats['errors'] == 3 and stats['depth'] == 0, f"Unexpected stats {stats}"
+    print("✓ failures raised by flush, put and close, nothing appended behind a failed write")
+    print("✓ test_failed_write passed\n")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Running writer queue tests")
+    print("=" * 60 + "\n")
+
+    try:
+        test_batching_and_order()
+        test_backpressure()
+        test_failed_write()
+
+        print("=" * 60)
+        print("All tests passed! ✓")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()